@@ -0,0 +1,423 @@
+"""Offline microbenchmarks for the hot paths of ``dotgov.socrata``.
+
+Run from the repository root::
+
+    uv run python benchmarks/bench_socrata.py             # compare to baseline
+    uv run python benchmarks/bench_socrata.py --save      # store a new baseline
+    uv run python benchmarks/bench_socrata.py -k discover # matching names only
+
+Page loops are served canned responses through ``responses``, so no network
+is used. Each benchmark reports operations and items (records, datasets,
+values) per second, and the peak memory allocated by one operation, traced
+with ``tracemalloc``. Against the stored baseline, throughput falling or
+peak memory growing by more than ``--threshold`` is reported as a regression
+and the run exits with status 1.
+
+Baselines are machine dependent, store one on the machine comparing them.
+"""
+
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import responses
+
+from dotgov.socrata import DiscoverFilters, Payload, Socrata, create_where_clause
+
+
+DOMAIN = "bench.example.org"
+RID = "abcd-1234"
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+BENCHMARKS: dict[str, Callable] = {}
+
+
+def benchmark(name: str):
+    """Register a setup, a generator yielding ``(operation, items)`` once
+    its fixtures are ready."""
+
+    def register(setup):
+        BENCHMARKS[name] = contextmanager(setup)
+
+        return setup
+
+    return register
+
+
+# Canned responses
+
+
+def make_records(rows: int, width: int, start: int = 0):
+    """Records of ``width`` text, number and timestamp fields."""
+    records = []
+
+    for i in range(start, start + rows):
+        record = {":id": f"row-{i}"}
+
+        for j in range(width - 1):
+            match j % 3:
+                case 0:
+                    record[f"text_{j}"] = f"value {i} of column {j}"
+                case 1:
+                    record[f"number_{j}"] = str(i * j)
+                case _:
+                    record[f"date_{j}"] = "2024-01-02T03:04:05.000"
+
+        records.append(record)
+
+    return records
+
+
+def make_datasets(rows: int, start: int = 0):
+    """Catalog results shaped like the Discover API's."""
+    return [
+        {
+            "resource": {
+                "id": f"d{i:03d}-{i % 10000:04d}"[-9:],
+                "name": f"Dataset {i}",
+                "description": "Records of a government program " * 4,
+                "updatedAt": "2024-01-02T03:04:05.000Z",
+                "columns_name": [f"column {j}" for j in range(20)],
+                "columns_field_name": [f"column_{j}" for j in range(20)],
+                "columns_datatype": ["text"] * 20,
+            },
+            "classification": {
+                "domain_category": "Economy",
+                "domain_tags": ["budget", "spending", "contracts"],
+            },
+            "metadata": {"domain": DOMAIN},
+            "permalink": f"https://{DOMAIN}/d/{i}",
+        }
+        for i in range(start, start + rows)
+    ]
+
+
+def serve_resource(mock: responses.RequestsMock, total: int, limit: int, width: int):
+    """Serve ``total`` records in pages of ``limit``, 2.1 GET by offset."""
+    pages = {
+        offset: json.dumps(make_records(min(limit, total - offset), width, offset))
+        for offset in range(0, total, limit)
+    }
+    empty = json.dumps([])
+
+    def callback(request):
+        return (200, {}, pages.get(int(request.params["$offset"]), empty))
+
+    mock.add_callback(
+        responses.GET, f"https://{DOMAIN}/resource/{RID}.json", callback=callback
+    )
+
+
+def serve_resource_v3(mock: responses.RequestsMock, total: int, limit: int, width: int):
+    """Serve ``total`` records in pages of ``limit``, 3.0 POST by page."""
+    pages = {
+        offset // limit + 1: json.dumps(
+            make_records(min(limit, total - offset), width, offset)
+        )
+        for offset in range(0, total, limit)
+    }
+    empty = json.dumps([])
+
+    def callback(request):
+        number = json.loads(request.body)["page"]["pageNumber"]
+
+        return (200, {}, pages.get(number, empty))
+
+    mock.add_callback(
+        responses.POST,
+        f"https://{DOMAIN}/api/v3/views/{RID}/query.json",
+        callback=callback,
+    )
+
+
+def serve_catalog(mock: responses.RequestsMock, total: int, limit: int):
+    """Serve ``total`` datasets in pages of ``limit``."""
+    pages = {
+        offset: json.dumps(
+            {
+                "resultSetSize": total,
+                "results": make_datasets(min(limit, total - offset), offset),
+            }
+        )
+        for offset in range(0, total, limit)
+    }
+    empty = json.dumps({"resultSetSize": total, "results": []})
+
+    def callback(request):
+        return (200, {}, pages.get(int(request.params["offset"]), empty))
+
+    mock.add_callback(
+        responses.GET, f"https://{DOMAIN}/api/catalog/v1", callback=callback
+    )
+
+
+# Request formatting
+
+
+FILTERS = {
+    "select": "a, b, c, count(*) as n",
+    "where": "a > 10 AND upper(b) like upper('%x%')",
+    "group": "a, b, c",
+    "order": "n DESC",
+    "limit": 5000,
+}
+
+
+@benchmark("format_payload[v2.1]")
+def format_payload_v21():
+    socrata = Socrata(DOMAIN)
+
+    yield (lambda: socrata.format_payload(filters=FILTERS)), 1
+
+
+@benchmark("format_payload[v3.0]")
+def format_payload_v30():
+    socrata = Socrata(DOMAIN, version=3.0)
+
+    yield (lambda: socrata.format_payload(filters={**FILTERS, "page": 3})), 1
+
+
+@benchmark("validate[Payload]")
+def validate_payload():
+    yield (lambda: Payload(**FILTERS)), 1
+
+
+@benchmark("validate[DiscoverFilters]")
+def validate_discover_filters():
+    filters = {
+        "categories": ["Economy", "Health"],
+        "domains": [DOMAIN],
+        "ids": [f"abcd-{i:04d}" for i in range(100)],
+        "tags": ["budget", "spending"],
+        "query": "contracts",
+        "limit": 100,
+    }
+
+    yield (lambda: DiscoverFilters(**filters)), 1
+
+
+@benchmark("create_where_clause[in=10000]")
+def where_clause_large_in():
+    values = [f"key-{i}" for i in range(10_000)]
+
+    yield (lambda: create_where_clause(code=values)), len(values)
+
+
+@benchmark("create_where_clause[columns=1000]")
+def where_clause_many_columns():
+    kwargs = {}
+
+    for i in range(1000):
+        match i % 3:
+            case 0:
+                kwargs[f"range_{i}"] = (i, i + 10)
+            case 1:
+                kwargs[f"above_{i}"] = i
+            case _:
+                kwargs[f"name_{i}"] = f"some words {i}"
+
+    yield (lambda: create_where_clause(**kwargs)), len(kwargs)
+
+
+# Page loops
+
+
+def resource_loop(total: int, limit: int, width: int, version: float = 2.1):
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as mock:
+        if version > 2.1:
+            serve_resource_v3(mock, total, limit, width)
+        else:
+            serve_resource(mock, total, limit, width)
+
+        socrata = Socrata(DOMAIN, version=version)
+        socrata.open()
+
+        def run():
+            for _ in socrata.query_resource(RID, filters={"limit": limit}):
+                pass
+
+        try:
+            yield run, total
+
+        finally:
+            socrata.close()
+
+
+for _limit, _width in [(100, 5), (1000, 5), (5000, 5), (1000, 50), (5000, 50)]:
+    benchmark(f"query_resource[v2.1,page={_limit},width={_width}]")(
+        lambda limit=_limit, width=_width: resource_loop(20_000, limit, width)
+    )
+
+benchmark("query_resource[v3.0,page=1000,width=5]")(
+    lambda: resource_loop(20_000, 1000, 5, version=3.0)
+)
+
+
+def discover_loop(total: int, limit: int):
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as mock:
+        serve_catalog(mock, total, limit)
+
+        socrata = Socrata(DOMAIN)
+        socrata.open()
+
+        def run():
+            for _ in socrata.discover(filters={"limit": limit}):
+                pass
+
+        try:
+            yield run, total
+
+        finally:
+            socrata.close()
+
+
+for _limit in (100, 1000):
+    benchmark(f"discover[page={_limit}]")(
+        lambda limit=_limit: discover_loop(5000, limit)
+    )
+
+
+# Runner
+
+
+def measure(operation: Callable, min_time: float = 0.5, min_rounds: int = 5):
+    """Seconds per call (median of rounds) and peak bytes of one call."""
+    operation()
+
+    # Calls per round, so short operations are timed over ~10 ms
+    start = time.perf_counter()
+    operation()
+    single = time.perf_counter() - start
+
+    number = max(1, int(0.01 / max(single, 1e-9)))
+
+    rounds = []
+    deadline = time.perf_counter() + min_time
+
+    while len(rounds) < min_rounds or time.perf_counter() < deadline:
+        start = time.perf_counter()
+
+        for _ in range(number):
+            operation()
+
+        rounds.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+
+    try:
+        tracemalloc.reset_peak()
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    return statistics.median(rounds), peak
+
+
+def run(pattern: str | None = None, min_time: float = 0.5, min_rounds: int = 5):
+    """Run the benchmarks whose name contains ``pattern``, returning their
+    results by name."""
+    results = {}
+
+    for name, setup in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+
+        with setup() as (operation, items):
+            seconds, peak = measure(operation, min_time, min_rounds)
+
+        results[name] = {
+            "ops_per_sec": 1 / seconds,
+            "items_per_sec": items / seconds,
+            "peak_kib": peak / 2**10,
+        }
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    """Lines of a report against the baseline, and the regressed names."""
+    lines = [
+        f"{'benchmark':<42} {'ops/s':>12} {'items/s':>14} {'peak KiB':>10} "
+        f"{'speed':>8} {'memory':>8}"
+    ]
+
+    regressions = []
+
+    for name, result in results.items():
+        base = baseline.get(name)
+
+        speed = memory = ""
+
+        if base:
+            ratio = result["ops_per_sec"] / base["ops_per_sec"]
+            growth = (result["peak_kib"] + 1) / (base["peak_kib"] + 1)
+
+            speed = f"{ratio - 1:+.0%}"
+            memory = f"{growth - 1:+.0%}"
+
+            if ratio < 1 - threshold or growth > 1 + threshold:
+                regressions.append(name)
+                name = f"{name} !"
+
+        lines.append(
+            f"{name:<42} {result['ops_per_sec']:>12,.1f} "
+            f"{result['items_per_sec']:>14,.0f} {result['peak_kib']:>10,.1f} "
+            f"{speed:>8} {memory:>8}"
+        )
+
+    return lines, regressions
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-k", dest="pattern", help="Run names containing this")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="Store as baseline")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-time", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, min_time=args.min_time)
+
+    stored = {}
+
+    if args.baseline.exists():
+        stored = json.loads(args.baseline.read_text())
+
+    lines, regressions = compare(results, stored.get("results", {}), args.threshold)
+
+    print("\n".join(lines))
+
+    if args.save:
+        stored = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": {**stored.get("results", {}), **results},
+        }
+
+        args.baseline.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+
+        print(f"Baseline stored in {args.baseline}")
+
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} regressed beyond {args.threshold:.0%} of baseline")
+
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
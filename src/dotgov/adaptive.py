@@ -0,0 +1,159 @@
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePageSize:
+    """Page size adapting to observed response time and payload size.
+
+    Sizes are ``minimum`` times a power of two, up to ``maximum``. After each
+    page, the size is halved when the response took longer than
+    ``target_seconds`` or was larger than ``target_bytes``, and doubled when
+    a page twice as large is expected (from time and bytes per row) to stay
+    within both. Keeping sizes on this ladder lets SODA 3.0 page numbers
+    address every position reached so far.
+
+    Attributes
+    ----------
+    size : int
+        Size of the next page, the settled size once paging completes
+    sizes : list[int]
+        Size used for each page received
+    shrinks : int
+        Number of pages retried with half the size after a timeout or
+        server error
+    """
+
+    def __init__(
+        self,
+        initial: int | None = None,
+        minimum: int = 125,
+        maximum: int = 50_000,
+        target_seconds: float = 2.0,
+        target_bytes: int = 4 * 2**20,
+    ) -> None:
+        """AdaptivePageSize Instantiation.
+
+        Parameters
+        ----------
+        initial : int | None
+            Size of the first page, rounded down to the ladder. By default
+            the ``limit`` of the query.
+        minimum : int
+            Smallest page size, by default 125 so the default ``limit`` of
+            1000 is on the ladder
+        maximum : int
+            Largest page size
+        target_seconds : float
+            Response time pages should stay within
+        target_bytes : int
+            Response size pages should stay within
+        """
+        if minimum < 1 or maximum < minimum:
+            raise ValueError("Page size bounds must satisfy 1 <= minimum <= maximum.")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.target_bytes = target_bytes
+
+        self.initial = initial
+        self.size = self.fit(initial if initial is not None else minimum)
+        self.sizes: list[int] = []
+        self.shrinks = 0
+
+    def start(self, limit: int):
+        """Set the first page size from the query's limit, unless ``initial``
+        was given.
+
+        Parameters
+        ----------
+        limit : int
+            Page size requested by the query
+        """
+        if self.initial is None and not self.sizes:
+            self.size = self.fit(limit)
+
+    def fit(self, size: int):
+        """Largest size on the ladder not above ``size`` (at least minimum).
+
+        Parameters
+        ----------
+        size : int
+            Desired page size
+        """
+        size = min(size, self.maximum)
+
+        fitted = self.minimum
+
+        while fitted * 2 <= size:
+            fitted *= 2
+
+        return fitted
+
+    def aligned(self, position: int):
+        """Largest size up to the current one whose pages start at ``position``.
+
+        Parameters
+        ----------
+        position : int
+            Number of rows skipped, a multiple of ``minimum``
+        """
+        size = self.size
+
+        while size > self.minimum and position % size:
+            size //= 2
+
+        return size
+
+    def observe(self, seconds: float, nbytes: int, rows: int, size: int):
+        """Adjust the size after receiving a page.
+
+        Parameters
+        ----------
+        seconds : float
+            Response time of the page
+        nbytes : int
+            Response size of the page
+        rows : int
+            Number of records received
+        size : int
+            Page size requested
+        """
+        self.sizes.append(size)
+
+        if seconds > self.target_seconds or nbytes > self.target_bytes:
+            self.size = min(self.size, self.fit(size // 2))
+
+            logger.info(f"Page of {size} took {seconds:.2f}s, {nbytes} bytes")
+
+        elif rows >= size:
+            # Only full pages say how a larger one would do
+
+            expected_seconds = 2 * size * seconds / rows
+            expected_bytes = 2 * size * nbytes / rows
+
+            if (
+                expected_seconds <= self.target_seconds
+                and expected_bytes <= self.target_bytes
+            ):
+                self.size = max(self.size, self.fit(2 * size))
+
+    def shrink(self, size: int):
+        """Halve a page size after a timeout or server error.
+
+        Returns the new size, None when already at the minimum.
+
+        Parameters
+        ----------
+        size : int
+            Page size that failed
+        """
+        if size <= self.minimum:
+            return None
+
+        self.size = self.fit(size // 2)
+        self.shrinks += 1
+
+        return self.size
@@ -0,0 +1,83 @@
+"""Apache Arrow conversion of SODA API records.
+
+Requires the optional ``pyarrow`` dependency, ``pip install dotgov[arrow]``.
+"""
+
+import json
+
+import pyarrow as pa
+
+
+# Socrata ``dataTypeName`` → Arrow type. Anything else is kept as text.
+
+DATATYPES = {
+    "text": pa.string(),
+    "number": pa.float64(),
+    "double": pa.float64(),
+    "money": pa.float64(),
+    "percent": pa.float64(),
+    "checkbox": pa.bool_(),
+    "calendar_date": pa.timestamp("ms"),
+    "date": pa.timestamp("ms", tz="UTC"),
+}
+
+
+def schema_from_columns(columns: list[dict]):
+    """Build an Arrow schema from dataset column metadata.
+
+    Parameters
+    ----------
+    columns : list[dict]
+        Column metadata as returned by ``Socrata.fetch_columns``
+    """
+    fields = [
+        pa.field(c["fieldName"], DATATYPES.get(c.get("dataTypeName"), pa.string()))
+        for c in columns
+        if c.get("fieldName")
+    ]
+
+    return pa.schema(fields)
+
+
+def record_batch(records: list[dict], schema: pa.Schema):
+    """Convert a page of records into a RecordBatch with a fixed schema.
+
+    Fields missing from the schema are dropped and fields missing from a
+    record are null.
+
+    Parameters
+    ----------
+    records : list[dict]
+        Page of records as returned by the SODA API
+    schema : pa.Schema
+        Target schema, e.g. from ``schema_from_columns``
+    """
+    arrays = [
+        _to_array([r.get(field.name) for r in records], field.type) for field in schema
+    ]
+
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _to_array(values: list, datatype: pa.DataType):
+    """Convert the values of a column, casting from the API's text form."""
+    if pa.types.is_boolean(datatype):
+        values = [
+            v if v is None or isinstance(v, bool) else str(v).lower() == "true"
+            for v in values
+        ]
+
+        return pa.array(values, type=datatype)
+
+    return pa.array([_to_text(v) for v in values], type=pa.string()).cast(datatype)
+
+
+def _to_text(value):
+    """Text form of a value, nested values (points, urls, ...) as JSON."""
+    if value is None or isinstance(value, str):
+        return value
+
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+
+    return str(value)
@@ -0,0 +1,317 @@
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from pydantic import BaseModel, ConfigDict
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(BaseModel):
+    """Response stored in a ResponseCache.
+
+    Attributes
+    ----------
+    etag : str | None
+        Value of the ``ETag`` header
+    last_modified : str | None
+        Value of the ``Last-Modified`` header
+    headers : dict[str, str]
+        Response headers
+    body : bytes
+        Decoded response body
+    """
+
+    etag: str | None = None
+    last_modified: str | None = None
+    headers: dict[str, str] = {}
+    body: bytes = b""
+
+    model_config = ConfigDict(frozen=True)
+
+
+class ResponseCache:
+    """Size-bounded on-disk cache of responses and their validators.
+
+    Entries are stored in a SQLite file and evicted least recently used
+    first once ``max_bytes`` is exceeded.
+    """
+
+    # Headers describing the transfer, not the stored body
+    SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+    def __init__(self, path: str | Path, max_bytes: int = 256 * 2**20) -> None:
+        """ResponseCache Instantiation.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite file holding the cache, created if missing
+        max_bytes : int
+            Maximum size of stored bodies, default 256 MiB
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(method: str, url: str, body: bytes | str | None = None):
+        """Cache key of a request from its method, normalized URL and body.
+
+        Query parameters are sorted and JSON bodies serialized with sorted
+        keys, so equivalent requests share an entry.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method
+        url : str
+            Full URL, including query parameters
+        body : bytes | str | None
+            Request body
+        """
+        parts = urlsplit(url)
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        url = urlunsplit(parts._replace(query=query))
+
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+
+        if body:
+            try:
+                body = json.dumps(json.loads(body), sort_keys=True)
+
+            except ValueError:
+                pass
+
+        raw = "\n".join([method.upper(), url, body or ""])
+
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached response for a key, if any.
+
+        Parameters
+        ----------
+        key : str
+            Cache key (see ``ResponseCache.key``)
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+
+        etag, last_modified, headers, body = row
+
+        return CachedResponse(
+            etag=etag,
+            last_modified=last_modified,
+            headers=json.loads(headers),
+            body=body,
+        )
+
+    def set(self, key: str, headers: dict, body: bytes):
+        """Store a response and evict old entries beyond ``max_bytes``.
+
+        Parameters
+        ----------
+        key : str
+            Cache key (see ``ResponseCache.key``)
+        headers : dict
+            Response headers, including its validators
+        body : bytes
+            Decoded response body
+        """
+        if len(body) > self.max_bytes:
+            logger.info("Response larger than cache, not stored.")
+            return
+
+        headers = {
+            k: v for k, v in headers.items() if k.lower() not in self.SKIP_HEADERS
+        }
+        validators = CaseInsensitiveDict(headers)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    validators.get("ETag"),
+                    validators.get("Last-Modified"),
+                    json.dumps(headers),
+                    body,
+                    len(body),
+                    time.time(),
+                ),
+            )
+
+            self._evict()
+
+            self._db.commit()
+
+    def _evict(self):
+        """Delete least recently used entries until within ``max_bytes``."""
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ).fetchall()
+
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+            total -= size
+            self.evictions += 1
+
+    @property
+    def size(self):
+        """Total size of stored bodies in bytes."""
+        with self._lock:
+            (total,) = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+
+        return total
+
+    def record(self, hit: bool):
+        """Count a request served from disk (hit) or from the network (miss).
+
+        Parameters
+        ----------
+        hit : bool
+            Whether the response was served from the cache
+        """
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """Returns hit, miss and eviction counters and the stored size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": self.size,
+        }
+
+    def clear(self):
+        """Delete all entries."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def close(self):
+        """Close the SQLite connection."""
+        self._db.close()
+
+
+class CachingAdapter(HTTPAdapter):
+    """Transport adapter revalidating responses stored in a ResponseCache.
+
+    Requests with a cached entry carry ``If-None-Match`` and
+    ``If-Modified-Since`` headers, and a 304 reply is served from disk.
+    """
+
+    def __init__(self, cache: ResponseCache, **kwargs) -> None:
+        """CachingAdapter Instantiation.
+
+        Parameters
+        ----------
+        cache : ResponseCache
+            Cache storing responses
+        **kwargs : dict
+            Arguments for ``HTTPAdapter`` (e.g. ``max_retries``)
+        """
+        super().__init__(**kwargs)
+
+        self.cache = cache
+
+    def send(self, request, **kwargs):
+        if request.method not in ("GET", "POST") or kwargs.get("stream"):
+            return super().send(request, **kwargs)
+
+        key = self.cache.key(request.method, request.url, request.body)
+        entry = self.cache.get(key)
+
+        if entry is not None:
+            if entry.etag:
+                request.headers["If-None-Match"] = entry.etag
+
+            if entry.last_modified:
+                request.headers["If-Modified-Since"] = entry.last_modified
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.record(hit=True)
+
+            fresh = {
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() not in self.cache.SKIP_HEADERS
+            }
+
+            response.status_code = 200
+            response.reason = "OK"
+            response.headers = CaseInsensitiveDict({**entry.headers, **fresh})
+            response._content = entry.body
+            response._content_consumed = True
+
+            return response
+
+        self.cache.record(hit=False)
+
+        validated = "ETag" in response.headers or "Last-Modified" in response.headers
+
+        if response.status_code == 200 and validated:
+            self.cache.set(key, dict(response.headers), response.content)
+
+        return response
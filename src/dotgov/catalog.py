@@ -0,0 +1,392 @@
+from pathlib import Path
+import json
+import logging
+import re
+import sqlite3
+import threading
+
+from pydantic import BaseModel
+
+from .socrata import DiscoverFilters, Socrata
+
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshResult(BaseModel):
+    """Outcome of a catalog refresh.
+
+    Attributes
+    ----------
+    domain : str
+        Domain of the catalog
+    added : int
+        Number of assets new to the index
+    updated : int
+        Number of assets whose ``updatedAt`` changed
+    unchanged : int
+        Number of assets left as they were
+    removed : int
+        Number of assets no longer listed by the catalog
+    """
+
+    domain: str
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+class CatalogIndex:
+    """Local SQLite index of Discover API results, searchable offline.
+
+    Names, descriptions, tags, categories and column names and field names
+    are indexed with FTS5 for ``q`` searches, while the other
+    ``DiscoverFilters`` are matched on stored fields.
+    """
+
+    # Filters narrowing a refresh, after which unseen assets may still exist
+    NARROWING = (
+        "attribution",
+        "categories",
+        "domains",
+        "ids",
+        "names",
+        "q",
+        "query",
+        "tags",
+    )
+
+    def __init__(self, path: str | Path) -> None:
+        """CatalogIndex Instantiation.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite file holding the index, created if missing
+        """
+        self.path = Path(path)
+
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS assets (
+                domain TEXT NOT NULL,
+                id TEXT NOT NULL,
+                type TEXT,
+                name TEXT,
+                attribution TEXT,
+                provenance TEXT,
+                categories TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                updated_at TEXT,
+                record TEXT NOT NULL,
+                PRIMARY KEY (domain, id)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS assets_fts USING fts5(
+                name, description, tags, categories, columns
+            );
+            """
+        )
+
+    def refresh(
+        self,
+        socrata: Socrata,
+        filters: DiscoverFilters | dict | None = None,
+        **kwargs,
+    ):
+        """Page the catalog of a domain, storing new and changed assets.
+
+        Assets are rewritten only when their ``updatedAt`` changed. When the
+        filters only restrict the asset type (``only``) and provenance,
+        assets of that type and provenance no longer listed are removed.
+        Approval status is not kept, so a refresh listing another status than
+        the default removes nothing. Errors are raised, leaving the index as
+        it was before the failing page.
+
+        Parameters
+        ----------
+        socrata : Socrata
+            Open client for the catalog's domain
+        filters : DiscoverFilters | dict | None
+            Filters for the request (see DiscoverFilters)
+        **kwargs : dict
+            Arguments for ``Socrata.discover_pages`` (e.g. ``timeout``)
+        """
+        domain = socrata.domain
+
+        result = RefreshResult(domain=domain)
+
+        params = socrata.format_discover_params(filters=filters)
+
+        with self._lock:
+            known = dict(
+                self._db.execute(
+                    "SELECT id, updated_at FROM assets WHERE domain = ?", (domain,)
+                ).fetchall()
+            )
+
+        seen = set()
+
+        for datasets in socrata.discover_pages(filters=filters, **kwargs):
+            changed = []
+
+            for record in datasets:
+                resource = record.get("resource", {})
+                identifier = resource.get("id")
+
+                if identifier is None or identifier in seen:
+                    continue
+
+                seen.add(identifier)
+
+                if identifier not in known:
+                    result.added += 1
+                    changed.append(record)
+
+                elif known[identifier] != resource.get("updatedAt"):
+                    result.updated += 1
+                    changed.append(record)
+
+                else:
+                    result.unchanged += 1
+
+            self.upsert(domain, changed)
+
+        default = DiscoverFilters().approval_status
+
+        narrowed = any(params.get(k) for k in self.NARROWING)
+
+        if not narrowed and params.get("approval_status") == default:
+            result.removed = self._remove_unseen(
+                domain, params.get("only"), params.get("provenance"), seen
+            )
+
+        logger.info(
+            f"{domain}: {result.added} added, {result.updated} updated, "
+            f"{result.removed} removed"
+        )
+
+        return result
+
+    def upsert(self, domain: str, records: list[dict]):
+        """Insert or replace assets, as returned by the Discover API.
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the catalog
+        records : list[dict]
+            Discover API results
+        """
+        with self._lock, self._db:
+            for record in records:
+                fields = _asset_fields(record)
+
+                self._db.execute(
+                    """INSERT INTO assets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (domain, id) DO UPDATE SET
+                        type = excluded.type,
+                        name = excluded.name,
+                        attribution = excluded.attribution,
+                        provenance = excluded.provenance,
+                        categories = excluded.categories,
+                        tags = excluded.tags,
+                        updated_at = excluded.updated_at,
+                        record = excluded.record""",
+                    (
+                        domain,
+                        fields["id"],
+                        fields["type"],
+                        fields["name"],
+                        fields["attribution"],
+                        fields["provenance"],
+                        json.dumps(fields["categories"]),
+                        json.dumps(fields["tags"]),
+                        fields["updated_at"],
+                        json.dumps(record),
+                    ),
+                )
+
+                (rowid,) = self._db.execute(
+                    "SELECT rowid FROM assets WHERE domain = ? AND id = ?",
+                    (domain, fields["id"]),
+                ).fetchone()
+
+                self._db.execute("DELETE FROM assets_fts WHERE rowid = ?", (rowid,))
+                self._db.execute(
+                    """INSERT INTO assets_fts
+                    (rowid, name, description, tags, categories, columns)
+                    VALUES (?, ?, ?, ?, ?, ?)""",
+                    (
+                        rowid,
+                        fields["name"],
+                        fields["description"],
+                        " ".join(fields["tags"]),
+                        " ".join(fields["categories"]),
+                        " ".join(fields["columns"]),
+                    ),
+                )
+
+    def search(
+        self,
+        filters: DiscoverFilters | dict | None = None,
+        domain: str | None = None,
+    ):
+        """Returns the indexed assets matching Discover API filters.
+
+        ``q`` (or ``query``) is a full-text search ranking results by
+        relevance, other results are ordered by name. ``names``, ``tags`` and
+        ``categories`` match ignoring case. ``approval_status`` is not kept
+        by the index and is ignored.
+
+        Parameters
+        ----------
+        filters : DiscoverFilters | dict | None
+            Filters for the search (see DiscoverFilters)
+        domain : str | None
+            Domain to search, by default ``filters.domains`` or all domains
+        """
+        if isinstance(filters, dict):
+            filters = DiscoverFilters(**filters)
+
+        filters = filters or DiscoverFilters()
+
+        clauses = ["a.type = ?", "(a.provenance IS NULL OR a.provenance = ?)"]
+        args: list = [filters.only, filters.provenance]
+
+        domains = [domain] if domain else filters.domains
+
+        for column, values in [("a.domain", domains), ("a.id", filters.ids)]:
+            if values:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                args.extend(values)
+
+        if filters.names:
+            marks = ", ".join("?" * len(filters.names))
+
+            clauses.append(f"lower(a.name) IN ({marks})")
+            args.extend(n.lower() for n in filters.names)
+
+        for column, values in [
+            ("a.tags", filters.tags),
+            ("a.categories", filters.categories),
+        ]:
+            if values:
+                marks = ", ".join("?" * len(values))
+
+                clauses.append(
+                    f"EXISTS (SELECT 1 FROM json_each({column}) WHERE value IN ({marks}))"
+                )
+                args.extend(v.lower() for v in values)
+
+        if filters.attribution:
+            clauses.append("a.attribution = ?")
+            args.append(filters.attribution)
+
+        text = _match_expression(filters.q or filters.query or "")
+
+        if text:
+            source = "assets a JOIN assets_fts f ON f.rowid = a.rowid"
+            clauses.append("assets_fts MATCH ?")
+            args.append(text)
+            order = "f.rank"
+
+        else:
+            source = "assets a"
+            order = "a.name"
+
+        sql = (
+            f"SELECT a.record FROM {source} WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {order} LIMIT ? OFFSET ?"
+        )
+
+        with self._lock:
+            rows = self._db.execute(sql, [*args, filters.limit, filters.offset])
+
+            return [json.loads(record) for (record,) in rows.fetchall()]
+
+    def count(self, domain: str | None = None):
+        """Returns the number of indexed assets.
+
+        Parameters
+        ----------
+        domain : str | None
+            Domain to count, by default all domains
+        """
+        sql = "SELECT COUNT(*) FROM assets"
+        args = ()
+
+        if domain:
+            sql += " WHERE domain = ?"
+            args = (domain,)
+
+        with self._lock:
+            (n,) = self._db.execute(sql, args).fetchone()
+
+        return n
+
+    def close(self):
+        """Close the SQLite connection."""
+        self._db.close()
+
+    def _remove_unseen(
+        self, domain: str, only: str | None, provenance: str | None, seen: set
+    ):
+        """Delete assets of a type and provenance no longer listed, returning
+        how many."""
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT rowid, id FROM assets WHERE domain = ? AND type IS ? "
+                "AND (provenance IS NULL OR provenance IS ?)",
+                (domain, only, provenance),
+            ).fetchall()
+
+            gone = [(rowid,) for rowid, identifier in rows if identifier not in seen]
+
+            self._db.executemany("DELETE FROM assets WHERE rowid = ?", gone)
+            self._db.executemany("DELETE FROM assets_fts WHERE rowid = ?", gone)
+
+        return len(gone)
+
+
+def _asset_fields(record: dict):
+    """Indexed fields of a Discover API result."""
+    resource = record.get("resource", {})
+    classification = record.get("classification", {})
+
+    categories = [*classification.get("categories", [])]
+    tags = [*classification.get("tags", []), *classification.get("domain_tags", [])]
+
+    if classification.get("domain_category"):
+        categories.append(classification["domain_category"])
+
+    columns = [
+        *resource.get("columns_name", []),
+        *resource.get("columns_field_name", []),
+    ]
+
+    return {
+        "id": resource.get("id"),
+        "type": resource.get("type"),
+        "name": resource.get("name"),
+        "description": resource.get("description"),
+        "attribution": resource.get("attribution"),
+        "provenance": resource.get("provenance"),
+        "categories": [c.lower() for c in dict.fromkeys(categories)],
+        "tags": [t.lower() for t in dict.fromkeys(tags)],
+        "columns": columns,
+        "updated_at": resource.get("updatedAt"),
+    }
+
+
+def _match_expression(text: str):
+    """FTS5 query matching every word of ``text``, quoted so no word is read
+    as an operator."""
+    words = re.findall(r"\w+", text)
+
+    return " ".join(f'"{w}"' for w in words)
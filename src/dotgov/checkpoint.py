@@ -0,0 +1,166 @@
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from pydantic import BaseModel
+
+
+class Checkpoint(BaseModel):
+    """Position of the last page fully delivered by a query.
+
+    Attributes
+    ----------
+    key : str
+        Hash identifying the query (see ``CheckpointStore.key``)
+    domain : str
+        Domain of the dataset
+    identifier : str
+        Resource ID
+    position : dict
+        Where to resume: ``{"offset": n}`` (2.1), ``{"page": n}`` (3.0) or
+        ``{"seek": value}`` (keyset pagination)
+    rows : int
+        Number of records delivered so far
+    """
+
+    key: str
+    domain: str
+    identifier: str
+    position: dict
+    rows: int = 0
+
+
+class CheckpointStore:
+    """Durable checkpoints of resource queries, kept in a SQLite file.
+
+    A checkpoint is saved after each page is delivered and deleted once the
+    query completes, so an interrupted pull can resume where it stopped.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """CheckpointStore Instantiation.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite file holding the checkpoints, created if missing
+        """
+        self.path = Path(path)
+
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                key TEXT PRIMARY KEY,
+                domain TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                position TEXT NOT NULL,
+                rows INTEGER NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(domain: str, identifier: str, query: dict):
+        """Hash identifying a query, independent of its paging position.
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the dataset
+        identifier : str
+            Resource ID
+        query : dict
+            Anything else defining the query (version, filters, keyset, ...)
+        """
+        raw = json.dumps([domain, identifier, query], sort_keys=True, default=str)
+
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def load(self, key: str):
+        """Returns the checkpoint saved for a query, if any.
+
+        Parameters
+        ----------
+        key : str
+            Hash identifying the query
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT domain, identifier, position, rows FROM checkpoints WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        domain, identifier, position, rows = row
+
+        return Checkpoint(
+            key=key,
+            domain=domain,
+            identifier=identifier,
+            position=json.loads(position),
+            rows=rows,
+        )
+
+    def pending(self):
+        """Returns the checkpoints of queries that have not completed."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, domain, identifier, position, rows FROM checkpoints"
+            ).fetchall()
+
+        return [
+            Checkpoint(
+                key=key,
+                domain=domain,
+                identifier=identifier,
+                position=json.loads(position),
+                rows=n,
+            )
+            for key, domain, identifier, position, n in rows
+        ]
+
+    def save(self, checkpoint: Checkpoint):
+        """Durably save a checkpoint, replacing the previous one.
+
+        Parameters
+        ----------
+        checkpoint : Checkpoint
+            Position to resume from
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    checkpoint.key,
+                    checkpoint.domain,
+                    checkpoint.identifier,
+                    json.dumps(checkpoint.position),
+                    checkpoint.rows,
+                    time.time(),
+                ),
+            )
+
+    def delete(self, key: str):
+        """Delete the checkpoint of a query.
+
+        Parameters
+        ----------
+        key : str
+            Hash identifying the query
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+
+    def close(self):
+        """Close the SQLite connection."""
+        self._db.close()
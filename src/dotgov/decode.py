@@ -0,0 +1,103 @@
+"""Typed decoding of SODA API records from dataset column metadata.
+
+SODA 2.1 returns numbers, checkboxes and timestamps as strings. Decoders are
+built once per column from its ``dataTypeName`` and applied to each record.
+"""
+
+from collections.abc import Callable
+from datetime import datetime
+import re
+
+
+def decode_number(value):
+    """Number as int when integral, float otherwise."""
+    if isinstance(value, (int, float)):
+        return value
+
+    try:
+        return int(value)
+
+    except ValueError:
+        return float(value)
+
+
+def decode_float(value):
+    """Number as float."""
+    return float(value)
+
+
+def decode_checkbox(value):
+    """Checkbox as bool."""
+    if isinstance(value, bool):
+        return value
+
+    return str(value).lower() == "true"
+
+
+def decode_timestamp(value):
+    """Timestamp as datetime, aware when an offset (or Z) is given."""
+    if isinstance(value, datetime):
+        return value
+
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+_WKT_POINT = re.compile(r"^\s*POINT\s*\(\s*(\S+)\s+(\S+)\s*\)\s*$", re.IGNORECASE)
+
+
+def decode_point(value):
+    """Point (GeoJSON or WKT) as a ``(longitude, latitude)`` tuple."""
+    if isinstance(value, dict):
+        longitude, latitude = value["coordinates"][:2]
+
+        return (float(longitude), float(latitude))
+
+    match = _WKT_POINT.match(str(value))
+
+    if match is None:
+        raise ValueError(f"Value {value!r} is not a point.")
+
+    return (float(match.group(1)), float(match.group(2)))
+
+
+# Socrata ``dataTypeName`` (views API and SODA names) → decoder. Anything
+# else is left as returned.
+
+DECODERS: dict[str, Callable] = {
+    "number": decode_number,
+    "double": decode_float,
+    "money": decode_float,
+    "percent": decode_float,
+    "checkbox": decode_checkbox,
+    "calendar_date": decode_timestamp,
+    "floating_timestamp": decode_timestamp,
+    "date": decode_timestamp,
+    "fixed_timestamp": decode_timestamp,
+    "point": decode_point,
+}
+
+
+def record_decoder(columns: list[dict]):
+    """Build a function decoding the fields of a record in place.
+
+    Parameters
+    ----------
+    columns : list[dict]
+        Column metadata as returned by ``Socrata.fetch_columns``
+    """
+    decoders = tuple(
+        (c["fieldName"], DECODERS[c["dataTypeName"]])
+        for c in columns
+        if c.get("fieldName") and c.get("dataTypeName") in DECODERS
+    )
+
+    def decode(record: dict):
+        for field, decoder in decoders:
+            value = record.get(field)
+
+            if value is not None:
+                record[field] = decoder(value)
+
+        return record
+
+    return decode
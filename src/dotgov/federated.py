@@ -0,0 +1,118 @@
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+
+from .metrics import RequestMetric
+from .ratelimit import RateLimiter
+from .socrata import DiscoverFilters, Socrata
+
+
+logger = logging.getLogger(__name__)
+
+
+def federated_discover(
+    domains: Iterable[str],
+    filters: DiscoverFilters | dict | None = None,
+    workers: int = 8,
+    app_token: str | None = None,
+    retries: int | None = None,
+    limiter: RateLimiter | bool | None = None,
+    metrics: Callable[[RequestMetric], None] | None = None,
+    **kwargs,
+):
+    """Returns datasets of many domains, paging their catalogs concurrently.
+
+    Yields ``(domain, dataset)`` tuples in the order pages arrive. At most
+    ``workers`` pages are requested at once across all domains, and domains
+    take turns, so a slow catalog delays only its own datasets. A domain
+    failing is logged and dropped, the others carry on.
+
+    Parameters
+    ----------
+    domains : Iterable[str]
+        Target domains (without scheme), e.g. from ``dotgov.constants``
+    filters : DiscoverFilters | dict | None
+        Filters for every domain (see DiscoverFilters)
+    workers : int
+        Number of pages requested concurrently, across all domains
+    app_token : str | None
+        Socrata application token
+    retries : int | None
+        Number of attempts to retry request
+    limiter : RateLimiter | bool | None
+        ``True`` for the limiter shared per domain (see ``Socrata``)
+    metrics : Callable[[RequestMetric], None] | None
+        Hook called with the measurements of every request, of every domain
+    **kwargs : dict
+        Arguments for ``Socrata.discover_pages`` (e.g. ``timeout``)
+    """
+    clients = {
+        domain: Socrata(
+            domain=domain,
+            app_token=app_token,
+            retries=retries,
+            limiter=limiter,
+            metrics=metrics,
+        )
+        for domain in dict.fromkeys(domains)
+    }
+
+    ready = deque(clients)
+    pages = {}
+    running = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+
+            def submit():
+                while ready and len(running) < workers:
+                    domain = ready.popleft()
+
+                    if domain not in pages:
+                        clients[domain].open()
+                        pages[domain] = clients[domain].discover_pages(
+                            filters=filters, **kwargs
+                        )
+
+                    # One page in flight per domain, so its pages stay in order
+                    future = executor.submit(next, pages[domain], None)
+
+                    running[future] = domain
+
+            try:
+                submit()
+
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                    for future in done:
+                        domain = running.pop(future)
+
+                        try:
+                            datasets = future.result()
+
+                        except Exception as e:
+                            logger.error(f"Discover failed for {domain}: {e}")
+                            datasets = None
+
+                        else:
+                            if datasets is None:
+                                logger.info(f"Catalog of {domain} complete.")
+
+                        if datasets is not None:
+                            ready.append(domain)
+
+                        # Refill before yielding, so requests overlap consumption
+                        submit()
+
+                        for dataset in datasets or []:
+                            yield domain, dataset
+
+            finally:
+                for future in running:
+                    future.cancel()
+
+    finally:
+        for client in clients.values():
+            client.close()
@@ -0,0 +1,1262 @@
+"""Local execution of SoQL queries over dataset snapshots.
+
+Queries are parsed into a small expression tree and compiled to Python
+functions applied to each record. The subset covered is the one
+``format_payload`` and ``create_where_clause`` produce: SELECT (with aliases
+and aggregates), WHERE, GROUP BY, HAVING, ORDER BY, LIMIT and OFFSET, with
+``between``, ``in``, ``like``, ``is null`` and common functions, including
+the location predicates ``dotgov.soql`` builds.
+
+Snapshot records keep numbers as text, like SODA 2.1 returns them, so values
+are compared as numbers when both sides look like numbers, and as text
+otherwise (ISO timestamps compare correctly as text).
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qsl, urlsplit
+import io
+import json
+import math
+import re
+import threading
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from .decode import decode_point
+
+if TYPE_CHECKING:
+    from .sync import SyncStore
+
+
+# Tokens
+
+
+_TOKEN = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+      | (?P<quoted>`[^`]+`)
+      | (?P<name>:?@?[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><>|!=|<=|>=|\|\||[=<>+\-*/%(),])
+    )
+    """,
+    re.VERBOSE,
+)
+
+_KEYWORDS = {
+    "select",
+    "where",
+    "group",
+    "having",
+    "order",
+    "by",
+    "limit",
+    "offset",
+    "and",
+    "or",
+    "not",
+    "as",
+    "asc",
+    "desc",
+    "between",
+    "in",
+    "like",
+    "is",
+    "null",
+    "true",
+    "false",
+    "distinct",
+}
+
+
+def _tokenize(text: str):
+    """List of ``(kind, value)`` tokens, keywords lowercased."""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+
+        if match is None or match.end() == position:
+            raise ValueError(f"Unexpected character {text[position]!r} in query.")
+
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+
+        if kind == "string":
+            tokens.append(("literal", value[1:-1].replace("''", "'")))
+
+        elif kind == "number":
+            number = float(value) if re.search(r"[.eE]", value) else int(value)
+            tokens.append(("literal", number))
+
+        elif kind == "quoted":
+            tokens.append(("name", value[1:-1]))
+
+        elif kind == "name" and value.lower() in _KEYWORDS:
+            tokens.append(("keyword", value.lower()))
+
+        else:
+            tokens.append((kind, value))
+
+    return tokens
+
+
+# Parsing
+
+
+class _Parser:
+    """Recursive descent parser producing tuples as expression nodes:
+
+    - ``("literal", value)``, ``("column", name)``, ``("star",)``
+    - ``("call", name, args, distinct)``
+    - ``("binary", op, left, right)``, ``("not", operand)``, ``("neg", operand)``
+    - ``("null", operand, negated)``, ``("in", operand, items, negated)``
+    - ``("between", operand, low, high, negated)``
+    - ``("like", operand, pattern, negated)``
+    """
+
+    def __init__(self, text: str) -> None:
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self, offset: int = 0):
+        index = self.position + offset
+
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def accept(self, kind: str, value=None):
+        token = self.peek()
+
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+
+            return token
+
+        return None
+
+    def expect(self, kind: str, value=None):
+        token = self.accept(kind, value)
+
+        if token is None:
+            found = self.peek()[1]
+            raise ValueError(f"Expected {value or kind}, found {found!r} in query.")
+
+        return token
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    def statement(self):
+        """Parse ``SELECT ... [WHERE] [GROUP BY] [HAVING] [ORDER BY] [LIMIT]
+        [OFFSET]`` into a dict of clauses."""
+        clauses = {}
+
+        self.expect("keyword", "select")
+        clauses["select"] = self.select_list()
+
+        if self.accept("keyword", "where"):
+            clauses["where"] = self.expression()
+
+        if self.accept("keyword", "group"):
+            self.expect("keyword", "by")
+            clauses["group"] = self.expression_list()
+
+        if self.accept("keyword", "having"):
+            clauses["having"] = self.expression()
+
+        if self.accept("keyword", "order"):
+            self.expect("keyword", "by")
+            clauses["order"] = self.order_list()
+
+        if self.accept("keyword", "limit"):
+            clauses["limit"] = self.integer()
+
+        if self.accept("keyword", "offset"):
+            clauses["offset"] = self.integer()
+
+        if not self.done():
+            raise ValueError(f"Unexpected {self.peek()[1]!r} in query.")
+
+        return clauses
+
+    def integer(self):
+        _, value = self.expect("literal")
+
+        if not isinstance(value, int):
+            raise ValueError(f"Expected an integer, found {value!r} in query.")
+
+        return value
+
+    def select_list(self):
+        items = []
+
+        while True:
+            if self.accept("op", "*"):
+                items.append((("star",), None))
+
+            else:
+                node = self.expression()
+                alias = None
+
+                if self.accept("keyword", "as"):
+                    alias = self.expect("name")[1]
+
+                elif self.peek()[0] == "name":
+                    alias = self.expect("name")[1]
+
+                items.append((node, alias))
+
+            if not self.accept("op", ","):
+                return items
+
+    def expression_list(self):
+        items = [self.expression()]
+
+        # A trailing comma is accepted, as in ``in('a',)``
+        while self.accept("op", ",") and self.peek() != ("op", ")"):
+            items.append(self.expression())
+
+        return items
+
+    def order_list(self):
+        items = []
+
+        while True:
+            node = self.expression()
+            descending = False
+
+            if self.accept("keyword", "desc"):
+                descending = True
+            else:
+                self.accept("keyword", "asc")
+
+            items.append((node, descending))
+
+            if not self.accept("op", ","):
+                return items
+
+    def expression(self):
+        node = self.conjunction()
+
+        while self.accept("keyword", "or"):
+            node = ("binary", "or", node, self.conjunction())
+
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+
+        # ``between x and y`` consumes its own AND in ``comparison``
+        while self.accept("keyword", "and"):
+            node = ("binary", "and", node, self.negation())
+
+        return node
+
+    def negation(self):
+        if self.accept("keyword", "not"):
+            return ("not", self.negation())
+
+        return self.comparison()
+
+    def comparison(self):
+        node = self.concatenation()
+
+        token = self.peek()
+
+        if token[0] == "op" and token[1] in ("=", "!=", "<>", "<", "<=", ">", ">="):
+            self.position += 1
+            op = "!=" if token[1] == "<>" else token[1]
+
+            return ("binary", op, node, self.concatenation())
+
+        if self.accept("keyword", "is"):
+            negated = bool(self.accept("keyword", "not"))
+            self.expect("keyword", "null")
+
+            return ("null", node, negated)
+
+        negated = False
+
+        if token == ("keyword", "not") and self.peek(1)[1] in ("between", "in", "like"):
+            self.position += 1
+            negated = True
+
+        if self.accept("keyword", "between"):
+            low = self.concatenation()
+            self.expect("keyword", "and")
+            high = self.concatenation()
+
+            return ("between", node, low, high, negated)
+
+        if self.accept("keyword", "in"):
+            self.expect("op", "(")
+            items = self.expression_list()
+            self.expect("op", ")")
+
+            return ("in", node, items, negated)
+
+        if self.accept("keyword", "like"):
+            return ("like", node, self.concatenation(), negated)
+
+        return node
+
+    def concatenation(self):
+        node = self.additive()
+
+        while self.accept("op", "||"):
+            node = ("binary", "||", node, self.additive())
+
+        return node
+
+    def additive(self):
+        node = self.multiplicative()
+
+        while True:
+            token = self.accept("op", "+") or self.accept("op", "-")
+
+            if token is None:
+                return node
+
+            node = ("binary", token[1], node, self.multiplicative())
+
+    def multiplicative(self):
+        node = self.unary()
+
+        while True:
+            token = (
+                self.accept("op", "*")
+                or self.accept("op", "/")
+                or self.accept("op", "%")
+            )
+
+            if token is None:
+                return node
+
+            node = ("binary", token[1], node, self.unary())
+
+    def unary(self):
+        if self.accept("op", "-"):
+            return ("neg", self.unary())
+
+        return self.primary()
+
+    def primary(self):
+        kind, value = self.peek()
+
+        if kind == "literal":
+            self.position += 1
+
+            return ("literal", value)
+
+        if kind == "keyword" and value in ("true", "false", "null"):
+            self.position += 1
+
+            return ("literal", {"true": True, "false": False, "null": None}[value])
+
+        if self.accept("op", "("):
+            node = self.expression()
+            self.expect("op", ")")
+
+            return node
+
+        if kind == "name":
+            self.position += 1
+
+            if not self.accept("op", "("):
+                return ("column", value)
+
+            name = value.lower()
+
+            if self.accept("op", "*"):
+                self.expect("op", ")")
+
+                return ("call", name, [("star",)], False)
+
+            distinct = bool(self.accept("keyword", "distinct"))
+
+            args = [] if self.peek() == ("op", ")") else self.expression_list()
+            self.expect("op", ")")
+
+            return ("call", name, args, distinct)
+
+        raise ValueError(f"Unexpected {value!r} in query.")
+
+
+# Values
+
+
+def _as_number(value):
+    """Value as a number, None when it does not look like one."""
+    if isinstance(value, bool) or value is None:
+        return None
+
+    if isinstance(value, (int, float)):
+        return value
+
+    if isinstance(value, str):
+        try:
+            return int(value)
+
+        except ValueError:
+            try:
+                number = float(value)
+
+            except ValueError:
+                return None
+
+            return number if math.isfinite(number) else None
+
+    return None
+
+
+def _comparable(a, b):
+    """Pair of values compared as numbers when both look like numbers,
+    as booleans when either is one, as text otherwise."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return str(a).lower(), str(b).lower()
+
+    x, y = _as_number(a), _as_number(b)
+
+    if x is not None and y is not None:
+        return x, y
+
+    return str(a), str(b)
+
+
+def _equal(a, b):
+    if a is None or b is None:
+        return None
+
+    # Text equals text as written, numbers equal by value
+    if isinstance(a, str) and isinstance(b, str):
+        return a == b
+
+    x, y = _comparable(a, b)
+
+    return x == y
+
+
+_ORDERING = {
+    "<": lambda x, y: x < y,
+    "<=": lambda x, y: x <= y,
+    ">": lambda x, y: x > y,
+    ">=": lambda x, y: x >= y,
+}
+
+
+def _order(op: str, a, b):
+    if a is None or b is None:
+        return None
+
+    return _ORDERING[op](*_comparable(a, b))
+
+
+def _arithmetic(op: str, a, b):
+    x, y = _as_number(a), _as_number(b)
+
+    if x is None or y is None:
+        return None
+
+    if op == "+":
+        return x + y
+    if op == "-":
+        return x - y
+    if op == "*":
+        return x * y
+    if y == 0:
+        return None
+    if op == "/":
+        return x / y
+
+    return x % y
+
+
+def _and(a, b):
+    if a is False or b is False:
+        return False
+
+    if a is None or b is None:
+        return None
+
+    return True
+
+
+def _or(a, b):
+    if a is True or b is True:
+        return True
+
+    if a is None or b is None:
+        return None
+
+    return False
+
+
+def _like_pattern(pattern: str):
+    """SoQL LIKE pattern (``%`` and ``_`` wildcards) as a regex."""
+    parts = (
+        ".*" if c == "%" else "." if c == "_" else re.escape(c) for c in str(pattern)
+    )
+
+    return re.compile("".join(parts), re.DOTALL)
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def _floating(moment: datetime):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}"
+
+
+def _truncate(**fields):
+    def truncate(value):
+        moment = _timestamp(value)
+
+        if moment is None:
+            return None
+
+        return _floating(
+            moment.replace(hour=0, minute=0, second=0, microsecond=0, **fields)
+        )
+
+    return truncate
+
+
+def _extract(field: str):
+    def extract(value):
+        moment = _timestamp(value)
+
+        if moment is None:
+            return None
+
+        if field == "dow":
+            return moment.isoweekday() % 7
+
+        if field == "woy":
+            return moment.isocalendar().week
+
+        return getattr(moment, field)
+
+    return extract
+
+
+def _point(value):
+    return None if value is None else decode_point(value)
+
+
+def _within_box(location, north, west, south, east):
+    point = _point(location)
+
+    if point is None:
+        return None
+
+    longitude, latitude = point
+    north, west, south, east = map(float, (north, west, south, east))
+
+    return south <= latitude <= north and west <= longitude <= east
+
+
+def _within_circle(location, latitude, longitude, radius):
+    point = _point(location)
+
+    if point is None:
+        return None
+
+    lon1, lat1 = map(math.radians, point)
+    lat2, lon2 = math.radians(float(latitude)), math.radians(float(longitude))
+
+    # Haversine distance in meters
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+
+    return 2 * 6_371_008.8 * math.asin(math.sqrt(a)) <= float(radius)
+
+
+_RING = re.compile(r"\(([^()]+)\)")
+
+
+def _within_polygon(location, polygon):
+    point = _point(location)
+
+    if point is None or polygon is None:
+        return None
+
+    x, y = point
+    inside = False
+
+    # Even-odd rule over every ring, so holes are left out
+    for ring in _RING.findall(str(polygon)):
+        vertices = [tuple(map(float, p.split())) for p in ring.split(",")]
+
+        for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]):
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+
+    return inside
+
+
+def _null_safe(function: Callable):
+    def call(*args):
+        if any(a is None for a in args):
+            return None
+
+        return function(*args)
+
+    return call
+
+
+FUNCTIONS: dict[str, Callable] = {
+    "upper": _null_safe(lambda v: str(v).upper()),
+    "lower": _null_safe(lambda v: str(v).lower()),
+    "length": _null_safe(lambda v: len(str(v))),
+    "trim": _null_safe(lambda v: str(v).strip()),
+    "starts_with": _null_safe(lambda v, p: str(v).startswith(str(p))),
+    "abs": _null_safe(lambda v: abs(_as_number(v))),
+    "coalesce": lambda *args: next((a for a in args if a is not None), None),
+    "date_trunc_y": _truncate(month=1, day=1),
+    "date_trunc_ym": _truncate(day=1),
+    "date_trunc_ymd": _truncate(),
+    "date_extract_y": _extract("year"),
+    "date_extract_m": _extract("month"),
+    "date_extract_d": _extract("day"),
+    "date_extract_hh": _extract("hour"),
+    "date_extract_mm": _extract("minute"),
+    "date_extract_ss": _extract("second"),
+    "date_extract_dow": _extract("dow"),
+    "date_extract_woy": _extract("woy"),
+    "within_box": _within_box,
+    "within_circle": _within_circle,
+    "within_polygon": _within_polygon,
+}
+
+
+def _sum(values: list):
+    numbers = [_as_number(v) for v in values]
+    numbers = [n for n in numbers if n is not None]
+
+    return sum(numbers) if numbers else None
+
+
+def _average(values: list):
+    numbers = [_as_number(v) for v in values]
+    numbers = [n for n in numbers if n is not None]
+
+    return sum(numbers) / len(numbers) if numbers else None
+
+
+def _extreme(pick: Callable):
+    def extreme(values: list):
+        values = [v for v in values if v is not None]
+
+        if not values:
+            return None
+
+        numbers = [_as_number(v) for v in values]
+
+        if all(n is not None for n in numbers):
+            return values[numbers.index(pick(numbers))]
+
+        return pick(values, key=str)
+
+    return extreme
+
+
+AGGREGATES: dict[str, Callable] = {
+    "count": lambda values: sum(v is not None for v in values),
+    "sum": _sum,
+    "avg": _average,
+    "min": _extreme(min),
+    "max": _extreme(max),
+}
+
+
+# Compilation
+
+
+def _is_aggregate(node: tuple):
+    """Whether a node calls an aggregate function."""
+    if node[0] == "call" and node[1] in AGGREGATES:
+        return True
+
+    children = []
+
+    for child in node[1:]:
+        children.extend(child if isinstance(child, list) else [child])
+
+    return any(_is_aggregate(c) for c in children if isinstance(c, tuple))
+
+
+def _compile(node: tuple, grouped: bool = False):
+    """Function evaluating a node against a record, or against the list of
+    records of a group when ``grouped``."""
+    kind = node[0]
+
+    if kind == "literal":
+        value = node[1]
+
+        return lambda context: value
+
+    if kind == "column":
+        name = node[1]
+
+        if grouped:
+            return lambda group: group[0].get(name) if group else None
+
+        return lambda record: record.get(name)
+
+    if kind == "call" and node[1] in AGGREGATES:
+        if not grouped:
+            raise ValueError(f"Aggregate {node[1]}() not allowed here.")
+
+        _, name, args, distinct = node
+        aggregate = AGGREGATES[name]
+
+        if args == [("star",)]:
+            return len
+
+        if len(args) != 1:
+            raise ValueError(f"Aggregate {name}() takes one argument.")
+
+        argument = _compile(args[0])
+
+        def evaluate(group):
+            values = [argument(record) for record in group]
+
+            if distinct:
+                seen = {json.dumps(v, sort_keys=True): v for v in values}
+                values = list(seen.values())
+
+            return aggregate(values)
+
+        return evaluate
+
+    if kind == "call":
+        _, name, args, _ = node
+
+        if name not in FUNCTIONS:
+            raise ValueError(f"Function {name}() not supported locally.")
+
+        function = FUNCTIONS[name]
+        arguments = [_compile(a, grouped) for a in args]
+
+        return lambda context: function(*(a(context) for a in arguments))
+
+    if kind == "binary":
+        _, op, left, right = node
+        left, right = _compile(left, grouped), _compile(right, grouped)
+
+        if op == "and":
+            return lambda context: _and(left(context), right(context))
+
+        if op == "or":
+            return lambda context: _or(left(context), right(context))
+
+        if op == "=":
+            return lambda context: _equal(left(context), right(context))
+
+        if op == "!=":
+
+            def different(context):
+                equal = _equal(left(context), right(context))
+
+                return None if equal is None else not equal
+
+            return different
+
+        if op in _ORDERING:
+            return lambda context: _order(op, left(context), right(context))
+
+        if op == "||":
+
+            def concatenate(context):
+                a, b = left(context), right(context)
+
+                return None if a is None or b is None else f"{a}{b}"
+
+            return concatenate
+
+        return lambda context: _arithmetic(op, left(context), right(context))
+
+    if kind == "not":
+        operand = _compile(node[1], grouped)
+
+        def negate(context):
+            value = operand(context)
+
+            return None if value is None else not value
+
+        return negate
+
+    if kind == "neg":
+        operand = _compile(node[1], grouped)
+
+        return lambda context: _arithmetic("-", 0, operand(context))
+
+    if kind == "null":
+        operand, negated = _compile(node[1], grouped), node[2]
+
+        return lambda context: (operand(context) is None) != negated
+
+    if kind == "in":
+        operand = _compile(node[1], grouped)
+        items = [_compile(i, grouped) for i in node[2]]
+        negated = node[3]
+
+        def contains(context):
+            value = operand(context)
+
+            if value is None:
+                return None
+
+            found = any(_equal(value, i(context)) for i in items)
+
+            return found != negated
+
+        return contains
+
+    if kind == "between":
+        operand = _compile(node[1], grouped)
+        low, high = _compile(node[2], grouped), _compile(node[3], grouped)
+        negated = node[4]
+
+        def between(context):
+            value = operand(context)
+            inside = _and(
+                _order(">=", value, low(context)), _order("<=", value, high(context))
+            )
+
+            return None if inside is None else inside != negated
+
+        return between
+
+    if kind == "like":
+        operand, pattern = _compile(node[1], grouped), _compile(node[2], grouped)
+        negated = node[3]
+
+        patterns = {}
+
+        def like(context):
+            value, text = operand(context), pattern(context)
+
+            if value is None or text is None:
+                return None
+
+            if text not in patterns:
+                patterns[text] = _like_pattern(text)
+
+            return bool(patterns[text].fullmatch(str(value))) != negated
+
+        return like
+
+    raise ValueError(f"Expression {kind} not supported locally.")
+
+
+def _column_name(node: tuple):
+    """Output name SODA gives an unaliased selection."""
+    kind = node[0]
+
+    if kind == "column":
+        return node[1]
+
+    if kind == "call":
+        args = [
+            _column_name(a) for a in node[2] if a[0] != "star" and a[0] != "literal"
+        ]
+
+        return "_".join([node[1], *[a.lstrip(":") for a in args]])
+
+    if kind == "literal":
+        return str(node[1])
+
+    return kind
+
+
+def _substitute(node, aliases: dict):
+    """Replace columns naming a selection alias by the aliased expression."""
+    if not isinstance(node, tuple):
+        return node
+
+    if node[0] == "column" and node[1] in aliases:
+        return aliases[node[1]]
+
+    return tuple(
+        [_substitute(n, aliases) for n in child]
+        if isinstance(child, list)
+        else _substitute(child, aliases)
+        for child in node
+    )
+
+
+def _render(value):
+    """Computed numbers as text, like SODA returns them."""
+    if isinstance(value, bool) or value is None:
+        return value
+
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    return value
+
+
+def _sort_key(values: list):
+    """Key sorting values as numbers when all look like numbers, as text
+    otherwise."""
+    numeric = all(_as_number(v) is not None for v in values)
+
+    return _as_number if numeric else str
+
+
+class Query:
+    """A SoQL query compiled for local execution.
+
+    Build one with ``parse_query`` or ``payload_query``.
+    """
+
+    def __init__(self, clauses: dict, q: str | None = None, system: bool = False):
+        """Query Instantiation.
+
+        Parameters
+        ----------
+        clauses : dict
+            Parsed clauses (see ``_Parser.statement``)
+        q : str | None
+            Text every matched record must contain (``$q``), case-insensitive
+        system : bool
+            Whether ``*`` includes system fields (``:id``, ``:updated_at``)
+        """
+        self.q = q.lower() if q else None
+        self.system = system
+
+        self.limit = clauses.get("limit")
+        self.offset = clauses.get("offset", 0)
+
+        select = clauses.get("select") or [(("star",), None)]
+
+        aliases = {alias: node for node, alias in select if alias}
+
+        self.grouped = bool(clauses.get("group")) or any(
+            _is_aggregate(node) for node, _ in select
+        )
+
+        where = clauses.get("where")
+
+        if where is not None and _is_aggregate(where):
+            raise ValueError("Aggregates are not allowed in WHERE.")
+
+        self.where = _compile(where) if where is not None else None
+
+        self.group = [
+            _compile(_substitute(node, aliases)) for node in clauses.get("group") or []
+        ]
+
+        having = clauses.get("having")
+
+        if having is not None and not self.grouped:
+            raise ValueError("HAVING requires GROUP BY or aggregates.")
+
+        self.having = (
+            _compile(_substitute(having, aliases), grouped=True)
+            if having is not None
+            else None
+        )
+
+        self.select = [
+            (
+                None if node[0] == "star" else _compile(node, self.grouped),
+                alias or _column_name(node),
+                node[0] != "column",
+            )
+            for node, alias in select
+        ]
+
+        if self.grouped and any(f is None for f, _, _ in self.select):
+            raise ValueError("SELECT * is not allowed with GROUP BY or aggregates.")
+
+        self.order = [
+            (_compile(_substitute(node, aliases), self.grouped), descending)
+            for node, descending in clauses.get("order") or []
+        ]
+
+    def execute(self, records: Iterable[dict]):
+        """Returns the records matched, as SODA would.
+
+        Parameters
+        ----------
+        records : Iterable[dict]
+            Records of the dataset
+        """
+        rows = (r for r in records if self._matches(r))
+
+        if self.grouped:
+            contexts = self._groups(rows)
+        else:
+            contexts = list(rows)
+
+        # Sort by the last key first, stable sorts keep earlier keys on top
+
+        for evaluate, descending in reversed(self.order):
+            values = [evaluate(c) for c in contexts]
+
+            present = [i for i, v in enumerate(values) if v is not None]
+            nulls = [i for i, v in enumerate(values) if v is None]
+
+            key = _sort_key([values[i] for i in present])
+            present.sort(key=lambda i: key(values[i]), reverse=descending)
+
+            # Nulls sort last ascending and first descending, like PostgreSQL
+            order = nulls + present if descending else present + nulls
+
+            contexts = [contexts[i] for i in order]
+
+        end = None if self.limit is None else self.offset + self.limit
+
+        return [self._project(c) for c in contexts[self.offset : end]]
+
+    def _matches(self, record: dict):
+        if self.where is not None and self.where(record) is not True:
+            return False
+
+        if self.q is not None:
+            text = " ".join(str(v) for v in record.values() if v is not None)
+
+            return self.q in text.lower()
+
+        return True
+
+    def _groups(self, rows):
+        groups = {}
+
+        for record in rows:
+            key = tuple(json.dumps(g(record), sort_keys=True) for g in self.group)
+            groups.setdefault(key, []).append(record)
+
+        # Aggregates without GROUP BY make a single group, even when empty
+
+        if not self.group and not groups:
+            groups[()] = []
+
+        contexts = list(groups.values())
+
+        if self.having is not None:
+            contexts = [g for g in contexts if self.having(g) is True]
+
+        return contexts
+
+    def _project(self, context):
+        output = {}
+
+        for evaluate, name, computed in self.select:
+            if evaluate is None:
+                output.update(
+                    (k, v)
+                    for k, v in context.items()
+                    if self.system or not k.startswith(":")
+                )
+
+                continue
+
+            value = evaluate(context)
+
+            if value is None:
+                continue
+
+            output[name] = _render(value) if computed else value
+
+        return output
+
+
+def parse_query(text: str, q: str | None = None, system: bool = False):
+    """Parse a SoQL statement (``SELECT ... [WHERE ...] ...``) as a Query.
+
+    Parameters
+    ----------
+    text : str
+        SoQL statement, as sent by SODA 3.0 clients
+    q : str | None
+        Full-text filter (see ``Query``)
+    system : bool
+        Whether ``*`` includes system fields
+    """
+    return Query(_Parser(text).statement(), q=q, system=system)
+
+
+def payload_query(payload: dict):
+    """Query of a payload as returned by ``format_payload``, 2.1 or 3.0.
+
+    Parameters
+    ----------
+    payload : dict
+        ``$``-parameters (2.1), or ``query`` and ``page`` (3.0)
+    """
+    if "query" in payload:
+        query = parse_query(
+            payload["query"], system=bool(payload.get("includeSystem", False))
+        )
+
+        page = payload.get("page")
+
+        if page:
+            query.limit = int(page["pageSize"])
+            query.offset = (int(page["pageNumber"]) - 1) * query.limit
+
+        return query
+
+    statement = f"SELECT {payload.get('$select') or '*'}"
+
+    for clause, param in [
+        ("WHERE", "$where"),
+        ("GROUP BY", "$group"),
+        ("HAVING", "$having"),
+        ("ORDER BY", "$order"),
+    ]:
+        if payload.get(param):
+            statement = f"{statement} {clause} {payload[param]}"
+
+    query = parse_query(statement, q=payload.get("$q"))
+
+    query.limit = int(payload.get("$limit", 1000))
+    query.offset = int(payload.get("$offset", 0))
+
+    return query
+
+
+class SnapshotAdapter(BaseAdapter):
+    """Transport adapter answering resource queries from a local snapshot.
+
+    Requests to 2.1 (``/resource/{id}.json``) and 3.0
+    (``/api/v3/views/{id}/query.json``) resource endpoints run their query
+    against the records the store holds for the request's domain. Any other
+    endpoint answers ``404``, and queries the engine cannot run ``400``.
+
+    Records are read from the store once per dataset, and the results of the
+    latest queries are kept, so paging through them costs one slice per page.
+    """
+
+    RESOURCE = re.compile(
+        r"^/(?:resource/(?P<v2>\w{4}-\w{4})\.json"
+        r"|api/v3/views/(?P<v3>\w{4}-\w{4})/query\.json)$"
+    )
+
+    MAX_RESULTS = 8
+
+    def __init__(self, store: "SyncStore") -> None:
+        """SnapshotAdapter Instantiation.
+
+        Parameters
+        ----------
+        store : SyncStore
+            Store of the snapshots, or any object with a
+            ``records(domain, identifier)`` method
+        """
+        super().__init__()
+
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._records: dict[tuple, list] = {}
+        self._results: OrderedDict[tuple, list] = OrderedDict()
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        match = self.RESOURCE.match(url.path)
+
+        if match is None:
+            return self._respond(request, 404, {"message": "Not in snapshot"})
+
+        identifier = match.group("v2") or match.group("v3")
+
+        if match.group("v2"):
+            payload = dict(parse_qsl(url.query))
+        else:
+            payload = json.loads(request.body or "{}")
+
+        try:
+            query = payload_query(payload)
+
+            records = self._query(url.hostname, identifier, payload, query)
+
+        except (ValueError, TypeError, KeyError) as e:
+            return self._respond(request, 400, {"error": True, "message": str(e)})
+
+        return self._respond(request, 200, records)
+
+    def _query(self, domain: str, identifier: str, payload: dict, query: Query):
+        """Records of the page, from the query's cached results."""
+        # Results are kept regardless of paging, which only slices them
+
+        paging = ("$limit", "$offset", "page")
+        key = (
+            domain,
+            identifier,
+            json.dumps({k: v for k, v in payload.items() if k not in paging}),
+        )
+
+        with self._lock:
+            results = self._results.get(key)
+
+            if results is not None:
+                self._results.move_to_end(key)
+
+            elif (domain, identifier) not in self._records:
+                self._records[(domain, identifier)] = list(
+                    self.store.records(domain, identifier)
+                )
+
+            records = self._records[(domain, identifier)]
+
+        if results is None:
+            limit, offset = query.limit, query.offset
+            query.limit, query.offset = None, 0
+
+            results = query.execute(records)
+
+            query.limit, query.offset = limit, offset
+
+            with self._lock:
+                self._results[key] = results
+
+                while len(self._results) > self.MAX_RESULTS:
+                    self._results.popitem(last=False)
+
+        end = None if query.limit is None else query.offset + query.limit
+
+        return results[query.offset : end]
+
+    def _respond(self, request, status: int, body):
+        response = Response()
+
+        response.status_code = status
+        response.reason = "OK" if status == 200 else "Error"
+        response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+        response.raw = io.BytesIO(json.dumps(body).encode("utf-8"))
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+
+        return response
+
+    def clear(self):
+        """Forget the records and results read so far, e.g. after a sync."""
+        with self._lock:
+            self._records.clear()
+            self._results.clear()
+
+    def close(self):
+        self.clear()
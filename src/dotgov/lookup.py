@@ -0,0 +1,173 @@
+from collections.abc import Iterable
+from urllib.parse import quote_plus, urlencode
+import json
+import logging
+
+from .prepared import soql_literal
+from .socrata import Payload, Socrata, run_ordered
+
+
+logger = logging.getLogger(__name__)
+
+# Request sizes chunks are kept within: 2.1 sends the URL, 3.0 the JSON body
+
+MAX_URL_LENGTH = 4096
+MAX_BODY_LENGTH = 256 * 2**10
+
+
+def lookup_resource(
+    socrata: Socrata,
+    identifier: str,
+    column: str,
+    keys: Iterable,
+    filters: Payload | dict | None = None,
+    workers: int | None = None,
+    max_keys: int | None = None,
+    **kwargs,
+):
+    """Returns the records whose ``column`` matches any of many keys.
+
+    Keys are deduplicated by the value they match (see ``_key_value``) and
+    split into ``column in (...)`` chunks, each as
+    large as the request allows: ``MAX_URL_LENGTH`` for 2.1 GET requests,
+    ``MAX_BODY_LENGTH`` for 3.0 POST requests. Chunks are queried
+    concurrently and records are yielded in chunk order. Each row holds one
+    ``column`` value, so it matches a single chunk and is yielded once.
+    Errors are raised.
+
+    Parameters
+    ----------
+    socrata : Socrata
+        Client for the dataset's domain
+    identifier : str
+        Resource ID
+    column : str
+        Column holding the keys
+    keys : Iterable
+        Values to look up (see ``soql_literal`` for the types accepted)
+    filters : Payload | dict | None
+        Filters for the request (see Payload), the WHERE clause is combined
+        with each chunk's. Rows are ordered by ``:id`` unless ``order`` is
+        given, so chunks matching several pages page deterministically.
+    workers : int | None
+        Number of chunks queried concurrently
+    max_keys : int | None
+        Largest number of keys per chunk, on top of the size limits
+    **kwargs : dict
+        Arguments for ``Socrata.query_pages`` (e.g. ``timeout``)
+    """
+    if not socrata.session:
+        socrata.open()
+
+    filters = socrata.validate_payload(filters=filters)
+
+    if not filters.order:
+        filters = filters.model_copy(update={"order": ":id"})
+
+    distinct = {}
+
+    for key in keys:
+        distinct.setdefault(_key_value(key), key)
+
+    keys = list(distinct.values())
+
+    chunks = list(chunk_keys(socrata, identifier, column, keys, filters, max_keys))
+
+    logger.info(f"{len(keys)} keys in {len(chunks)} chunks")
+
+    def run(chunk: list):
+        chunk_filters = _chunk_filters(filters, column, chunk)
+
+        pages = socrata.query_pages(identifier, filters=chunk_filters, **kwargs)
+
+        return [record for records in pages for record in records]
+
+    for records in run_ordered(run, chunks, workers or 1):
+        yield from records
+
+
+def chunk_keys(
+    socrata: Socrata,
+    identifier: str,
+    column: str,
+    keys: list,
+    filters: Payload,
+    max_keys: int | None = None,
+):
+    """Split keys into chunks whose requests stay within the size limits.
+
+    Parameters
+    ----------
+    socrata : Socrata
+        Client the requests are meant for
+    identifier : str
+        Resource ID
+    column : str
+        Column holding the keys
+    keys : list
+        Values to look up
+    filters : Payload
+        Filters combined with each chunk
+    max_keys : int | None
+        Largest number of keys per chunk
+    """
+    payload = socrata.format_payload(filters=_chunk_filters(filters, column, []))
+
+    if socrata.version > 2.1:
+        budget = MAX_BODY_LENGTH - len(json.dumps(payload))
+
+        def cost(literal: str):
+            return len(json.dumps(literal)) - 2 + len(", ")
+
+    else:
+        uri = socrata.format_uri(socrata.format_endpoint(identifier=identifier))
+
+        budget = MAX_URL_LENGTH - len(uri) - len(urlencode(payload)) - 1
+
+        def cost(literal: str):
+            return len(quote_plus(f"{literal}, "))
+
+    chunk = []
+    used = 0
+
+    for key in keys:
+        literal = soql_literal(key)
+        size = cost(literal)
+
+        full = max_keys is not None and len(chunk) >= max_keys
+
+        if chunk and (used + size > budget or full):
+            yield chunk
+
+            chunk = []
+            used = 0
+
+        if size > budget:
+            raise ValueError(f"Key {key!r} alone exceeds the request size limit.")
+
+        chunk.append(key)
+        used += size
+
+    if chunk:
+        yield chunk
+
+
+def _key_value(key):
+    """Value a key matches, its SoQL literal without string quotes since the
+    portal casts ``1`` and ``'1'`` to the column's type alike."""
+    literal = soql_literal(key)
+
+    if isinstance(key, str):
+        return literal[1:-1]
+
+    return literal
+
+
+def _chunk_filters(filters: Payload, column: str, chunk: list):
+    """Filters restricting rows to a chunk of keys."""
+    values = ", ".join(soql_literal(k) for k in chunk)
+    match = f"{column} in ({values})"
+
+    where = f"({filters.where}) AND {match}" if filters.where else match
+
+    return filters.model_copy(update={"where": where})
@@ -0,0 +1,161 @@
+from bisect import bisect_left
+import threading
+
+from pydantic import BaseModel
+
+
+class RequestMetric(BaseModel):
+    """Measurements of a single request to a SODA API.
+
+    Attributes
+    ----------
+    domain : str
+        Domain requested
+    dataset : str
+        Resource ID, or "catalog" for the Discover API
+    method : str
+        HTTP method
+    status : int | None
+        HTTP status, None when no response was received
+    seconds : float
+        Time waiting on the network, until the body was received
+    decode_seconds : float | None
+        Time decoding the body, None when decoded as it streamed
+    bytes : int
+        Size of the body received
+    rows : int | None
+        Number of records (or datasets) in the page
+    retries : int
+        Number of times the request was retried by the transport
+    """
+
+    domain: str
+    dataset: str
+    method: str
+    status: int | None = None
+    seconds: float = 0.0
+    decode_seconds: float | None = None
+    bytes: int = 0
+    rows: int | None = None
+    retries: int = 0
+
+
+class PrometheusCollector:
+    """Metrics hook aggregating requests, rendered in Prometheus text format.
+
+    Pass an instance as ``metrics`` to ``Socrata`` and serve ``render()``
+    from a ``/metrics`` endpoint. Series are labeled by domain and dataset.
+    """
+
+    PREFIX = "dotgov"
+
+    SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    ROWS_BUCKETS = (10, 100, 1_000, 10_000, 50_000)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+        self._counters: dict[str, dict[tuple, float]] = {
+            "requests_total": {},
+            "response_bytes_total": {},
+            "rows_total": {},
+            "retries_total": {},
+        }
+
+        self._histograms: dict[str, tuple[tuple, dict[tuple, list]]] = {
+            "request_seconds": (self.SECONDS_BUCKETS, {}),
+            "decode_seconds": (self.SECONDS_BUCKETS, {}),
+            "page_rows": (self.ROWS_BUCKETS, {}),
+        }
+
+    def __call__(self, metric: RequestMetric):
+        """Record a request.
+
+        Parameters
+        ----------
+        metric : RequestMetric
+            Measurements of the request
+        """
+        labels = (("domain", metric.domain), ("dataset", metric.dataset))
+        status = (*labels, ("status", str(metric.status or "error")))
+
+        with self._lock:
+            self._add("requests_total", status, 1)
+            self._add("response_bytes_total", labels, metric.bytes)
+            self._add("retries_total", labels, metric.retries)
+
+            self._observe("request_seconds", labels, metric.seconds)
+
+            if metric.decode_seconds is not None:
+                self._observe("decode_seconds", labels, metric.decode_seconds)
+
+            if metric.rows is not None:
+                self._add("rows_total", labels, metric.rows)
+                self._observe("page_rows", labels, metric.rows)
+
+    def render(self):
+        """Returns the metrics in Prometheus text exposition format."""
+        lines = []
+
+        with self._lock:
+            for name, series in self._counters.items():
+                metric = f"{self.PREFIX}_{name}"
+
+                lines.append(f"# TYPE {metric} counter")
+
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+
+            for name, (buckets, series) in self._histograms.items():
+                metric = f"{self.PREFIX}_{name}"
+
+                lines.append(f"# TYPE {metric} histogram")
+
+                for labels, (counts, total, n) in sorted(series.items()):
+                    cumulative = 0
+
+                    for bound, count in zip((*buckets, "+Inf"), counts):
+                        cumulative += count
+
+                        le = (*labels, ("le", _number(bound)))
+                        lines.append(f"{metric}_bucket{_labels(le)} {cumulative}")
+
+                    lines.append(f"{metric}_sum{_labels(labels)} {_number(total)}")
+                    lines.append(f"{metric}_count{_labels(labels)} {n}")
+
+        return "\n".join(lines) + "\n"
+
+    def _add(self, name: str, labels: tuple, value: float):
+        series = self._counters[name]
+        series[labels] = series.get(labels, 0) + value
+
+    def _observe(self, name: str, labels: tuple, value: float):
+        buckets, series = self._histograms[name]
+
+        counts, total, n = series.get(labels) or ([0] * (len(buckets) + 1), 0, 0)
+        counts[bisect_left(buckets, value)] += 1
+
+        series[labels] = (counts, total + value, n + 1)
+
+
+def _labels(labels: tuple):
+    """Label set in exposition format, values escaped."""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            k, str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+        )
+        for k, v in labels
+    )
+
+    return f"{{{pairs}}}"
+
+
+def _number(value):
+    """Number in exposition format."""
+    if isinstance(value, str):
+        return value
+
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+
+    return str(value)
@@ -0,0 +1,296 @@
+"""Parquet sink for streams of SODA API records.
+
+Requires the optional ``pyarrow`` dependency, ``pip install dotgov[arrow]``.
+"""
+
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .arrow import record_batch
+
+
+logger = logging.getLogger(__name__)
+
+
+class ParquetSink:
+    """Write a stream of records as Parquet files with bounded memory.
+
+    Records are buffered per partition and written one row group at a time.
+    Files are staged under a hidden directory and only moved into place,
+    with a ``_manifest.json`` listing them, when the sink is finalized.
+
+    With ``partition_by``, files are laid out Hive-style
+    (``{partition_by}={value}/part-00000.parquet``) so readers can prune
+    partitions instead of scanning everything.
+    """
+
+    MANIFEST = "_manifest.json"
+    NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+    def __init__(
+        self,
+        path: str | Path,
+        schema: pa.Schema | None = None,
+        partition_by: str | None = None,
+        partition: Callable[[dict], Any] | None = None,
+        row_group_size: int = 100_000,
+        max_rows_per_file: int = 1_000_000,
+        max_buffered_rows: int = 500_000,
+    ) -> None:
+        """ParquetSink Instantiation.
+
+        Parameters
+        ----------
+        path : str | Path
+            Output directory
+        schema : pa.Schema | None
+            Schema of the files, e.g. ``schema_from_columns(columns)``, fields
+            it lacks are left out. By default text columns are inferred from
+            the row groups: SODA omits null fields, so when a later row group
+            brings new fields the open files are closed and the next ones
+            carry the wider schema, recorded in the manifest. Earlier files
+            then read the new columns as null.
+        partition_by : str | None
+            Name of the partition key, used for directory names
+        partition : Callable[[dict], Any] | None
+            Function computing the partition value of a record, by default
+            the value of the ``partition_by`` field
+        row_group_size : int
+            Number of rows per row group
+        max_rows_per_file : int
+            Number of rows after which a new file is started
+        max_buffered_rows : int
+            Number of rows buffered across partitions before the largest
+            buffer is written
+        """
+        self.path = Path(path)
+        self.schema = schema
+        self.infer_schema = schema is None
+        self.partition_by = partition_by
+        self.partition = partition
+        self.row_group_size = row_group_size
+        self.max_rows_per_file = max_rows_per_file
+        self.max_buffered_rows = max_buffered_rows
+
+        self.rows = 0
+        self.files: list[dict] = []
+
+        self._buffers: dict[Any, list[dict]] = {}
+        self._buffered = 0
+        self._writers: dict[Any, tuple[pq.ParquetWriter, dict]] = {}
+        self._counts: dict[Any, int] = {}
+
+        self._staging = self.path / f".staging-{uuid.uuid4().hex}"
+        self._staging.mkdir(parents=True, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type:
+            logger.error(f"Error writing Parquet files: {exc_value}")
+
+            self.abort()
+
+        else:
+            self.finalize()
+
+        # Returning False so exceptions propagate
+
+        return False
+
+    def write(self, records: Iterable[dict]):
+        """Buffer records, writing full row groups as they fill up.
+
+        Parameters
+        ----------
+        records : Iterable[dict]
+            Records, e.g. from ``Socrata.query_resource``
+        """
+        for record in records:
+            key = self._partition_value(record)
+
+            buffer = self._buffers.setdefault(key, [])
+            buffer.append(record)
+
+            self._buffered += 1
+            self.rows += 1
+
+            if len(buffer) >= self.row_group_size:
+                self._flush(key)
+
+            elif self._buffered >= self.max_buffered_rows:
+                self._flush(max(self._buffers, key=lambda k: len(self._buffers[k])))
+
+    def finalize(self):
+        """Write remaining rows, move files into place and write the manifest.
+
+        Returns the manifest.
+        """
+        for key in list(self._buffers):
+            self._flush(key)
+
+        for key in list(self._writers):
+            self._close_writer(key)
+
+        for entry in self.files:
+            target = self.path / entry["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+
+            os.replace(self._staging / entry["path"], target)
+
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+        manifest = {
+            "rows": self.rows,
+            "partition_by": self.partition_by,
+            "schema": self.schema.to_string() if self.schema else None,
+            "files": self.files,
+        }
+
+        staged = self.path / f"{self.MANIFEST}.tmp"
+        staged.write_text(json.dumps(manifest, indent=2))
+
+        os.replace(staged, self.path / self.MANIFEST)
+
+        logger.info(f"{self.rows} rows written to {len(self.files)} files")
+
+        return manifest
+
+    def abort(self):
+        """Discard buffered rows and staged files."""
+        for writer, _ in self._writers.values():
+            writer.close()
+
+        self._writers.clear()
+        self._buffers.clear()
+        self.files.clear()
+
+        shutil.rmtree(self._staging, ignore_errors=True)
+
+    def _partition_value(self, record: dict):
+        """Partition value of a record, None when not partitioning."""
+        if self.partition_by is None:
+            return None
+
+        if self.partition is not None:
+            return self.partition(record)
+
+        return record.get(self.partition_by)
+
+    def _flush(self, key):
+        """Write the buffer of a partition as one row group."""
+        records = self._buffers.pop(key, [])
+
+        if not records:
+            return
+
+        self._buffered -= len(records)
+
+        if self.infer_schema:
+            self._widen(records)
+
+        batch = record_batch(records, self.schema)
+
+        writer, entry = self._writer(key)
+
+        writer.write_batch(batch, row_group_size=self.row_group_size)
+
+        entry["rows"] += batch.num_rows
+
+        if entry["rows"] >= self.max_rows_per_file:
+            self._close_writer(key)
+
+    def _widen(self, records: list[dict]):
+        """Add the fields of records missing from the inferred schema as text,
+        closing open files so the next ones carry them."""
+        known = set(self.schema.names) if self.schema is not None else set()
+
+        names = [
+            n for n in dict.fromkeys(k for r in records for k in r) if n not in known
+        ]
+
+        if not names:
+            return
+
+        if self.schema is not None:
+            logger.info(f"New fields {names}, starting new files")
+
+            for key in list(self._writers):
+                self._close_writer(key)
+
+        fields = [*(self.schema or []), *(pa.field(n, pa.string()) for n in names)]
+
+        self.schema = pa.schema(fields)
+
+    def _writer(self, key):
+        """Open writer of a partition, starting a new file if needed."""
+        if key in self._writers:
+            return self._writers[key]
+
+        n = self._counts.get(key, 0)
+        self._counts[key] = n + 1
+
+        if self.partition_by is None:
+            directory = Path()
+            partition = {}
+        else:
+            value = self.NULL_PARTITION if key is None else escape_partition(key)
+
+            directory = Path(f"{escape_partition(self.partition_by)}={value}")
+            partition = {self.partition_by: None if key is None else str(key)}
+
+        relative = directory / f"part-{n:05d}.parquet"
+
+        (self._staging / directory).mkdir(parents=True, exist_ok=True)
+
+        writer = pq.ParquetWriter(self._staging / relative, self.schema)
+        entry = {"path": relative.as_posix(), "rows": 0, "partition": partition}
+
+        self._writers[key] = (writer, entry)
+
+        return writer, entry
+
+    def _close_writer(self, key):
+        """Close the writer of a partition and record its file."""
+        writer, entry = self._writers.pop(key)
+        writer.close()
+
+        self.files.append(entry)
+
+
+# Characters Hive escapes in partition directory names, besides controls
+
+_UNSAFE = frozenset("\"#%'*/:=?\\[]^{}")
+
+
+def escape_partition(value) -> str:
+    """Percent-escape a partition key or value for a directory name.
+
+    Characters Hive escapes (``/``, ``=``, ``%``, control characters...) are
+    encoded, as are ``.`` and ``..`` in full, so values never leave their
+    directory. Readers using Hive partitioning decode them back.
+
+    Parameters
+    ----------
+    value : Any
+        Partition key or value, converted with ``str``
+    """
+    value = str(value)
+
+    if value in (".", ".."):
+        return "%2E" * len(value)
+
+    return "".join(
+        f"%{ord(c):02X}" if c in _UNSAFE or ord(c) < 0x20 or ord(c) == 0x7F else c
+        for c in value
+    )
@@ -0,0 +1,225 @@
+from collections.abc import Iterable
+from datetime import date, datetime
+from decimal import Decimal
+from string import Formatter
+import logging
+import math
+
+from .socrata import Payload, Socrata, run_ordered
+
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedQuery:
+    """Query validated and compiled once, executed with bound parameters.
+
+    Clauses reference parameters as ``{name}``, e.g.
+    ``{"where": "ward = {ward} AND date > {since}"}``. Each execution only
+    substitutes escaped values (see ``soql_literal``) into the compiled
+    payload, for both the 2.1 ``$``-params and the 3.0 ``query`` string.
+    Literal braces are written ``{{`` and ``}}``.
+    """
+
+    def __init__(
+        self,
+        socrata: Socrata,
+        identifier: str,
+        filters: Payload | dict | None = None,
+    ) -> None:
+        """PreparedQuery Instantiation.
+
+        Parameters
+        ----------
+        socrata : Socrata
+            Client executing the query, its session is shared by executions
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload), raising if not valid. Rows
+            are ordered by ``:id`` unless ``order`` or ``group`` is given.
+        """
+        self.socrata = socrata
+        self.identifier = identifier
+
+        if isinstance(filters, Payload):
+            payload = filters
+        else:
+            payload = Payload(**{"version": socrata.version, **(filters or {})})
+
+        # Pages need a deterministic order, grouped rows have no :id
+
+        if not payload.order and not payload.group:
+            payload = payload.model_copy(update={"order": ":id"})
+
+        self.uri = socrata.format_uri(socrata.format_endpoint(identifier=identifier))
+        self.payload = socrata.format_payload(filters=payload)
+
+        self._templates = {
+            key: _compile(value)
+            for key, value in self.payload.items()
+            if isinstance(value, str)
+        }
+
+        self.parameters = frozenset(
+            part for segments in self._templates.values() for part in segments[1::2]
+        )
+
+    def bind(self, values: dict | None = None, **kwargs):
+        """Returns the payload of the first page with parameters substituted.
+
+        Parameters
+        ----------
+        values : dict | None
+            Value of each parameter
+        **kwargs : dict
+            Values of parameters, as keyword arguments
+        """
+        values = {**(values or {}), **kwargs}
+
+        missing = self.parameters - values.keys()
+        unknown = values.keys() - self.parameters
+
+        if missing or unknown:
+            raise ValueError(
+                f"Missing parameters {sorted(missing)}, unknown {sorted(unknown)}."
+            )
+
+        literals = {k: soql_literal(v) for k, v in values.items()}
+
+        payload = dict(self.payload)
+
+        for key, segments in self._templates.items():
+            payload[key] = "".join(
+                literals[part] if i % 2 else part for i, part in enumerate(segments)
+            )
+
+        return payload
+
+    def execute(self, values: dict | None = None, **kwargs):
+        """Returns the records matched with the given parameters.
+
+        Pages are requested until one comes back empty and advanced with
+        ``Socrata.advance_payload``, as ``query_pages`` does. Errors are
+        raised.
+
+        Parameters
+        ----------
+        values : dict | None
+            Value of each parameter
+        **kwargs : dict
+            Arguments for the request (e.g. ``timeout``)
+        """
+        socrata = self.socrata
+
+        if not socrata.session:
+            socrata.open()
+
+        payload = self.bind(values)
+
+        while True:
+            records = socrata.fetch_page(self.uri, payload, **kwargs)
+
+            if not records:
+                break
+
+            yield from records
+
+            payload = socrata.advance_payload(dict(payload), len(records))
+
+    def execute_many(
+        self,
+        bindings: Iterable[dict],
+        workers: int | None = None,
+        **kwargs,
+    ):
+        """Returns the records of each binding, in order, as lists.
+
+        Parameters
+        ----------
+        bindings : Iterable[dict]
+            Values of the parameters, one dict per execution
+        workers : int | None
+            Number of executions run concurrently over the shared session,
+            bindings are read as executions finish (see ``run_ordered``)
+        **kwargs : dict
+            Arguments for the requests (e.g. ``timeout``)
+        """
+        if not self.socrata.session:
+            self.socrata.open()
+
+        def run(values: dict):
+            return list(self.execute(values, **kwargs))
+
+        yield from run_ordered(run, bindings, workers or 1)
+
+
+def soql_literal(value):
+    """Render a Python value as a SoQL literal.
+
+    Strings are quoted with single quotes doubled, dates and datetimes
+    become floating timestamps, and lists, tuples and sets become
+    parenthesized lists for ``IN``.
+
+    Parameters
+    ----------
+    value : str | int | float | Decimal | bool | date | datetime | list | tuple | set | None
+        Value to render
+    """
+    if value is None:
+        return "null"
+
+    if isinstance(value, bool):
+        return "true" if value else "false"
+
+    if isinstance(value, (int, Decimal)):
+        return str(value)
+
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError(f"Value {value} has no SoQL literal.")
+
+        return repr(value)
+
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None).isoformat(timespec="milliseconds")
+
+        return f"'{value}'"
+
+    if isinstance(value, date):
+        return f"'{value.isoformat()}T00:00:00.000'"
+
+    if isinstance(value, str):
+        return "'{}'".format(value.replace("'", "''"))
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        if not value:
+            raise ValueError("Empty lists have no SoQL literal.")
+
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else value
+
+        return "({})".format(", ".join(soql_literal(v) for v in items))
+
+    raise ValueError(f"Datatype {type(value).__name__} has no SoQL literal.")
+
+
+def _compile(template: str):
+    """Split a template into literal text at even positions and parameter
+    names at odd positions."""
+    segments = []
+
+    for text, name, spec, conversion in Formatter().parse(template):
+        if segments and len(segments) % 2 == 1:
+            segments[-1] += text
+        else:
+            segments.append(text)
+
+        if name is None:
+            continue
+
+        if not name.isidentifier() or spec or conversion:
+            raise ValueError(f"Parameter {{{name}}} should be a plain name.")
+
+        segments.append(name)
+
+    return segments or [""]
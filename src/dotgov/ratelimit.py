@@ -0,0 +1,363 @@
+from collections import deque
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+try:
+    import fcntl
+
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Token bucket spacing out requests to a domain.
+
+    Tokens refill at ``rate`` per second up to ``burst``, and each request
+    takes one, waiting when none is left. A throttled response (429) drains
+    the bucket and holds every request until its ``Retry-After`` has passed.
+
+    Threads share a limiter through ``RateLimiter.shared``, keyed by domain
+    and app token. With a ``lock_path``, the bucket lives in that file and is
+    shared by every process on the host using it (POSIX only).
+    """
+
+    WINDOW = 60.0
+    BACKOFF_FACTOR = 1.0
+
+    _registry: dict[tuple, "RateLimiter"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: int = 10,
+        lock_path: str | Path | None = None,
+    ) -> None:
+        """RateLimiter Instantiation.
+
+        Parameters
+        ----------
+        rate : float
+            Requests per second sustained
+        burst : int
+            Requests allowed at once after a pause
+        lock_path : str | Path | None
+            File holding the bucket, to share it across processes
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst at least 1.")
+
+        self.rate = rate
+        self.burst = burst
+
+        self.lock_path = Path(lock_path) if lock_path else None
+
+        if self.lock_path is not None and fcntl is None:
+            logger.info("File locks unavailable, limiting this process only.")
+
+            self.lock_path = None
+
+        if self.lock_path is not None:
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._state = {"tokens": float(burst), "updated": time.time(), "until": 0.0}
+
+        self._sent: deque[float] = deque()
+        self.requests = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    @classmethod
+    def shared(
+        cls,
+        domain: str,
+        app_token: str | None = None,
+        lock_dir: str | Path | None = None,
+        **kwargs,
+    ):
+        """Returns the limiter of a domain and app token, created on first use.
+
+        Parameters
+        ----------
+        domain : str
+            Target domain (without scheme)
+        app_token : str | None
+            Socrata application token, quotas are counted per token
+        lock_dir : str | Path | None
+            Directory of the lock files sharing buckets across processes
+        **kwargs : dict
+            Arguments for ``RateLimiter`` when created (e.g. ``rate``)
+        """
+        key = (domain, app_token)
+
+        with cls._registry_lock:
+            limiter = cls._registry.get(key)
+
+            if limiter is None:
+                if lock_dir is not None:
+                    # Named by hash, tokens are not written to disk
+                    raw = json.dumps(key).encode("utf-8")
+                    name = hashlib.sha256(raw).hexdigest()[:16]
+
+                    kwargs["lock_path"] = Path(lock_dir) / f"{name}.lock"
+
+                limiter = cls(**kwargs)
+
+                cls._registry[key] = limiter
+
+        return limiter
+
+    def reserve(self):
+        """Take a token, returning the seconds to wait before sending."""
+        with self._locked() as state:
+            now = time.time()
+
+            elapsed = max(now - state["updated"], 0.0)
+            tokens = min(self.burst, state["tokens"] + elapsed * self.rate) - 1
+
+            state.update({"tokens": tokens, "updated": now})
+
+            wait = max(-tokens / self.rate, state["until"] - now, 0.0)
+
+        with self._lock:
+            self.requests += 1
+            self.waited += wait
+
+            self._sent.append(now + wait)
+
+        return wait
+
+    def acquire(self):
+        """Wait for a token, returning the seconds waited."""
+        wait = self.reserve()
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    def defer(self, seconds: float):
+        """Hold every request for ``seconds`` after being throttled.
+
+        Parameters
+        ----------
+        seconds : float
+            Delay requested by the server (``Retry-After``)
+        """
+        with self._locked() as state:
+            now = time.time()
+
+            state.update(
+                {
+                    "tokens": min(state["tokens"], 0.0),
+                    "updated": now,
+                    "until": max(state["until"], now + seconds),
+                }
+            )
+
+        with self._lock:
+            self.throttled += 1
+
+        logger.info(f"Throttled, holding requests for {seconds:.1f}s")
+
+    def backoff(self, header: str | None = None, attempt: int = 0):
+        """Hold requests after a throttled response, for its ``Retry-After``
+        or an exponential backoff without one. Returns the delay.
+
+        Parameters
+        ----------
+        header : str | None
+            ``Retry-After`` header of the response
+        attempt : int
+            Number of throttled responses in a row so far
+        """
+        delay = retry_after(header)
+
+        if delay is None:
+            delay = self.BACKOFF_FACTOR * 2**attempt
+
+        self.defer(delay)
+
+        return delay
+
+    @property
+    def wait(self):
+        """Seconds a request sent now would wait."""
+        with self._locked() as state:
+            now = time.time()
+
+            elapsed = max(now - state["updated"], 0.0)
+            tokens = min(self.burst, state["tokens"] + elapsed * self.rate)
+
+            deficit = (1 - tokens) / self.rate if tokens < 1 else 0.0
+
+            return max(deficit, state["until"] - now, 0.0)
+
+    @property
+    def throughput(self):
+        """Requests per second sent by this process over the last ``WINDOW``."""
+        now = time.time()
+
+        with self._lock:
+            while self._sent and self._sent[0] < now - self.WINDOW:
+                self._sent.popleft()
+
+            sent = sum(1 for t in self._sent if t <= now)
+
+        return sent / self.WINDOW
+
+    def stats(self):
+        """Returns current wait and throughput, and totals for this process."""
+        return {
+            "rate": self.rate,
+            "wait": self.wait,
+            "throughput": self.throughput,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "waited": self.waited,
+        }
+
+    def _locked(self):
+        """Context manager yielding the bucket state, held exclusively."""
+        return _BucketLock(self)
+
+
+class _BucketLock:
+    """Exclusive access to a bucket, through a file lock when shared."""
+
+    def __init__(self, limiter: RateLimiter) -> None:
+        self.limiter = limiter
+        self.file = None
+
+    def __enter__(self):
+        limiter = self.limiter
+
+        limiter._lock.acquire()
+
+        if limiter.lock_path is None:
+            return limiter._state
+
+        try:
+            self.file = open(limiter.lock_path, "a+")
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+
+            self.file.seek(0)
+            raw = self.file.read()
+
+            if raw:
+                limiter._state = json.loads(raw)
+
+        except BaseException:
+            self._release()
+            raise
+
+        return limiter._state
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self.file is not None and exc_type is None:
+                self.file.seek(0)
+                self.file.truncate()
+                self.file.write(json.dumps(self.limiter._state))
+                self.file.flush()
+
+        finally:
+            self._release()
+
+        return False
+
+    def _release(self):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+
+        self.limiter._lock.release()
+
+
+class RateLimitedAdapter(BaseAdapter):
+    """Transport adapter taking a token from a RateLimiter before each request.
+
+    Throttled responses (429) hold the limiter for their ``Retry-After`` (or
+    an exponential backoff without one) and are sent again, up to
+    ``retries`` times.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        adapter: BaseAdapter | None = None,
+        retries: int = 5,
+    ) -> None:
+        """RateLimitedAdapter Instantiation.
+
+        Parameters
+        ----------
+        limiter : RateLimiter
+            Limiter of the domain
+        adapter : BaseAdapter | None
+            Adapter sending the requests, by default a plain ``HTTPAdapter``
+        retries : int
+            Number of times a throttled request is sent again
+        """
+        super().__init__()
+
+        self.limiter = limiter
+        self.adapter = adapter if adapter is not None else HTTPAdapter()
+        self.retries = retries
+
+    def send(self, request, **kwargs):
+        attempt = 0
+
+        while True:
+            self.limiter.acquire()
+
+            response = self.adapter.send(request, **kwargs)
+
+            if response.status_code != 429 or attempt >= self.retries:
+                return response
+
+            self.limiter.backoff(response.headers.get("Retry-After"), attempt)
+
+            response.close()
+
+            attempt += 1
+
+    def close(self):
+        self.adapter.close()
+
+
+def retry_after(value: str | None):
+    """Seconds to wait from a ``Retry-After`` header, None if missing or
+    malformed.
+
+    Parameters
+    ----------
+    value : str | None
+        Header value, in seconds or as an HTTP date
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+
+    except ValueError:
+        pass
+
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+
+    except (TypeError, ValueError):
+        return None
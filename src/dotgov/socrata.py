@@ -1,5 +1,18 @@
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from typing import TYPE_CHECKING
+import asyncio
+import codecs
+import csv
+import itertools
+import json
 import logging
+import queue
+import re
+import threading
+import time
 
 from pydantic import (
     BaseModel,
@@ -10,13 +23,28 @@ from pydantic import (
     model_validator,
 )
 from requests.adapters import HTTPAdapter
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, RequestException, RetryError, Timeout
 from urllib3.util.retry import Retry
 import requests
 
+from .adaptive import AdaptivePageSize
+from .cache import CachingAdapter, ResponseCache
+from .checkpoint import Checkpoint, CheckpointStore
+from .decode import record_decoder
+from .metrics import RequestMetric
+from .ratelimit import RateLimitedAdapter, RateLimiter
+
+if TYPE_CHECKING:
+    import httpx
+    import pyarrow as pa
+
+    from .sync import SyncStore
+
 
 logger = logging.getLogger(__name__)
 
+_DONE = object()
+
 
 class Only(str, Enum):
     """Field describing the datatype of an asset.
@@ -94,6 +122,19 @@ class HTTPMethod(str, Enum):
     POST = "post"
 
 
+class Format(str, Enum):
+    """Output formats of resource endpoints.
+
+    Allowed values are:
+
+    - ``JSON`` → "json"
+    - ``CSV`` → "csv"
+    """
+
+    JSON = "json"
+    CSV = "csv"
+
+
 class DiscoverFilters(BaseModel):
     """Filters allowed for the Discover API.
 
@@ -272,10 +313,14 @@ class Payload(BaseModel):
         return self
 
 
-class Socrata:
-    """Class to interact with SODA API"""
+class _SocrataBase:
+    """Shared configuration and request formatting for SODA API clients"""
 
     PREFIX = "https://"
+    CATALOG_ENDPOINT = "/api/catalog/v1"
+    RETRY_STATUSES = (500, 502, 503, 504)
+    BACKOFF_FACTOR = 0.5
+    THROTTLE_RETRIES = 5
 
     def __init__(
         self,
@@ -283,6 +328,8 @@ class Socrata:
         version: float = 2.1,
         app_token: str | None = None,
         retries: int | None = None,
+        limiter: RateLimiter | bool | None = None,
+        metrics: Callable[[RequestMetric], None] | None = None,
     ) -> None:
         """Socrata Instantiation.
 
@@ -296,6 +343,11 @@ class Socrata:
             Socrata application token
         retries : int | None
             Number of attempts to retry request
+        limiter : RateLimiter | bool | None
+            Token bucket spacing out requests, ``True`` for the one shared by
+            every client of the same domain and app token
+        metrics : Callable[[RequestMetric], None] | None
+            Hook called with the measurements of every request
         """
         if not domain:
             raise Exception("A domain is required.")
@@ -304,75 +356,46 @@ class Socrata:
         self.version = version
         self.app_token = app_token
         self.retries = retries
-        self.session: requests.Session | None = None
-
-    def open(self):
-        """Initialize the requests session if not already open."""
-        if self.session is not None:
-            return
-
-        self.session = requests.Session()
-
-        if self.app_token:
-            self.session.headers.update({"X-App-Token": self.app_token})
-
-        else:
-            logger.info("You may be rate-limited. Register app token.")
-
-        if self.retries is not None and self.retries > 0:
-            retry_strategy = Retry(
-                total=self.retries,
-                allowed_methods=[h.name for h in HTTPMethod],
-                status_forcelist=(500, 502, 503, 504),
-                backoff_factor=0.5,
-            )
-
-            adapter = HTTPAdapter(max_retries=retry_strategy)
 
-            self.session.mount("http://", adapter)
-            self.session.mount("https://", adapter)
+        if limiter is True:
+            limiter = RateLimiter.shared(domain, app_token)
 
-    def close(self):
-        """Close the requests session if open."""
-        if self.session is not None:
-            self.session.close()
-            self.session = None
+        self.limiter = limiter or None
+        self.metrics = metrics
 
-    def __enter__(self):
-        self.open()
+    def _emit(self, uri: str, method: str, **measurements):
+        """Pass the measurements of a request to the metrics hook, if any."""
+        if self.metrics is None:
+            return
 
-        return self
+        metric = RequestMetric(
+            domain=self.domain, dataset=_dataset(uri), method=method, **measurements
+        )
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.close()
+        try:
+            self.metrics(metric)
 
-        if exc_type:
-            logger.error(f"Error during HTTP request: {exc_value}")
+        except Exception as e:
+            logger.error(f"Metrics hook failed: {e}")
 
-        # Returning False so exceptions propagate
+    def format_uri(self, endpoint: str):
+        """Prefix an endpoint with scheme and domain.
 
-        return False
+        Parameters
+        ----------
+        endpoint : str
+            Path of the endpoint, starting with "/"
+        """
+        return "{}{}{}".format(self.PREFIX, self.domain, endpoint)
 
-    def discover(
-        self,
-        filters: DiscoverFilters | dict | None = None,
-        **kwargs,
-    ):
-        """Returns datasets associated with the domain.
+    def format_discover_params(self, filters: DiscoverFilters | dict | None = None):
+        """Format query parameters for the Discover API.
 
         Parameters
         ----------
         filters : DiscoverFilters | dict | None
             Filters for the request (see DiscoverFilters)
         """
-        if not self.session:
-            self.open()
-
-        endpoint = "/api/catalog/v1"
-        uri = "{}{}{}".format(self.PREFIX, self.domain, endpoint)
-
-        n = 0
-
         # Default filters
 
         params = DiscoverFilters().model_dump(exclude_none=True, mode="json")
@@ -399,66 +422,46 @@ class Socrata:
         except ValidationError as e:
             logger.info(e)
 
-        offset = params.get("offset", 0)
-
-        while True and self.session is not None:
-            try:
-                response = self.session.get(uri, params=params, **kwargs)
-                response.raise_for_status()
-
-                result_set = response.json()
-
-                if result_set is not None:
-                    set_size = result_set.get("resultSetSize", 0)
-
-                    if n >= set_size:
-                        logger.info(f"{n} datasets, reached result set size.")
-                        break
-
-                    datasets = result_set.get("results", [])
-
-                    if datasets:
-                        n += len(datasets)
-
-                        offset += params.get("limit", len(datasets))
-                        params.update({"offset": offset})
-
-                        logger.info(f"{n} datasets, offsetting to {offset}")
-
-                        yield from datasets
-
-                    else:
-                        logger.info("No datasets to yield.")
-                        break
-                else:
-                    logger.error("No result received for datasets request.")
-                    break
-
-            except HTTPError as e:
-                logger.error(f"HTTP Error: {e}")
-                break
-
-            except Exception as e:
-                logger.error(e)
-                break
+        return params
 
-    def format_endpoint(self, identifier: str):
+    def format_endpoint(self, identifier: str, format: Format | str = Format.JSON):
         """Format the correct endpoint for each SODA API version.
 
         Parameters
         ----------
         identifier : str
             Resource ID
+        format : Format | str
+            Output format, default "json". Version 3.0 serves other formats
+            through its export endpoint.
         """
+        fmt = Format(format).value
+
         if self.version > 2.1:
-            fmtstr = f"/api/v3/views/{identifier}/query.json"
+            if fmt == Format.JSON.value:
+                fmtstr = f"/api/v3/views/{identifier}/query.json"
+            else:
+                fmtstr = f"/api/v3/views/{identifier}/export.{fmt}"
         elif self.version == 2.1:
-            fmtstr = f"/resource/{identifier}.json"
+            fmtstr = f"/resource/{identifier}.{fmt}"
         else:
-            fmtstr = f"/api/views/{identifier}.json"
+            if fmt == Format.JSON.value:
+                fmtstr = f"/api/views/{identifier}.json"
+            else:
+                fmtstr = f"/api/views/{identifier}/rows.{fmt}"
 
         return fmtstr
 
+    def format_metadata_endpoint(self, identifier: str):
+        """Format the endpoint of a dataset's metadata (views API).
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        """
+        return f"/api/views/{identifier}.json"
+
     def format_payload(self, filters: Payload | dict):
         """Format required payload for request.
 
@@ -548,103 +551,1933 @@ class Socrata:
 
         return payload
 
-    def query_resource(
+    def format_resource_payload(self, filters: Payload | dict | None = None):
+        """Format the payload of the first page of a resource query.
+
+        Parameters
+        ----------
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        """
+        if filters:
+            return self.format_payload(filters=filters)
+
+        logger.info("Filters recommended to limit amount of data returned.")
+
+        return self.format_payload(filters=Payload(version=self.version))
+
+    def validate_payload(self, filters: Payload | dict | None = None):
+        """Validate filters as a Payload for the client version.
+
+        Invalid filters are logged and replaced by defaults, like in
+        ``format_payload``.
+
+        Parameters
+        ----------
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        """
+        try:
+            if isinstance(filters, Payload):
+                return filters
+
+            elif isinstance(filters, dict):
+                return Payload(**{**{"version": self.version}, **filters})
+
+            elif filters is not None:
+                raise ValueError("Datatype of filters not accepted")
+
+        except ValidationError as e:
+            logger.info(e)
+
+        return Payload(version=self.version)
+
+    def format_count_payload(self, filters: Payload | dict | None = None):
+        """Format a payload counting the rows matched by the filters.
+
+        Parameters
+        ----------
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        """
+        update = {"select": "count(*) AS count", "order": None, "limit": 1}
+
+        if self.version > 2.1:
+            update["page"] = 1
+        else:
+            update["offset"] = 0
+
+        filters = self.validate_payload(filters=filters).model_copy(update=update)
+
+        return self.format_payload(filters=filters)
+
+    def format_keyset_payload(
         self,
-        identifier: str,
         filters: Payload | dict | None = None,
-        **kwargs,
+        key: str = ":id",
+        last: str | int | float | None = None,
     ):
-        """Returns the data for a specific dataset.
+        """Format the payload of a page for keyset (seek) pagination.
+
+        Rows are ordered by ``key`` and, when ``last`` is provided, restricted
+        to those after it, so no offset is ever sent.
 
         Parameters
         ----------
-        identifier : str
-            Resource ID
         filters : Payload | dict | None
             Filters for the request (see Payload)
+        key : str
+            Unique column used to order and seek, default ":id"
+        last : str | int | float | None
+            Last key received on the previous page, rendered as a SoQL
+            literal so numeric keys compare as numbers
         """
-        endpoint = self.format_endpoint(identifier=identifier)
-        uri = "{}{}{}".format(self.PREFIX, self.domain, endpoint)
+        from .prepared import soql_literal
 
-        n = 0
-        page = 1
-        offset = 0
+        filters = self.validate_payload(filters=filters)
 
-        if filters:
-            payload = self.format_payload(filters=filters)
+        if filters.order and filters.order != key:
+            logger.info(f"Keyset pagination orders by {key}, ignoring ORDER clause.")
+
+        where = filters.where
+
+        if last is not None:
+            seek = f"{key} > {soql_literal(last)}"
+
+            where = f"({where}) AND {seek}" if where else seek
+
+        # The key must be returned to carry it forward
+
+        if filters.select is None:
+            select = f"*, {key}" if key.startswith(":") else None
+
+        elif key not in [c.strip() for c in filters.select.split(",")]:
+            select = f"{filters.select}, {key}"
 
         else:
-            logger.info("Filters recommended to limit amount of data returned.")
+            select = filters.select
 
-            payload = self.format_payload(filters=Payload(version=self.version))
+        update = {"select": select, "where": where, "order": key}
 
-        while True and self.session is not None:
-            try:
-                if self.version > 2.1:
-                    response = self.session.post(uri, json=payload, **kwargs)
-                else:
-                    response = self.session.get(uri, params=payload, **kwargs)
+        if self.version > 2.1:
+            update["page"] = 1
+        else:
+            update["offset"] = 0
 
-                response.raise_for_status()
+        return self.format_payload(filters=filters.model_copy(update=update))
 
-                records = response.json()
+    def advance_payload(self, payload: dict, size: int):
+        """Point a resource payload to the page following the current one.
 
-                if records:
-                    n += len(records)
+        Parameters
+        ----------
+        payload : dict
+            Payload as returned by ``format_payload``, updated in place
+        size : int
+            Number of records received for the current page, or 0 to skip a
+            whole page of ``limit`` rows. 2.1 offsets move by the records
+            received, so portals capping pages below ``limit`` skip no rows.
+        """
+        if self.version > 2.1:
+            page = payload["page"]["pageNumber"] + 1
+            payload.update({"page": {**payload["page"], "pageNumber": page}})
 
-                    page += 1
+        else:
+            offset = payload.get("$offset", 0) + (size or payload.get("$limit", 0))
+            payload.update({"$offset": offset})
 
-                    if self.version > 2.1:
-                        payload["page"]["pageNumber"] = page
+        return payload
 
-                    else:
-                        offset += payload.get("$limit", len(records))
-                        payload.update({"$offset": offset})
+    def plan_pages(self, payload: dict, total: int):
+        """Payloads for the pages needed to cover ``total`` rows.
 
-                    logger.info(f"{n} records so far, on to page {page}")
+        Planning starts at the page (or offset) of ``payload``.
 
-                    yield from records
+        Parameters
+        ----------
+        payload : dict
+            Payload as returned by ``format_payload``
+        total : int
+            Number of rows matched by the query
+        """
+        if self.version > 2.1:
+            first = payload["page"]["pageNumber"]
+            size = payload["page"]["pageSize"]
 
-                else:
-                    logger.info("No records to yield.")
-                    break
+            n = max(-(-(total - (first - 1) * size) // size), 0)
 
-            except HTTPError as e:
-                logger.error(f"HTTP Error: {e}")
-                break
+            return [
+                {**payload, "page": {**payload["page"], "pageNumber": first + i}}
+                for i in range(n)
+            ]
 
-            except Exception as e:
-                logger.error(e)
-                break
+        start = payload.get("$offset", 0)
+        size = payload["$limit"]
 
+        return [{**payload, "$offset": o} for o in range(start, total, size)]
 
-def create_where_clause(**kwargs):
-    """Build a WHERE clause for a query, assumes AND between provided arguments.
 
-    Parameters
-    ----------
-    **kwargs : dict
-        Arbitrary keyword arguments.
+class Socrata(_SocrataBase):
+    """Class to interact with SODA API.
 
+    An instance is safe to share across threads: its session is opened once,
+    and concurrent requests draw keep-alive connections to the domain from a
+    pool of ``pool_size``.
+    """
 
-    Notes
-    -----
-    Keys are dataset dependent. They represent fields (columns) in the dataset.
+    STREAM_CHUNK_SIZE = 2**16
+    POOL_SIZE = 10
 
-    Value types determine usage.
+    def __init__(
+        self,
+        domain: str,
+        version: float = 2.1,
+        app_token: str | None = None,
+        retries: int | None = None,
+        cache: ResponseCache | None = None,
+        limiter: RateLimiter | bool | None = None,
+        metrics: Callable[[RequestMetric], None] | None = None,
+        snapshot: "SyncStore | None" = None,
+        pool_size: int | None = None,
+        pool_block: bool = False,
+    ) -> None:
+        """Socrata Instantiation.
 
-    - key : tuple[str, str | int, int | float, float]
-        Values used as lower and upper bounds.
-    - key : int | float
-        Values used as `greater than` threshold.
-    - key : list | set
-        Values used to match against a set of possible values `in(...)`.
-    - key : str
-        Values used for string fuzzy matching.
-    - key : tuple[float, float, int]
-        Pending treatment for geospatial datatypes.
-    - key : tuple[float, float, ...]
-        Pending treatment for geospatial datatypes.
+        Parameters
+        ----------
+        domain : str
+            Target domain (without scheme)
+        version : float
+            SODA API version, default 2.1
+        app_token : str | None
+            Socrata application token
+        retries : int | None
+            Number of attempts to retry request
+        cache : ResponseCache | None
+            On-disk cache of responses, revalidated with ``ETag`` and
+            ``Last-Modified`` on every request
+        limiter : RateLimiter | bool | None
+            Token bucket spacing out requests, ``True`` for the one shared by
+            every client of the same domain and app token. Throttled
+            responses (429) are retried after their ``Retry-After``.
+        metrics : Callable[[RequestMetric], None] | None
+            Hook called with the measurements of every request: latency,
+            bytes, rows, retries, status, and JSON decode time (see
+            ``dotgov.metrics.PrometheusCollector``)
+        snapshot : SyncStore | None
+            Local snapshots answering resource queries instead of the portal,
+            no request leaves the process (see ``dotgov.local``)
+        pool_size : int | None
+            Number of keep-alive connections kept to the domain, default
+            ``POOL_SIZE``. Size it to the number of concurrent requests.
+        pool_block : bool
+            Whether requests wait for a pooled connection when all are busy,
+            instead of opening one that is closed after use
+        """
+        super().__init__(
+            domain=domain,
+            version=version,
+            app_token=app_token,
+            retries=retries,
+            limiter=limiter,
+            metrics=metrics,
+        )
+
+        self.cache = cache
+        self.snapshot = snapshot
+        self.pool_size = pool_size or self.POOL_SIZE
+        self.pool_block = pool_block
+        self.session: requests.Session | None = None
+
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Initialize the requests session if not already open."""
+        with self._lock:
+            if self.session is None:
+                self.session = self._session()
+
+    def _session(self):
+        """New session with the adapters of the client mounted."""
+        session = requests.Session()
+
+        if self.app_token:
+            session.headers.update({"X-App-Token": self.app_token})
+
+        else:
+            logger.info("You may be rate-limited. Register app token.")
+
+        if self.snapshot is not None:
+            from .local import SnapshotAdapter
+
+            adapter = SnapshotAdapter(self.snapshot)
+
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            return session
+
+        options = {"pool_maxsize": self.pool_size, "pool_block": self.pool_block}
+
+        if self.retries is not None and self.retries > 0:
+            retry_strategy = Retry(
+                total=self.retries,
+                allowed_methods=[h.name for h in HTTPMethod],
+                status_forcelist=self.RETRY_STATUSES,
+                backoff_factor=self.BACKOFF_FACTOR,
+            )
+
+            options["max_retries"] = retry_strategy
+
+        if self.cache is not None:
+            adapter = CachingAdapter(self.cache, **options)
+
+        else:
+            adapter = HTTPAdapter(**options)
+
+        if self.limiter is not None:
+            adapter = RateLimitedAdapter(
+                self.limiter, adapter=adapter, retries=self.THROTTLE_RETRIES
+            )
+
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+    def close(self):
+        """Close the requests session if open."""
+        with self._lock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+    def prewarm(self, connections: int | None = None):
+        """Open connections to the domain ahead of the first requests.
+
+        As many HEAD requests as connections are sent concurrently through
+        the session, each holding its connection until all are open, so their
+        TLS handshakes overlap and the connections are left in the pool for
+        the first fan-out. Response statuses are ignored and failed requests
+        are logged. Returns the number of connections opened.
+
+        Parameters
+        ----------
+        connections : int | None
+            Number of connections, by default ``pool_size``
+        """
+        self.open()
+
+        uri = self.format_uri(self.CATALOG_ENDPOINT)
+
+        count = min(connections or self.pool_size, self.pool_size)
+
+        # Streamed responses keep their connection until their body is read,
+        # which puts it back in the pool (closing it unread drops it)
+
+        barrier = threading.Barrier(count)
+
+        def warm(_):
+            try:
+                response = self.session.head(uri, stream=True)
+
+            except RequestException as e:
+                barrier.abort()
+                logger.warning(f"Connection to {self.domain} failed: {e}")
+
+                return False
+
+            with response:
+                try:
+                    barrier.wait(timeout=10)
+                except threading.BrokenBarrierError:
+                    pass
+
+                response.content
+
+            return True
+
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            opened = sum(executor.map(warm, range(count)))
+
+        logger.info(f"{opened} connections opened to {self.domain}")
+
+        return opened
+
+    def __enter__(self):
+        self.open()
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+        if exc_type:
+            logger.error(f"Error during HTTP request: {exc_value}")
+
+        # Returning False so exceptions propagate
+
+        return False
+
+    def discover(
+        self,
+        filters: DiscoverFilters | dict | None = None,
+        prefetch: int | None = None,
+        adaptive: AdaptivePageSize | bool = False,
+        **kwargs,
+    ):
+        """Returns datasets associated with the domain.
+
+        Parameters
+        ----------
+        filters : DiscoverFilters | dict | None
+            Filters for the request (see DiscoverFilters)
+        prefetch : int | None
+            Number of pages requested ahead in a background thread while
+            datasets are consumed. Errors are then raised to the consumer
+            instead of logged.
+        adaptive : AdaptivePageSize | bool
+            Whether to size pages from observed response time and size,
+            starting at ``limit`` (see ``query_resource``)
+        """
+        if not self.session:
+            self.open()
+
+        pages = self.discover_pages(filters=filters, adaptive=adaptive, **kwargs)
+
+        for datasets in self._consume(pages, prefetch=prefetch):
+            yield from datasets
+
+    def _consume(self, pages, prefetch: int | None = None, track=None):
+        """Yield pages, prefetching them or logging the error that ends them.
+
+        When prefetching, errors are raised to the consumer instead. ``track``
+        wraps the pages as they are delivered (see ``_resume``). Streamed pages
+        only request and decode records as they are consumed, so their errors
+        are logged the same way and end the pages too.
+        """
+        if prefetch:
+            pages = _prefetch(pages, prefetch)
+
+        if track is not None:
+            pages = track(pages)
+
+        if prefetch:
+            yield from pages
+
+            return
+
+        try:
+            for records in pages:
+                if not isinstance(records, _StreamedPage):
+                    yield records
+                    continue
+
+                guarded = _GuardedPage(records)
+
+                yield guarded
+
+                if guarded.error is not None:
+                    _log_failure(guarded.error)
+                    return
+
+        except Exception as e:
+            _log_failure(e)
+
+    def discover_pages(
+        self,
+        filters: DiscoverFilters | dict | None = None,
+        adaptive: AdaptivePageSize | bool = False,
+        **kwargs,
+    ):
+        """Returns datasets associated with the domain, one page at a time.
+
+        Unlike ``discover``, errors are raised instead of logged.
+
+        Parameters
+        ----------
+        filters : DiscoverFilters | dict | None
+            Filters for the request (see DiscoverFilters)
+        adaptive : AdaptivePageSize | bool
+            Whether to size pages from observed response time and size (see
+            ``discover``)
+        """
+        uri = self.format_uri(self.CATALOG_ENDPOINT)
+
+        n = 0
+
+        params = self.format_discover_params(filters=filters)
+
+        offset = params.get("offset", 0)
+
+        sizer = _sizer(adaptive, params.get("limit", 1000))
+
+        def request(size: int):
+            return self._send(
+                HTTPMethod.GET, uri, params={**params, "limit": size}, **kwargs
+            )
+
+        while True and self.session is not None:
+            if sizer is None:
+                response = self._send(HTTPMethod.GET, uri, params=params, **kwargs)
+                result_set = self._receive(response)
+
+            else:
+                response, size, nbytes, seconds = self._send_sized(
+                    sizer, request, sizer.size
+                )
+                params = {**params, "limit": size}
+
+                result_set = self._receive(response, seconds=seconds)
+
+            if result_set is None:
+                logger.error("No result received for datasets request.")
+                break
+
+            set_size = result_set.get("resultSetSize", 0)
+
+            if n >= set_size:
+                logger.info(f"{n} datasets, reached result set size.")
+                break
+
+            datasets = result_set.get("results", [])
+
+            if not datasets:
+                logger.info("No datasets to yield.")
+                break
+
+            if sizer is not None:
+                sizer.observe(seconds, nbytes, len(datasets), size)
+
+            n += len(datasets)
+
+            offset += params.get("limit", len(datasets))
+            params = {**params, "offset": offset}
+
+            logger.info(f"{n} datasets, offsetting to {offset}")
+
+            yield datasets
+
+        if sizer is not None:
+            logger.info(f"Page size settled at {sizer.size} datasets")
+
+    def fetch_page(self, uri: str, payload: dict, **kwargs):
+        """Request a single page of records.
+
+        Parameters
+        ----------
+        uri : str
+            Resource URI
+        payload : dict
+            Payload as returned by ``format_payload``
+        """
+        return self._receive(self._send_page(uri, payload, **kwargs))
+
+    def stream_page(self, uri: str, payload: dict, **kwargs):
+        """Request a single page of records, decoding them as they arrive.
+
+        Parameters
+        ----------
+        uri : str
+            Resource URI
+        payload : dict
+            Payload as returned by ``format_payload``
+        """
+        start = time.perf_counter()
+
+        response = self._send_page(uri, payload, stream=True, **kwargs)
+
+        rows = 0
+
+        try:
+            chunks = response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE)
+
+            for record in iter_json_array(chunks):
+                rows += 1
+
+                yield record
+
+        finally:
+            self._observe(
+                response,
+                seconds=time.perf_counter() - start,
+                bytes=_received(response),
+                rows=rows,
+            )
+
+            response.close()
+
+    def _send_page(self, uri: str, payload: dict, **kwargs):
+        """Request a single page, returning the response once checked."""
+        if self.version > 2.1:
+            return self._send(HTTPMethod.POST, uri, json=payload, **kwargs)
+
+        return self._send(HTTPMethod.GET, uri, params=payload, **kwargs)
+
+    def _send(self, method: HTTPMethod, uri: str, **kwargs):
+        """Send a request, returning the response once checked. Failed
+        requests are recorded by the metrics hook."""
+        if self.session is None:
+            raise RuntimeError("Session is not open.")
+
+        start = time.perf_counter()
+
+        try:
+            response = getattr(self.session, method.value)(uri, **kwargs)
+
+        except RequestException:
+            self._emit(uri, method.name, seconds=time.perf_counter() - start)
+            raise
+
+        try:
+            response.raise_for_status()
+
+        except HTTPError:
+            self._observe(response)
+            response.close()
+            raise
+
+        return response
+
+    def _receive(self, response: requests.Response, seconds: float | None = None):
+        """Decode a JSON response, recording the time spent receiving and
+        decoding it. ``seconds`` is the time received, when already measured.
+        """
+        if self.metrics is None:
+            return response.json()
+
+        start = time.perf_counter()
+
+        nbytes = len(response.content)
+
+        if seconds is None:
+            seconds = response.elapsed.total_seconds() + time.perf_counter() - start
+
+        start = time.perf_counter()
+
+        result = response.json()
+
+        self._observe(
+            response,
+            seconds=seconds,
+            decode_seconds=time.perf_counter() - start,
+            bytes=nbytes,
+            rows=_rows(result),
+        )
+
+        return result
+
+    def _observe(self, response: requests.Response, **measurements):
+        """Record a response, by default taking as long as its headers."""
+        measurements.setdefault("seconds", response.elapsed.total_seconds())
+
+        self._emit(
+            response.url,
+            response.request.method,
+            status=response.status_code,
+            retries=_retries(response),
+            **measurements,
+        )
+
+    def _send_sized(self, sizer: AdaptivePageSize, request, size: int):
+        """Send ``request(size)``, halving the size and retrying on timeouts
+        and server errors. Returns the response, the size used, and the
+        bytes and seconds it took."""
+        while True:
+            start = time.perf_counter()
+
+            try:
+                response = request(size)
+
+                # Read the body so it counts towards the response time
+                nbytes = len(response.content)
+
+            except (HTTPError, RetryError, Timeout) as e:
+                smaller = sizer.shrink(size) if _transient(e) else None
+
+                if smaller is None:
+                    raise
+
+                logger.info(f"{e}, retrying with pages of {smaller}")
+
+                size = smaller
+                continue
+
+            return response, size, nbytes, time.perf_counter() - start
+
+    def fetch_columns(self, identifier: str, **kwargs):
+        """Returns the column metadata of a dataset.
+
+        Each column includes ``fieldName`` and ``dataTypeName``, among others.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        """
+        if not self.session:
+            self.open()
+
+        uri = self.format_uri(self.format_metadata_endpoint(identifier=identifier))
+
+        response = self._send(HTTPMethod.GET, uri, **kwargs)
+
+        return self._receive(response).get("columns", [])
+
+    def count_resource(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        **kwargs,
+    ):
+        """Returns the number of rows of a dataset matched by the filters.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload), only the WHERE clause
+            (and ``q`` for version 2.1) affect the count
+        """
+        if not self.session:
+            self.open()
+
+        uri = self.format_uri(self.format_endpoint(identifier=identifier))
+
+        payload = self.format_count_payload(filters=filters)
+
+        records = self.fetch_page(uri, payload, **kwargs)
+
+        return int(records[0]["count"]) if records else 0
+
+    def query_resource(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        workers: int | None = None,
+        prefetch: int | None = None,
+        keyset: str | None = None,
+        stream: bool = False,
+        checkpoint: CheckpointStore | None = None,
+        adaptive: AdaptivePageSize | bool = False,
+        typed: bool = False,
+        **kwargs,
+    ):
+        """Returns the data for a specific dataset.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        workers : int | None
+            Number of pages requested concurrently. When greater than 1, rows
+            are counted first and the pages covering them are fetched in
+            parallel; records are still yielded in page order.
+        prefetch : int | None
+            Number of pages requested ahead in a background thread while
+            records are consumed. Errors are then raised to the consumer
+            instead of logged.
+        keyset : str | None
+            Unique column (e.g. ":id") used for keyset pagination. Pages are
+            ordered by it and each one seeks past the last key received, so
+            no offset is sent and page time stays flat on large datasets.
+        stream : bool
+            Whether to decode records as response chunks arrive instead of
+            loading whole pages, bounding memory by one record. Pages planned
+            for ``workers`` are still decoded whole, and ``prefetch`` is
+            ignored. Errors are logged and end the query as they do otherwise,
+            after the records of the failing page decoded before them.
+        checkpoint : CheckpointStore | None
+            Store saving the position after each page is delivered. A later
+            call with the same identifier and filters resumes from there, and
+            the checkpoint is deleted once the query completes.
+        adaptive : AdaptivePageSize | bool
+            Whether to size pages from observed response time and size,
+            starting at ``limit``. Pages that time out or fail with a server
+            error are retried at half the size. Pass an ``AdaptivePageSize``
+            to set bounds and targets, and to read the settled ``size``
+            afterwards. Ignored with ``workers``, and with a ``checkpoint``
+            unless paging by ``keyset``.
+        typed : bool
+            Whether to decode values from the dataset's column metadata,
+            fetched once: numbers to int or float, checkboxes to bool,
+            timestamps to datetime and points to ``(longitude, latitude)``
+            (see ``dotgov.decode``). Aliased fields are left as returned.
+        """
+        if stream and prefetch:
+            logger.info("Streamed pages are decoded as consumed, ignoring prefetch.")
+
+            prefetch = None
+
+        if adaptive and checkpoint is not None and not keyset:
+            logger.info("Checkpoints assume a fixed page size, ignoring adaptive.")
+
+            adaptive = False
+
+        seek = None
+        track = None
+
+        if checkpoint is not None:
+            filters, seek, track = self._resume(checkpoint, identifier, filters, keyset)
+
+        pages = self.query_pages(
+            identifier,
+            filters=filters,
+            workers=workers,
+            keyset=keyset,
+            stream=stream,
+            seek=seek,
+            adaptive=adaptive,
+            **kwargs,
+        )
+
+        decode = None
+
+        if typed:
+            decode = record_decoder(self.fetch_columns(identifier, **kwargs))
+
+        for records in self._consume(pages, prefetch=prefetch, track=track):
+            if decode is None:
+                yield from records
+
+            else:
+                yield from map(decode, records)
+
+    def _resume(
+        self,
+        checkpoint: CheckpointStore,
+        identifier: str,
+        filters: Payload | dict | None,
+        keyset: str | None,
+    ):
+        """Filters resuming from a saved checkpoint, the keyset value to seek
+        past, and a tracker saving a checkpoint after each delivered page."""
+        filters = self.validate_payload(filters=filters)
+
+        query = {"filters": filters.model_dump(exclude_none=True), "keyset": keyset}
+        key = checkpoint.key(self.domain, identifier, query)
+
+        saved = checkpoint.load(key)
+
+        position = saved.position if saved else {}
+        rows = saved.rows if saved else 0
+
+        if saved:
+            logger.info(f"Resuming {identifier} after {rows} records at {position}")
+
+        if "offset" in position:
+            filters = filters.model_copy(update={"offset": position["offset"]})
+
+        if "page" in position:
+            filters = filters.model_copy(update={"page": position["page"]})
+
+        seek = position.get("seek")
+
+        def track(pages):
+            nonlocal rows, position
+
+            for records in pages:
+                yield records
+
+                # Page delivered, resume after it
+
+                rows += len(records)
+
+                if keyset:
+                    final = (
+                        records.last
+                        if isinstance(records, _StreamedPage)
+                        else records[-1]
+                    )
+                    position = {"seek": final[keyset]}
+
+                elif self.version > 2.1:
+                    position = {"page": position.get("page", filters.page) + 1}
+
+                else:
+                    offset = position.get("offset", filters.offset)
+                    position = {"offset": offset + len(records)}
+
+                checkpoint.save(
+                    Checkpoint(
+                        key=key,
+                        domain=self.domain,
+                        identifier=identifier,
+                        position=position,
+                        rows=rows,
+                    )
+                )
+
+            checkpoint.delete(key)
+
+        return filters, seek, track
+
+    def query_resource_batches(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        schema: "pa.Schema | None" = None,
+        workers: int | None = None,
+        prefetch: int | None = None,
+        keyset: str | None = None,
+        **kwargs,
+    ):
+        """Returns the data for a specific dataset as Arrow record batches.
+
+        Requires the optional ``pyarrow`` dependency, ``pip install
+        dotgov[arrow]``. One ``pyarrow.RecordBatch`` is yielded per page, all
+        sharing the same schema.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        schema : pyarrow.Schema | None
+            Schema of the batches. By default it is built from the dataset's
+            column metadata; provide one when selecting aliases or aggregates.
+        workers : int | None
+            Number of pages requested concurrently (see ``query_resource``)
+        prefetch : int | None
+            Number of pages requested ahead (see ``query_resource``)
+        keyset : str | None
+            Unique column used for keyset pagination (see ``query_resource``)
+        """
+        from .arrow import record_batch, schema_from_columns
+
+        if schema is None:
+            schema = schema_from_columns(self.fetch_columns(identifier, **kwargs))
+
+        pages = self.query_pages(
+            identifier, filters=filters, workers=workers, keyset=keyset, **kwargs
+        )
+
+        for records in self._consume(pages, prefetch=prefetch):
+            yield record_batch(records, schema)
+
+    def query_resource_rows(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        header: list[str] | None = None,
+        workers: int | None = None,
+        prefetch: int | None = None,
+        keyset: str | None = None,
+        typed: bool = False,
+        **kwargs,
+    ):
+        """Returns the data for a specific dataset as compact rows.
+
+        A header tuple of field names is yielded first, then one tuple per
+        record with values in header order, sharing the header instead of
+        repeating keys in every record. Fields a record lacks are None, and
+        fields not in the header are dropped.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        header : list[str] | None
+            Fields of the rows. By default the dataset's columns when no
+            ``select`` is given, otherwise the fields of the first page in
+            order of appearance.
+        workers : int | None
+            Number of pages requested concurrently (see ``query_resource``)
+        prefetch : int | None
+            Number of pages requested ahead (see ``query_resource``)
+        keyset : str | None
+            Unique column used for keyset pagination (see ``query_resource``)
+        typed : bool
+            Whether to decode values from column metadata (see
+            ``query_resource``)
+        """
+        columns = None
+
+        if typed or (header is None and not self.validate_payload(filters).select):
+            columns = self.fetch_columns(identifier, **kwargs)
+
+        if header is None and columns is not None:
+            header = [c["fieldName"] for c in columns if c.get("fieldName")]
+
+        if header is not None and keyset and keyset not in header:
+            header = [*header, keyset]
+
+        decode = record_decoder(columns) if typed else None
+
+        pages = self.query_pages(
+            identifier, filters=filters, workers=workers, keyset=keyset, **kwargs
+        )
+
+        known = None
+        dropped = set()
+
+        for records in self._consume(pages, prefetch=prefetch):
+            if known is None:
+                if header is None:
+                    header = list(dict.fromkeys(k for r in records for k in r))
+
+                known = frozenset(header)
+
+                yield tuple(header)
+
+            for record in records:
+                if not known.issuperset(record):
+                    extra = record.keys() - known - dropped
+
+                    if extra:
+                        logger.info(f"Fields {sorted(extra)} not in header, dropped.")
+
+                        dropped.update(extra)
+
+                if decode is not None:
+                    record = decode(record)
+
+                yield tuple(map(record.get, header))
+
+        if known is None and header is not None:
+            yield tuple(header)
+
+    def prepare(self, identifier: str, filters: Payload | dict | None = None):
+        """Returns a query validated and compiled once, to execute many times
+        with bound parameters (see ``dotgov.prepared.PreparedQuery``).
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload), referencing parameters as
+            ``{name}``
+        """
+        from .prepared import PreparedQuery
+
+        return PreparedQuery(self, identifier, filters=filters)
+
+    def export_resource(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        as_dict: bool = False,
+        **kwargs,
+    ):
+        """Returns the rows of a dataset streamed from its CSV endpoint.
+
+        CSV avoids repeating every key on every row, which suits full-table
+        extracts. Version 2.1 pages through ``/resource/{id}.csv`` like
+        ``query_resource``; version 3.0 exports the whole result of the query
+        in a single request, so ``limit`` and ``page`` do not apply.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        as_dict : bool
+            Whether to yield rows as dicts keyed by column. Otherwise rows are
+            tuples of strings, and the header tuple is yielded first.
+        """
+        endpoint = self.format_endpoint(identifier=identifier, format=Format.CSV)
+        uri = self.format_uri(endpoint)
+
+        payload = self.format_resource_payload(filters=filters)
+
+        try:
+            yield from self._csv_rows(uri, payload, as_dict=as_dict, **kwargs)
+
+        except HTTPError as e:
+            logger.error(f"HTTP Error: {e}")
+
+        except Exception as e:
+            logger.error(e)
+
+    def _csv_rows(self, uri: str, payload: dict, as_dict: bool = False, **kwargs):
+        """Yield the rows of each CSV page, parsing the header once."""
+        n = 0
+        page = 1
+        header = None
+
+        if self.version > 2.1:
+            payload = {k: v for k, v in payload.items() if k != "page"}
+
+        while True and self.session is not None:
+            start = time.perf_counter()
+
+            response = self._send_page(uri, payload, stream=True, **kwargs)
+
+            size = 0
+
+            try:
+                lines = response.iter_lines(chunk_size=self.STREAM_CHUNK_SIZE)
+
+                # csv handles quoted newlines when lines keep their terminator
+                reader = csv.reader(line.decode("utf-8") + "\n" for line in lines)
+
+                columns = next(reader, None)
+
+                if columns and header is None:
+                    header = tuple(c.lstrip("\ufeff") for c in columns)
+
+                    if not as_dict:
+                        yield header
+
+                for row in reader:
+                    if not row:
+                        continue
+
+                    size += 1
+
+                    yield dict(zip(header, row)) if as_dict else tuple(row)
+
+            finally:
+                self._observe(
+                    response,
+                    seconds=time.perf_counter() - start,
+                    bytes=_received(response),
+                    rows=size,
+                )
+
+                response.close()
+
+            if not size:
+                logger.info("No rows to yield.")
+                break
+
+            n += size
+            page += 1
+
+            logger.info(f"{n} rows so far, on to page {page}")
+
+            if self.version > 2.1:
+                break
+
+            payload = self.advance_payload(dict(payload), size)
+
+    def query_pages(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        workers: int | None = None,
+        keyset: str | None = None,
+        stream: bool = False,
+        seek: str | int | float | None = None,
+        adaptive: AdaptivePageSize | bool = False,
+        **kwargs,
+    ):
+        """Returns the data for a specific dataset, one page at a time.
+
+        Unlike ``query_resource``, errors are raised instead of logged, so
+        callers can tell a complete pull from an interrupted one.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        workers : int | None
+            Number of pages requested concurrently (see ``query_resource``)
+        keyset : str | None
+            Unique column used for keyset pagination (see ``query_resource``)
+        stream : bool
+            Whether to decode records as they arrive (see ``query_resource``).
+            Each streamed page must be consumed before requesting the next.
+        seek : str | int | float | None
+            Key to start after, with keyset pagination
+        adaptive : AdaptivePageSize | bool
+            Whether to size pages from observed response time and size (see
+            ``query_resource``). Adaptive pages are decoded whole.
+        """
+        endpoint = self.format_endpoint(identifier=identifier)
+        uri = self.format_uri(endpoint)
+
+        n = 0
+        page = 1
+
+        if adaptive and workers is not None and workers > 1:
+            logger.info("Parallel pages are planned upfront, ignoring adaptive.")
+
+        elif adaptive:
+            if stream:
+                logger.info("Adaptive pages are measured whole, ignoring stream.")
+
+            yield from self._adaptive_pages(
+                uri, filters, adaptive, key=keyset, last=seek, **kwargs
+            )
+            return
+
+        if keyset:
+            if workers is not None and workers > 1:
+                logger.info("Keyset pagination is sequential, ignoring workers.")
+
+            yield from self._keyset_pages(
+                uri, filters, keyset, stream=stream, last=seek, **kwargs
+            )
+            return
+
+        payload = self.format_resource_payload(filters=filters)
+
+        if workers is not None and workers > 1 and self.session is not None:
+            if self.validate_payload(filters=filters).group:
+                logger.info("Grouped queries are paged sequentially.")
+
+            else:
+                total = self.count_resource(identifier, filters=filters, **kwargs)
+
+                pages = self.plan_pages(payload, total)
+
+                logger.info(f"{total} records in {len(pages)} pages, {workers} workers")
+
+                for records in self._fetch_pages(uri, pages, workers, **kwargs):
+                    n += len(records)
+                    page += 1
+
+                    logger.info(f"{n} records so far, on to page {page}")
+
+                    yield records
+
+                if pages:
+                    payload = self.advance_payload(pages[-1], 0)
+
+        # Sequential paging (also picks up rows added after counting)
+
+        while True and self.session is not None:
+            if stream:
+                records = _StreamedPage(self.stream_page(uri, payload, **kwargs))
+
+                # Consumed before paging resumes
+                yield records
+
+            else:
+                records = self.fetch_page(uri, payload, **kwargs)
+
+            if not len(records):
+                logger.info("No records to yield.")
+                break
+
+            n += len(records)
+
+            page += 1
+
+            payload = self.advance_payload(dict(payload), len(records))
+
+            logger.info(f"{n} records so far, on to page {page}")
+
+            if not stream:
+                yield records
+
+    def _keyset_pages(
+        self,
+        uri: str,
+        filters: Payload | dict | None,
+        key: str,
+        stream: bool = False,
+        last: str | int | float | None = None,
+        **kwargs,
+    ):
+        """Yield each page of records seeking past the last key received."""
+        n = 0
+
+        while True and self.session is not None:
+            payload = self.format_keyset_payload(filters=filters, key=key, last=last)
+
+            if stream:
+                records = _StreamedPage(self.stream_page(uri, payload, **kwargs))
+
+                # Consumed before paging resumes
+                yield records
+
+                final = records.last
+
+            else:
+                records = self.fetch_page(uri, payload, **kwargs)
+
+                final = records[-1] if records else None
+
+            if not len(records):
+                logger.info("No records to yield.")
+                break
+
+            if key not in final:
+                raise ValueError(f"Key {key} not returned, cannot seek next page.")
+
+            n += len(records)
+            last = final[key]
+
+            logger.info(f"{n} records so far, seeking past {key} {last}")
+
+            if not stream:
+                yield records
+
+    def _adaptive_pages(
+        self,
+        uri: str,
+        filters: Payload | dict | None,
+        adaptive: AdaptivePageSize | bool,
+        key: str | None = None,
+        last: str | int | float | None = None,
+        **kwargs,
+    ):
+        """Yield each page of records, sized from the time and bytes taken by
+        the previous ones."""
+        filters = self.validate_payload(filters=filters)
+
+        sizer = _sizer(adaptive, filters.limit)
+
+        if self.version > 2.1:
+            position = (filters.page - 1) * filters.limit
+
+            if position % sizer.minimum:
+                raise ValueError(
+                    f"Starting row {position} is not a multiple of {sizer.minimum}."
+                )
+
+        else:
+            position = filters.offset
+
+        def request(size: int):
+            if key:
+                update = {"limit": size}
+
+                payload = self.format_keyset_payload(
+                    filters=filters.model_copy(update=update), key=key, last=last
+                )
+
+            else:
+                if self.version > 2.1:
+                    update = {"limit": size, "page": position // size + 1}
+                else:
+                    update = {"limit": size, "offset": position}
+
+                payload = self.format_payload(filters=filters.model_copy(update=update))
+
+            return self._send_page(uri, payload, **kwargs)
+
+        n = 0
+
+        while True and self.session is not None:
+            # Keyset and 2.1 offsets work with any size, 3.0 pages must align
+
+            size = sizer.aligned(position) if self.version > 2.1 else sizer.size
+
+            response, size, nbytes, seconds = self._send_sized(sizer, request, size)
+
+            records = self._receive(response, seconds=seconds)
+
+            if not records:
+                logger.info("No records to yield.")
+                break
+
+            sizer.observe(seconds, nbytes, len(records), size)
+
+            n += len(records)
+            position += size
+
+            if key:
+                if key not in records[-1]:
+                    raise ValueError(f"Key {key} not returned, cannot seek next page.")
+
+                last = records[-1][key]
+
+            logger.info(f"{n} records so far, next page of {sizer.size}")
+
+            yield records
+
+        logger.info(f"Page size settled at {sizer.size} records")
+
+    def _fetch_pages(self, uri: str, pages: list[dict], workers: int, **kwargs):
+        """Yield the records of each page in order, fetching up to ``workers``
+        pages concurrently."""
+        if workers > self.pool_size:
+            logger.info(
+                f"{workers} workers share {self.pool_size} pooled connections, "
+                "raise pool_size to keep them alive"
+            )
+
+        def fetch(payload: dict):
+            return self.fetch_page(uri, payload, **kwargs)
+
+        yield from run_ordered(fetch, pages, workers)
+
+
+_DATASET = re.compile(r"/(?:resource|views)/(\w{4}-\w{4})")
+
+
+def _dataset(uri: str):
+    """Metrics label of the dataset requested, "catalog" for discovery."""
+    match = _DATASET.search(uri)
+
+    if match is not None:
+        return match.group(1)
+
+    return "catalog" if _SocrataBase.CATALOG_ENDPOINT in uri else ""
+
+
+def _rows(result):
+    """Number of records (or datasets) in a decoded page, None if not one."""
+    if isinstance(result, list):
+        return len(result)
+
+    if isinstance(result, dict) and isinstance(result.get("results"), list):
+        return len(result["results"])
+
+    return None
+
+
+def _retries(response: requests.Response):
+    """Number of times urllib3 retried the request of a response."""
+    retries = getattr(response.raw, "retries", None)
+
+    return len(retries.history) if retries is not None else 0
+
+
+def _received(response: requests.Response):
+    """Bytes read from a streamed response so far."""
+    try:
+        return response.raw.tell()
+
+    except (AttributeError, OSError, ValueError):
+        return 0
+
+
+def _sizer(adaptive: AdaptivePageSize | bool, limit: int):
+    """Page size controller starting at ``limit``, None when not adaptive."""
+    if not adaptive:
+        return None
+
+    sizer = adaptive if isinstance(adaptive, AdaptivePageSize) else AdaptivePageSize()
+    sizer.start(limit)
+
+    return sizer
+
+
+def _transient(error: Exception):
+    """Whether a failed request may succeed with a smaller page."""
+    if isinstance(error, HTTPError):
+        response = error.response
+
+        return response is not None and response.status_code >= 500
+
+    return isinstance(error, (RetryError, Timeout))
+
+
+def _prefetch(pages, size: int):
+    """Consume ``pages`` in a background thread, keeping up to ``size`` pages
+    buffered ahead of the consumer.
+
+    Exceptions raised while paging are re-raised to the consumer after the
+    pages that preceded them.
+    """
+    buffer = queue.Queue(maxsize=max(size, 1))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                if not put((page, None)):
+                    return
+
+            put((_DONE, None))
+
+        except BaseException as e:
+            put((None, e))
+
+        finally:
+            pages.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            page, error = buffer.get()
+
+            if error is not None:
+                raise error
+
+            if page is _DONE:
+                return
+
+            yield page
+
+    finally:
+        stop.set()
+
+
+class _StreamedPage:
+    """Records of a streamed page, counted as they are consumed."""
+
+    def __init__(self, records) -> None:
+        self.records = records
+        self.size = 0
+        self.last = None
+
+    def __iter__(self):
+        for record in self.records:
+            self.size += 1
+            self.last = record
+
+            yield record
+
+    def __len__(self):
+        return self.size
+
+
+class _GuardedPage:
+    """Streamed page keeping the error that ended it instead of raising."""
+
+    def __init__(self, page: _StreamedPage) -> None:
+        self.page = page
+        self.error = None
+
+    def __iter__(self):
+        try:
+            yield from self.page
+
+        except Exception as e:
+            self.error = e
+
+    def __len__(self):
+        return len(self.page)
+
+    @property
+    def last(self):
+        return self.page.last
+
+
+def _log_failure(error: Exception):
+    """Log the error that ended a query."""
+    if isinstance(error, HTTPError):
+        logger.error(f"HTTP Error: {error}")
+    else:
+        logger.error(error)
+
+
+def iter_json_array(chunks):
+    """Decode the items of a JSON array incrementally.
+
+    Only the current item and the undecoded part of the last chunk are held
+    in memory.
+
+    Parameters
+    ----------
+    chunks : Iterable[bytes]
+        UTF-8 encoded chunks of a JSON array, e.g. ``response.iter_content()``
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+
+    buffer = ""
+    pos = 0
+    eof = False
+    expect = "["
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+
+        if pos == len(buffer) or expect == "item":
+            if pos == len(buffer) and eof:
+                raise ValueError("Unexpected end of JSON array.")
+
+            if expect == "item":
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+
+                    # A scalar at the end of the buffer may be truncated
+                    complete = (
+                        eof or end < len(buffer) or isinstance(item, (dict, list))
+                    )
+
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+
+                    complete = False
+
+                if complete:
+                    pos = end
+                    expect = ","
+
+                    yield item
+
+                    continue
+
+            chunk = next(chunks, None)
+
+            if chunk is None:
+                eof = True
+                buffer = buffer[pos:] + utf8.decode(b"", final=True)
+            else:
+                buffer = buffer[pos:] + utf8.decode(chunk)
+
+            pos = 0
+
+            continue
+
+        char = buffer[pos]
+
+        if expect == "[":
+            if char != "[":
+                raise ValueError("Expected a JSON array.")
+
+            pos += 1
+            expect = "first"
+
+        elif char == "]" and expect in ("first", ","):
+            return
+
+        elif expect == "first":
+            expect = "item"
+
+        elif char == "," and expect == ",":
+            pos += 1
+            expect = "item"
+
+        else:
+            raise ValueError(f"Unexpected character {char!r} in JSON array.")
+
+
+class AsyncSocrata(_SocrataBase):
+    """Class to interact with SODA API from asyncio code.
+
+    Requires the optional ``httpx`` dependency, ``pip install dotgov[async]``.
+
+    A single instance holds one ``httpx.AsyncClient``, so concurrent
+    ``discover`` and ``query_resource`` generators share its connection pool.
+    """
+
+    def __init__(
+        self,
+        domain: str,
+        version: float = 2.1,
+        app_token: str | None = None,
+        retries: int | None = None,
+        limiter: RateLimiter | bool | None = None,
+        metrics: Callable[[RequestMetric], None] | None = None,
+    ) -> None:
+        """AsyncSocrata Instantiation.
+
+        Parameters
+        ----------
+        domain : str
+            Target domain (without scheme)
+        version : float
+            SODA API version, default 2.1
+        app_token : str | None
+            Socrata application token
+        retries : int | None
+            Number of attempts to retry request
+        limiter : RateLimiter | bool | None
+            Token bucket spacing out requests (see ``Socrata``), shared with
+            synchronous clients of the same domain and app token
+        metrics : Callable[[RequestMetric], None] | None
+            Hook called with the measurements of every request (see
+            ``Socrata``)
+        """
+        super().__init__(
+            domain=domain,
+            version=version,
+            app_token=app_token,
+            retries=retries,
+            limiter=limiter,
+            metrics=metrics,
+        )
+
+        self.session: "httpx.AsyncClient | None" = None
+
+    async def open(self):
+        """Initialize the httpx client if not already open."""
+        if self.session is not None:
+            return
+
+        try:
+            import httpx
+
+        except ImportError as e:
+            raise ImportError(
+                "AsyncSocrata requires httpx. Install with `pip install dotgov[async]`."
+            ) from e
+
+        headers = {}
+
+        if self.app_token:
+            headers["X-App-Token"] = self.app_token
+
+        else:
+            logger.info("You may be rate-limited. Register app token.")
+
+        self.session = httpx.AsyncClient(headers=headers)
+
+    async def close(self):
+        """Close the httpx client if open."""
+        if self.session is not None:
+            await self.session.aclose()
+            self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+        if exc_type:
+            logger.error(f"Error during HTTP request: {exc_value}")
+
+        # Returning False so exceptions propagate
+
+        return False
+
+    async def _send(self, method: HTTPMethod, uri: str, **kwargs):
+        """Send a request, retrying on ``RETRY_STATUSES`` with exponential
+        backoff, and on throttled responses when rate limited."""
+        retries = self.retries or 0
+
+        attempt = 0
+        throttled = 0
+
+        while True:
+            if self.limiter is not None:
+                await asyncio.sleep(self.limiter.reserve())
+
+            response = await self.session.request(method.name, uri, **kwargs)
+
+            if (
+                response.status_code == 429
+                and self.limiter is not None
+                and throttled < self.THROTTLE_RETRIES
+            ):
+                self.limiter.backoff(response.headers.get("Retry-After"), throttled)
+
+                throttled += 1
+                continue
+
+            if response.status_code not in self.RETRY_STATUSES or attempt >= retries:
+                if self.metrics is not None:
+                    self._emit(
+                        uri,
+                        method.name,
+                        status=response.status_code,
+                        seconds=response.elapsed.total_seconds(),
+                        bytes=len(response.content),
+                        retries=attempt + throttled,
+                    )
+
+                return response
+
+            await asyncio.sleep(self.BACKOFF_FACTOR * 2**attempt)
+
+            attempt += 1
+
+    async def discover(
+        self,
+        filters: DiscoverFilters | dict | None = None,
+        **kwargs,
+    ):
+        """Yields datasets associated with the domain.
+
+        Parameters
+        ----------
+        filters : DiscoverFilters | dict | None
+            Filters for the request (see DiscoverFilters)
+        """
+        if not self.session:
+            await self.open()
+
+        uri = self.format_uri(self.CATALOG_ENDPOINT)
+
+        n = 0
+
+        params = self.format_discover_params(filters=filters)
+
+        offset = params.get("offset", 0)
+
+        while self.session is not None:
+            try:
+                response = await self._send(
+                    HTTPMethod.GET, uri, params=params, **kwargs
+                )
+                response.raise_for_status()
+
+                result_set = response.json()
+
+                if result_set is None:
+                    logger.error("No result received for datasets request.")
+                    break
+
+                set_size = result_set.get("resultSetSize", 0)
+
+                if n >= set_size:
+                    logger.info(f"{n} datasets, reached result set size.")
+                    break
+
+                datasets = result_set.get("results", [])
+
+                if not datasets:
+                    logger.info("No datasets to yield.")
+                    break
+
+                n += len(datasets)
+
+                offset += params.get("limit", len(datasets))
+                params.update({"offset": offset})
+
+                logger.info(f"{n} datasets, offsetting to {offset}")
+
+            except Exception as e:
+                logger.error(e)
+                break
+
+            for dataset in datasets:
+                yield dataset
+
+    async def query_resource(
+        self,
+        identifier: str,
+        filters: Payload | dict | None = None,
+        **kwargs,
+    ):
+        """Yields the data for a specific dataset.
+
+        Parameters
+        ----------
+        identifier : str
+            Resource ID
+        filters : Payload | dict | None
+            Filters for the request (see Payload)
+        """
+        endpoint = self.format_endpoint(identifier=identifier)
+        uri = self.format_uri(endpoint)
+
+        n = 0
+        page = 1
+
+        payload = self.format_resource_payload(filters=filters)
+
+        while self.session is not None:
+            try:
+                if self.version > 2.1:
+                    response = await self._send(
+                        HTTPMethod.POST, uri, json=payload, **kwargs
+                    )
+                else:
+                    response = await self._send(
+                        HTTPMethod.GET, uri, params=payload, **kwargs
+                    )
+
+                response.raise_for_status()
+
+                records = response.json()
+
+                if not records:
+                    logger.info("No records to yield.")
+                    break
+
+                n += len(records)
+
+                page += 1
+
+                self.advance_payload(payload, len(records))
+
+                logger.info(f"{n} records so far, on to page {page}")
+
+            except Exception as e:
+                logger.error(e)
+                break
+
+            for record in records:
+                yield record
+
+
+def run_ordered(run: Callable, items: list, workers: int):
+    """Yield ``run(item)`` for each item in order, keeping up to ``workers``
+    items in flight on a pool of threads.
+
+    Parameters
+    ----------
+    run : Callable
+        Function called with each item
+    items : list
+        Items to run, in the order results are yielded
+    workers : int
+        Number of items run concurrently, 1 or less to run them in turn
+    """
+    if workers <= 1:
+        for item in items:
+            yield run(item)
+
+        return
+
+    plan = iter(items)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for item in itertools.islice(plan, workers):
+                pending.append(executor.submit(run, item))
+
+            while pending:
+                result = pending.popleft().result()
+
+                item = next(plan, None)
+
+                if item is not None:
+                    pending.append(executor.submit(run, item))
+
+                yield result
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def create_where_clause(**kwargs):
+    """Build a WHERE clause for a query, assumes AND between provided arguments.
+
+    Parameters
+    ----------
+    **kwargs : dict
+        Arbitrary keyword arguments.
+
+
+    Notes
+    -----
+    Keys are dataset dependent. They represent fields (columns) in the dataset.
+
+    Value types determine usage.
+
+    - key : tuple[str, str | int, int | float, float]
+        Values used as lower and upper bounds.
+    - key : int | float
+        Values used as `greater than` threshold.
+    - key : list | set
+        Values used to match against a set of possible values `in(...)`.
+    - key : str
+        Values used for string fuzzy matching.
+
+    Other values are ignored. For OR, NOT, other comparisons and geospatial
+    predicates (``within_circle``, ``within_box``, ``within_polygon``),
+    compose expressions with ``dotgov.soql`` instead.
     """
     clause = ""
 
@@ -676,10 +2509,7 @@ def create_where_clause(**kwargs):
 
             clause = f"{clause} AND {q}" if clause else q
 
-        # TODO: include location data functions
-        # ["within_circle", "within_box", "within_polygon"]
-        # $where=within_circle(location, 47.65, -122.33, 500)
-        # $where=within_box(location, 47.70, -122.35, 47.60, -122.30)
-        # $where=within_polygon(location, 'MULTIPOLYGON(((-122.35 47.70, -122.34 47.60, -122.30 47.65, -122.35 47.70)))')
+        # Location functions (within_circle, within_box, within_polygon),
+        # OR and NOT are built with dotgov.soql
 
     return clause
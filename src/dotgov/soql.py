@@ -0,0 +1,761 @@
+"""Composable SoQL expressions.
+
+Columns and functions combine with Python operators into expressions whose
+``str()`` is SoQL, with values quoted by ``soql_literal``::
+
+    from datetime import date
+
+    from dotgov.soql import SoQL, col, count, func, or_, within_circle
+
+    where = (col("fecha") >= date(2024, 1, 1)) & or_(
+        col("estado").isin(["ABIERTO", "EN CURSO"]),
+        col("valor").between(1e6, 1e7),
+    )
+
+    query = (
+        SoQL()
+        .where(where, within_circle("ubicacion", 4.65, -74.05, 2000))
+        .aggregate(by=["municipio"], n=count(), total=func.sum(col("valor")))
+        .having(col("n") > 10)
+        .order_by(col("n").desc())
+    )
+
+    rows = socrata.query_resource(identifier, filters=query.filters())
+
+``&``, ``|`` and ``~`` build AND, OR and NOT (mind the parentheses, Python
+binds them tighter than comparisons). Expressions render the same for both
+API versions, ``SoQL.payload`` formats them for the client's.
+"""
+
+from collections.abc import Iterable, Sequence
+import re
+
+from .prepared import soql_literal
+from .socrata import Payload, Socrata
+
+
+_NAME = re.compile(r"^:?@?[A-Za-z_][A-Za-z0-9_]*$")
+
+_RESERVED = {
+    "and",
+    "as",
+    "asc",
+    "between",
+    "by",
+    "desc",
+    "false",
+    "group",
+    "having",
+    "in",
+    "is",
+    "like",
+    "limit",
+    "not",
+    "null",
+    "offset",
+    "or",
+    "order",
+    "select",
+    "true",
+    "where",
+}
+
+
+class Expression:
+    """SoQL expression, rendered by ``str()``.
+
+    Comparison operators (``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``),
+    arithmetic (``+``, ``-``, ``*``, ``/``, ``%``) and logic (``&``, ``|``,
+    ``~``) build larger expressions. Python values on either side become
+    literals.
+    """
+
+    # Binding strength, parentheses are added around weaker operands
+    precedence = 9
+
+    def render(self) -> str:
+        raise NotImplementedError
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.render()!r})"
+
+    # Expressions compare into predicates, so they are not hashable
+
+    __hash__ = None
+
+    def __eq__(self, other):
+        return Binary("=", self, other)
+
+    def __ne__(self, other):
+        return Binary("!=", self, other)
+
+    def __lt__(self, other):
+        return Binary("<", self, other)
+
+    def __le__(self, other):
+        return Binary("<=", self, other)
+
+    def __gt__(self, other):
+        return Binary(">", self, other)
+
+    def __ge__(self, other):
+        return Binary(">=", self, other)
+
+    def __add__(self, other):
+        return Binary("+", self, other)
+
+    def __radd__(self, other):
+        return Binary("+", other, self)
+
+    def __sub__(self, other):
+        return Binary("-", self, other)
+
+    def __rsub__(self, other):
+        return Binary("-", other, self)
+
+    def __mul__(self, other):
+        return Binary("*", self, other)
+
+    def __rmul__(self, other):
+        return Binary("*", other, self)
+
+    def __truediv__(self, other):
+        return Binary("/", self, other)
+
+    def __rtruediv__(self, other):
+        return Binary("/", other, self)
+
+    def __mod__(self, other):
+        return Binary("%", self, other)
+
+    def __and__(self, other):
+        return and_(self, other)
+
+    def __rand__(self, other):
+        return and_(other, self)
+
+    def __or__(self, other):
+        return or_(self, other)
+
+    def __ror__(self, other):
+        return or_(other, self)
+
+    def __invert__(self):
+        return not_(self)
+
+    def __bool__(self):
+        raise TypeError(
+            "SoQL expressions have no truth value, use & | ~ instead of and/or/not."
+        )
+
+    def is_null(self):
+        """``x IS NULL``"""
+        return Postfix(self, "IS NULL")
+
+    def not_null(self):
+        """``x IS NOT NULL``"""
+        return Postfix(self, "IS NOT NULL")
+
+    def isin(self, values: Iterable):
+        """``x IN (...)``, raising for no values."""
+        return Membership(self, values)
+
+    def not_in(self, values: Iterable):
+        """``x NOT IN (...)``, raising for no values."""
+        return Membership(self, values, negated=True)
+
+    def between(self, low, high):
+        """``x BETWEEN low AND high``, both ends included."""
+        return Between(self, low, high)
+
+    def not_between(self, low, high):
+        """``x NOT BETWEEN low AND high``"""
+        return Between(self, low, high, negated=True)
+
+    def like(self, pattern: str):
+        """``x LIKE pattern``, with ``%`` and ``_`` wildcards."""
+        return Binary("LIKE", self, pattern)
+
+    def not_like(self, pattern: str):
+        """``x NOT LIKE pattern``"""
+        return Binary("NOT LIKE", self, pattern)
+
+    def contains(self, text: str, case: bool = False):
+        """``x LIKE '%text%'``, case-insensitive unless ``case``.
+
+        SoQL has no LIKE escape, so ``%`` and ``_`` in ``text`` still act as
+        wildcards.
+        """
+        pattern = f"%{text}%"
+
+        if case:
+            return self.like(pattern)
+
+        return func.upper(self).like(pattern.upper())
+
+    def starts_with(self, prefix: str):
+        """``starts_with(x, prefix)``"""
+        return func.starts_with(self, prefix)
+
+    def label(self, name: str):
+        """Selection of the expression named ``name`` (``x AS name``)."""
+        return Labeled(self, name)
+
+    def asc(self):
+        """Ascending ORDER BY item."""
+        return Ordering(self, descending=False)
+
+    def desc(self):
+        """Descending ORDER BY item."""
+        return Ordering(self, descending=True)
+
+
+class Column(Expression):
+    """A column, quoted with backticks when its name needs it."""
+
+    def __init__(self, name: str) -> None:
+        if not name:
+            raise ValueError("A column name is required.")
+
+        self.name = name
+
+    def render(self):
+        if _NAME.match(self.name) and self.name.lower() not in _RESERVED:
+            return self.name
+
+        return "`{}`".format(self.name.replace("`", ""))
+
+
+class Literal(Expression):
+    """A Python value, rendered by ``soql_literal``."""
+
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def render(self):
+        return soql_literal(self.value)
+
+
+class Raw(Expression):
+    """SoQL text used as is, e.g. a clause built elsewhere."""
+
+    precedence = 0
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    def render(self):
+        return self.text
+
+
+class Call(Expression):
+    """A function call, ``name(arg, ...)``."""
+
+    def __init__(self, name: str, *args) -> None:
+        self.name = name
+        self.args = [_expression(a) for a in args]
+
+    def render(self):
+        return "{}({})".format(self.name, ", ".join(a.render() for a in self.args))
+
+
+class Star(Expression):
+    """``*``, as in ``count(*)``."""
+
+    def render(self):
+        return "*"
+
+
+class Binary(Expression):
+    """Operator between two expressions."""
+
+    PRECEDENCES = {
+        "*": 7,
+        "/": 7,
+        "%": 7,
+        "+": 6,
+        "-": 6,
+        "||": 5,
+        "=": 4,
+        "!=": 4,
+        "<": 4,
+        "<=": 4,
+        ">": 4,
+        ">=": 4,
+        "LIKE": 4,
+        "NOT LIKE": 4,
+        "AND": 2,
+        "OR": 1,
+    }
+
+    def __init__(self, op: str, left, right) -> None:
+        self.op = op
+        self.left = _expression(left)
+        self.right = _expression(right)
+
+        self.precedence = self.PRECEDENCES[op]
+
+    def render(self):
+        left = _operand(self.left, self.precedence)
+
+        # Right operands of equal strength are wrapped, a - (b - c)
+        right = _operand(self.right, self.precedence + (self.op not in ("AND", "OR")))
+
+        return f"{left} {self.op} {right}"
+
+
+class Postfix(Expression):
+    """``x IS NULL`` and ``x IS NOT NULL``."""
+
+    precedence = 4
+
+    def __init__(self, operand, op: str) -> None:
+        self.operand = _expression(operand)
+        self.op = op
+
+    def render(self):
+        return f"{_operand(self.operand, self.precedence + 1)} {self.op}"
+
+
+class Membership(Expression):
+    """``x [NOT] IN (...)``."""
+
+    precedence = 4
+
+    def __init__(self, operand, values: Iterable, negated: bool = False) -> None:
+        self.operand = _expression(operand)
+        self.values = [_expression(v) for v in values]
+        self.negated = negated
+
+        if not self.values:
+            raise ValueError("IN requires at least one value.")
+
+    def render(self):
+        op = "NOT IN" if self.negated else "IN"
+        values = ", ".join(v.render() for v in self.values)
+
+        return f"{_operand(self.operand, self.precedence + 1)} {op} ({values})"
+
+
+class Between(Expression):
+    """``x [NOT] BETWEEN low AND high``."""
+
+    precedence = 4
+
+    def __init__(self, operand, low, high, negated: bool = False) -> None:
+        self.operand = _expression(operand)
+        self.low = _expression(low)
+        self.high = _expression(high)
+        self.negated = negated
+
+    def render(self):
+        op = "NOT BETWEEN" if self.negated else "BETWEEN"
+        operand, low, high = (
+            _operand(e, self.precedence + 1)
+            for e in (self.operand, self.low, self.high)
+        )
+
+        return f"{operand} {op} {low} AND {high}"
+
+
+class Not(Expression):
+    """``NOT x``."""
+
+    precedence = 3
+
+    def __init__(self, operand) -> None:
+        self.operand = _expression(operand)
+
+    def render(self):
+        return f"NOT {_operand(self.operand, Expression.precedence)}"
+
+
+class Labeled:
+    """Selection with a name, ``x AS name``."""
+
+    def __init__(self, expression, name: str) -> None:
+        self.expression = _expression(expression)
+        self.name = name
+
+    def __str__(self) -> str:
+        return f"{self.expression} AS {Column(self.name)}"
+
+
+class Ordering:
+    """ORDER BY item, ``x ASC`` or ``x DESC``."""
+
+    def __init__(self, expression, descending: bool = False) -> None:
+        self.expression = _expression(expression)
+        self.descending = descending
+
+    def __str__(self) -> str:
+        return f"{self.expression} {'DESC' if self.descending else 'ASC'}"
+
+
+def _expression(value):
+    """Value as an expression, Python values as literals."""
+    return value if isinstance(value, Expression) else Literal(value)
+
+
+def _operand(expression: Expression, precedence: int):
+    """Rendered operand, in parentheses when it binds weaker."""
+    text = expression.render()
+
+    return f"({text})" if expression.precedence < precedence else text
+
+
+def _column(value):
+    """Column names (strings) as columns, anything else as an expression."""
+    return Column(value) if isinstance(value, str) else _expression(value)
+
+
+def col(name: str):
+    """Column of a dataset, e.g. ``col("fecha")`` or ``col(":id")``.
+
+    Parameters
+    ----------
+    name : str
+        Field name of the column
+    """
+    return Column(name)
+
+
+def lit(value):
+    """Literal value (see ``soql_literal``).
+
+    Parameters
+    ----------
+    value : Any
+        Python value
+    """
+    return Literal(value)
+
+
+def and_(*conditions):
+    """Conditions combined with AND, None values skipped.
+
+    Parameters
+    ----------
+    *conditions : Expression | str | None
+        Conditions, strings used as SoQL text
+    """
+    return _combine("AND", conditions)
+
+
+def or_(*conditions):
+    """Conditions combined with OR, None values skipped.
+
+    Parameters
+    ----------
+    *conditions : Expression | str | None
+        Conditions, strings used as SoQL text
+    """
+    return _combine("OR", conditions)
+
+
+def not_(condition):
+    """Negated condition.
+
+    Parameters
+    ----------
+    condition : Expression | str
+        Condition, a string used as SoQL text
+    """
+    return Not(Raw(condition) if isinstance(condition, str) else condition)
+
+
+def _combine(op: str, conditions: Iterable):
+    parts = [Raw(c) if isinstance(c, str) else c for c in conditions if c is not None]
+
+    if not parts:
+        raise ValueError(f"{op} requires at least one condition.")
+
+    expression = parts[0]
+
+    for part in parts[1:]:
+        expression = Binary(op, expression, part)
+
+    return expression
+
+
+class _Functions:
+    """Any SoQL function by attribute, ``func.date_trunc_ym(col("fecha"))``."""
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return lambda *args: Call(name, *args)
+
+
+func = _Functions()
+
+
+def count(expression=None):
+    """``count(*)``, or the non-null values of an expression.
+
+    Parameters
+    ----------
+    expression : Expression | str | None
+        Expression or column name counted, all rows when None
+    """
+    return Call("count", Star() if expression is None else _column(expression))
+
+
+def within_circle(column, latitude: float, longitude: float, radius: float):
+    """Points (or shapes) within ``radius`` meters of a location.
+
+    Parameters
+    ----------
+    column : Expression | str
+        Location or point column
+    latitude : float
+        Latitude of the center
+    longitude : float
+        Longitude of the center
+    radius : float
+        Radius in meters
+    """
+    return Call("within_circle", _column(column), latitude, longitude, radius)
+
+
+def within_box(
+    column,
+    north: float,
+    west: float,
+    south: float,
+    east: float,
+):
+    """Points (or shapes) within a bounding box.
+
+    Parameters
+    ----------
+    column : Expression | str
+        Location or point column
+    north : float
+        Latitude of the north-west corner
+    west : float
+        Longitude of the north-west corner
+    south : float
+        Latitude of the south-east corner
+    east : float
+        Longitude of the south-east corner
+    """
+    return Call("within_box", _column(column), north, west, south, east)
+
+
+def within_polygon(column, polygon: str | Sequence):
+    """Points (or shapes) within a polygon.
+
+    Parameters
+    ----------
+    column : Expression | str
+        Location or point column
+    polygon : str | Sequence
+        WKT ``MULTIPOLYGON``, or the ``(longitude, latitude)`` points of a
+        ring, or a list of rings (the first outer, the others holes). Rings
+        are closed if needed.
+    """
+    if not isinstance(polygon, str):
+        polygon = multipolygon(polygon)
+
+    return Call("within_polygon", _column(column), polygon)
+
+
+def multipolygon(rings: Sequence):
+    """WKT ``MULTIPOLYGON`` of one polygon.
+
+    Parameters
+    ----------
+    rings : Sequence
+        ``(longitude, latitude)`` points of a ring, or a list of rings
+    """
+    if rings and isinstance(rings[0][0], (int, float)):
+        rings = [rings]
+
+    parts = []
+
+    for ring in rings:
+        points = [tuple(map(float, p)) for p in ring]
+
+        if len(points) < 3:
+            raise ValueError("A polygon ring needs at least three points.")
+
+        if points[0] != points[-1]:
+            points.append(points[0])
+
+        parts.append("({})".format(", ".join(f"{x!r} {y!r}" for x, y in points)))
+
+    return "MULTIPOLYGON (({}))".format(", ".join(parts))
+
+
+class SoQL:
+    """Builder of the clauses of a query, as filters for either API version.
+
+    Every method returns a new builder, so a base query can be refined in
+    several ways. ``where`` and ``having`` add conditions with AND.
+    """
+
+    def __init__(self) -> None:
+        self._select: tuple = ()
+        self._where: tuple = ()
+        self._group: tuple = ()
+        self._having: tuple = ()
+        self._order: tuple = ()
+        self._limit: int | None = None
+
+    def _with(self, **changes):
+        query = SoQL()
+        query.__dict__.update({**self.__dict__, **changes})
+
+        return query
+
+    def select(self, *items, **labeled):
+        """Add selections: column names, expressions, or ``name=expression``.
+
+        Parameters
+        ----------
+        *items : Expression | Labeled | str
+            Selections, strings as column names
+        **labeled : Expression
+            Selections named by their keyword
+        """
+        items = [*items, *(_expression(e).label(k) for k, e in labeled.items())]
+
+        return self._with(_select=(*self._select, *map(_selection, items)))
+
+    def where(self, *conditions):
+        """Add conditions rows must meet.
+
+        Parameters
+        ----------
+        *conditions : Expression | str
+            Conditions, strings used as SoQL text
+        """
+        return self._with(_where=(*self._where, *conditions))
+
+    def group_by(self, *items):
+        """Add grouping columns or expressions.
+
+        Parameters
+        ----------
+        *items : Expression | str
+            Groupings, strings as column names
+        """
+        return self._with(_group=(*self._group, *map(_column, items)))
+
+    def having(self, *conditions):
+        """Add conditions groups must meet.
+
+        Parameters
+        ----------
+        *conditions : Expression | str
+            Conditions, strings used as SoQL text
+        """
+        return self._with(_having=(*self._having, *conditions))
+
+    def order_by(self, *items):
+        """Add ORDER BY items, ascending unless built with ``.desc()``.
+
+        Parameters
+        ----------
+        *items : Ordering | Expression | str
+            Orderings, strings as column names
+        """
+        items = [i if isinstance(i, Ordering) else _column(i) for i in items]
+
+        return self._with(_order=(*self._order, *items))
+
+    def limit(self, limit: int):
+        """Set the page size.
+
+        Parameters
+        ----------
+        limit : int
+            Max number of results per request
+        """
+        return self._with(_limit=limit)
+
+    def aggregate(self, by: Iterable = (), **aggregates):
+        """Select and group by ``by``, with named aggregates.
+
+        ``SoQL().aggregate(by=["ward"], n=count())`` selects
+        ``ward, count(*) AS n`` grouped by ``ward``.
+
+        Parameters
+        ----------
+        by : Iterable
+            Grouping columns or expressions
+        **aggregates : Expression
+            Aggregates named by their keyword
+        """
+        by = list(by)
+
+        return self.select(*by, **aggregates).group_by(*by)
+
+    def filters(self):
+        """Returns the clauses as filters (see Payload) for either version."""
+        filters = {}
+
+        if self._select:
+            filters["select"] = ", ".join(str(s) for s in self._select)
+
+        if self._where:
+            filters["where"] = str(and_(*self._where))
+
+        if self._group:
+            filters["group"] = ", ".join(str(g) for g in self._group)
+
+        if self._having:
+            filters["having"] = str(and_(*self._having))
+
+        if self._order:
+            filters["order"] = ", ".join(str(o) for o in self._order)
+
+        if self._limit is not None:
+            filters["limit"] = self._limit
+
+        return filters
+
+    def payload(self, socrata: Socrata, **filters):
+        """Returns the payload for a client's version: ``$``-params for 2.1,
+        the ``query`` string for 3.0.
+
+        Parameters
+        ----------
+        socrata : Socrata
+            Client the payload is meant for
+        **filters : dict
+            Other filters, e.g. ``offset`` or ``page``
+        """
+        payload = Payload(**{"version": socrata.version, **self.filters(), **filters})
+
+        return socrata.format_payload(filters=payload)
+
+    def __str__(self) -> str:
+        parts = [f"SELECT {self.filters().get('select', '*')}"]
+
+        for clause, key in [
+            ("WHERE", "where"),
+            ("GROUP BY", "group"),
+            ("HAVING", "having"),
+            ("ORDER BY", "order"),
+            ("LIMIT", "limit"),
+        ]:
+            value = self.filters().get(key)
+
+            if value is not None:
+                parts.append(f"{clause} {value}")
+
+        return " ".join(parts)
+
+
+def _selection(item):
+    """Selection as a column, expression or labeled expression."""
+    if isinstance(item, Labeled):
+        return item
+
+    return _column(item)
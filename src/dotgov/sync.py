@@ -0,0 +1,318 @@
+from pathlib import Path
+import json
+import logging
+import sqlite3
+import threading
+
+from pydantic import BaseModel
+
+from .prepared import soql_literal
+from .socrata import Payload, Socrata
+
+
+logger = logging.getLogger(__name__)
+
+
+class SyncResult(BaseModel):
+    """Outcome of a sync run.
+
+    Attributes
+    ----------
+    domain : str
+        Domain of the dataset
+    identifier : str
+        Resource ID
+    rows : int
+        Number of rows fetched and upserted
+    previous : str | None
+        Watermark before the run
+    watermark : str | None
+        Watermark after the run
+    """
+
+    domain: str
+    identifier: str
+    rows: int = 0
+    previous: str | None = None
+    watermark: str | None = None
+
+
+class SyncStore:
+    """Local SQLite store of synced dataset rows and their watermarks.
+
+    Rows are kept per (domain, dataset) and upserted by ``:id``. The
+    watermark is the highest ``:updated_at`` of a completed run.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        """SyncStore Instantiation.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite file holding the store, created if missing
+        """
+        self.path = Path(path)
+
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                domain TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (domain, identifier)
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                domain TEXT NOT NULL,
+                identifier TEXT NOT NULL,
+                id TEXT NOT NULL,
+                updated_at TEXT,
+                record TEXT NOT NULL,
+                PRIMARY KEY (domain, identifier, id)
+            );
+            """
+        )
+
+    def watermark(self, domain: str, identifier: str):
+        """Returns the watermark of a dataset, None if never synced.
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the dataset
+        identifier : str
+            Resource ID
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT updated_at FROM watermarks WHERE domain = ? AND identifier = ?",
+                (domain, identifier),
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def set_watermark(self, domain: str, identifier: str, updated_at: str):
+        """Move the watermark of a dataset forward (never backwards).
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the dataset
+        identifier : str
+            Resource ID
+        updated_at : str
+            New ``:updated_at`` watermark
+        """
+        with self._lock, self._db:
+            self._db.execute(
+                """INSERT INTO watermarks VALUES (?, ?, ?)
+                ON CONFLICT (domain, identifier) DO UPDATE
+                SET updated_at = MAX(updated_at, excluded.updated_at)""",
+                (domain, identifier, updated_at),
+            )
+
+    def upsert(self, domain: str, identifier: str, records: list[dict]):
+        """Insert or replace records by their ``:id``.
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the dataset
+        identifier : str
+            Resource ID
+        records : list[dict]
+            Records including ``:id`` and ``:updated_at``
+        """
+        rows = [
+            (domain, identifier, r[":id"], r.get(":updated_at"), json.dumps(r))
+            for r in records
+        ]
+
+        with self._lock, self._db:
+            self._db.executemany(
+                """INSERT INTO rows VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (domain, identifier, id) DO UPDATE
+                SET updated_at = excluded.updated_at, record = excluded.record""",
+                rows,
+            )
+
+    def records(self, domain: str, identifier: str):
+        """Yields the stored records of a dataset.
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the dataset
+        identifier : str
+            Resource ID
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record FROM rows WHERE domain = ? AND identifier = ? ORDER BY id",
+                (domain, identifier),
+            ).fetchall()
+
+        for (record,) in rows:
+            yield json.loads(record)
+
+    def count(self, domain: str, identifier: str):
+        """Returns the number of stored records of a dataset.
+
+        Parameters
+        ----------
+        domain : str
+            Domain of the dataset
+        identifier : str
+            Resource ID
+        """
+        with self._lock:
+            (n,) = self._db.execute(
+                "SELECT COUNT(*) FROM rows WHERE domain = ? AND identifier = ?",
+                (domain, identifier),
+            ).fetchone()
+
+        return n
+
+    def close(self):
+        """Close the SQLite connection."""
+        self._db.close()
+
+
+def format_sync_filters(
+    socrata: Socrata,
+    filters: Payload | dict | None = None,
+    since: str | None = None,
+    after: tuple[str, str] | None = None,
+):
+    """Filters fetching rows changed since a watermark, ordered by change.
+
+    ``:id`` and ``:updated_at`` are added to the SELECT clause, and the
+    watermark predicate is combined with any WHERE clause provided. Pages
+    seek past the last ``(:updated_at, :id)`` received instead of using an
+    offset, so rows updated during a run move to the end of the ordering
+    without shifting the rows not fetched yet.
+
+    Parameters
+    ----------
+    socrata : Socrata
+        Client the filters are meant for
+    filters : Payload | dict | None
+        Filters for the request (see Payload)
+    since : str | None
+        Watermark, rows updated at or after it are fetched
+    after : tuple[str, str] | None
+        ``:updated_at`` and ``:id`` of the last row received, rows after it
+        are fetched
+    """
+    filters = socrata.validate_payload(filters=filters)
+
+    where = filters.where
+
+    if since is not None:
+        changed = f":updated_at >= {soql_literal(since)}"
+
+        where = f"({where}) AND {changed}" if where else changed
+
+    if after is not None:
+        updated, key = map(soql_literal, after)
+        seek = f"(:updated_at > {updated} OR (:updated_at = {updated} AND :id > {key}))"
+
+        where = f"({where}) AND {seek}" if where else seek
+
+    select = filters.select or "*"
+    select = f":id, :updated_at, {select}"
+
+    update = {"select": select, "where": where, "order": ":updated_at, :id"}
+
+    if socrata.version > 2.1:
+        update["page"] = 1
+    else:
+        update["offset"] = 0
+
+    return filters.model_copy(update=update)
+
+
+def sync_resource(
+    socrata: Socrata,
+    identifier: str,
+    store: SyncStore,
+    filters: Payload | dict | None = None,
+    **kwargs,
+):
+    """Fetch rows changed since the last run and upsert them into a store.
+
+    Rows updated at or after the stored ``:updated_at`` watermark are
+    fetched (all rows on the first run), upserted by ``:id`` page by page,
+    and the watermark only moves forward once every page was stored. Pages
+    seek on ``(:updated_at, :id)`` so rows updated mid-run are fetched again
+    at the end rather than skipped. Every row must carry ``:updated_at`` and
+    ``:id``, which are always selected. An interrupted run raises, and the
+    next one fetches the same rows again. Deleted rows are not detected.
+
+    Parameters
+    ----------
+    socrata : Socrata
+        Open client for the dataset's domain
+    identifier : str
+        Resource ID
+    store : SyncStore
+        Local store of rows and watermarks
+    filters : Payload | dict | None
+        Filters for the request (see Payload), restricting synced rows. The
+        ``limit`` sets the page size.
+    **kwargs : dict
+        Arguments for ``Socrata.fetch_page`` (e.g. ``timeout``)
+    """
+    if not socrata.session:
+        socrata.open()
+
+    domain = socrata.domain
+
+    previous = store.watermark(domain, identifier)
+
+    result = SyncResult(domain=domain, identifier=identifier, previous=previous)
+
+    uri = socrata.format_uri(socrata.format_endpoint(identifier=identifier))
+
+    latest = previous
+    after = None
+
+    while True:
+        page = format_sync_filters(
+            socrata, filters=filters, since=previous, after=after
+        )
+
+        records = socrata.fetch_page(
+            uri, socrata.format_payload(filters=page), **kwargs
+        )
+
+        if not records:
+            break
+
+        if not all(r.get(":updated_at") and r.get(":id") for r in records):
+            raise ValueError(f"Rows of {identifier} lack :updated_at or :id.")
+
+        # Rows are ordered by change, the last one carries the page's latest
+
+        last = records[-1]
+        after = (last[":updated_at"], last[":id"])
+
+        store.upsert(domain, identifier, records)
+
+        result.rows += len(records)
+
+        latest = after[0]
+
+    if latest is not None:
+        store.set_watermark(domain, identifier, latest)
+
+    result.watermark = latest
+
+    logger.info(f"{result.rows} rows synced for {identifier}, watermark {latest}")
+
+    return result
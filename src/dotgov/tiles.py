@@ -0,0 +1,290 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+import logging
+
+from .decode import decode_point
+from .socrata import Payload, Socrata, run_ordered
+from .soql import within_box
+
+
+logger = logging.getLogger(__name__)
+
+# Rows above which a tile is split, and how many times a tile may be split
+
+MAX_ROWS = 50_000
+MAX_DEPTH = 6
+
+
+class Tile(NamedTuple):
+    """Bounding box in degrees, in ``within_box`` order"""
+
+    north: float
+    west: float
+    south: float
+    east: float
+
+    def grid(self, rows: int, columns: int | None = None):
+        """Split the tile into ``rows`` by ``columns`` (default ``rows``)
+        tiles, north-west first."""
+        columns = columns or rows
+
+        height = (self.north - self.south) / rows
+        width = (self.east - self.west) / columns
+
+        # Outer edges are kept exact so no point is lost to rounding
+
+        def latitude(i: int):
+            if i == rows:
+                return self.south
+
+            return self.north - i * height
+
+        def longitude(j: int):
+            if j == columns:
+                return self.east
+
+            return self.west + j * width
+
+        return [
+            Tile(latitude(i), longitude(j), latitude(i + 1), longitude(j + 1))
+            for i in range(rows)
+            for j in range(columns)
+        ]
+
+    def split(self):
+        """Split the tile into its four quadrants."""
+        return self.grid(2)
+
+    def condition(self, column: str):
+        """``within_box`` expression matching the tile."""
+        return within_box(column, *self)
+
+    def owns(self, longitude: float, latitude: float, bbox: "Tile"):
+        """Whether a point matched by the tile belongs to it.
+
+        ``within_box`` includes every edge, so a point on an edge shared by
+        two tiles matches both. Tiles only own their north and west edges,
+        plus the south and east edges they share with ``bbox``, so each point
+        of the box belongs to a single tile.
+        """
+        south = latitude > self.south or self.south == bbox.south
+        east = longitude < self.east or self.east == bbox.east
+
+        return south and east
+
+
+def query_tiles(
+    socrata: Socrata,
+    identifier: str,
+    column: str,
+    bbox: Tile | tuple[float, float, float, float],
+    filters: Payload | dict | None = None,
+    grid: int = 2,
+    max_rows: int = MAX_ROWS,
+    max_depth: int = MAX_DEPTH,
+    workers: int | None = None,
+    **kwargs,
+):
+    """Returns the records within a bounding box, fetched tile by tile.
+
+    The box is split into a ``grid`` by ``grid`` grid and tiles matching more
+    than ``max_rows`` rows are split into quadrants (see ``plan_tiles``).
+    Tiles are queried concurrently with ``within_box`` through
+    ``Socrata.query_pages`` and records are yielded in tile order.
+    ``within_box`` includes its edges, so records on a shared edge match two
+    tiles; each is only yielded by the tile owning it (see ``Tile.owns``),
+    which needs ``column`` in the SELECT clause and adds it when missing.
+    Records without a location are not returned. Errors are raised.
+
+    Parameters
+    ----------
+    socrata : Socrata
+        Client for the dataset's domain
+    identifier : str
+        Resource ID
+    column : str
+        Location or point column
+    bbox : Tile | tuple[float, float, float, float]
+        North, west, south and east edges of the area, in degrees
+    filters : Payload | dict | None
+        Filters for the request (see Payload), the WHERE clause is combined
+        with each tile's. Rows are ordered by ``:id`` unless ``order`` is
+        given, so tiles matching several pages page deterministically.
+    grid : int
+        Number of rows and columns the box is first split into
+    max_rows : int
+        Rows above which a tile is split
+    max_depth : int
+        Number of times a tile may be split, bounding the plan where points
+        pile up on the same spot
+    workers : int | None
+        Number of tiles counted and queried concurrently
+    **kwargs : dict
+        Arguments for ``Socrata.query_pages`` (e.g. ``timeout``)
+    """
+    if not socrata.session:
+        socrata.open()
+
+    bbox = Tile(*map(float, bbox))
+
+    filters = socrata.validate_payload(filters=filters)
+
+    update = {"select": _tile_select(filters.select, column)}
+
+    if not filters.order:
+        update["order"] = ":id"
+
+    filters = filters.model_copy(update=update)
+
+    plan = plan_tiles(
+        socrata,
+        identifier,
+        column,
+        bbox,
+        filters=filters,
+        grid=grid,
+        max_rows=max_rows,
+        max_depth=max_depth,
+        workers=workers,
+    )
+
+    tiles = [tile for tile, rows in plan if rows]
+
+    logger.info(f"{sum(rows for _, rows in plan)} rows in {len(tiles)} tiles")
+
+    def run(tile: Tile):
+        tile_filters = _tile_filters(filters, column, tile)
+
+        pages = socrata.query_pages(identifier, filters=tile_filters, **kwargs)
+
+        return [
+            record
+            for records in pages
+            for record in records
+            if _owned(tile, record.get(column), bbox)
+        ]
+
+    for records in run_ordered(run, tiles, workers or 1):
+        yield from records
+
+
+def plan_tiles(
+    socrata: Socrata,
+    identifier: str,
+    column: str,
+    bbox: Tile | tuple[float, float, float, float],
+    filters: Payload | dict | None = None,
+    grid: int = 2,
+    max_rows: int = MAX_ROWS,
+    max_depth: int = MAX_DEPTH,
+    workers: int | None = None,
+):
+    """Split a bounding box into tiles matching at most ``max_rows`` rows.
+
+    Each level of tiles is counted concurrently with ``count(*)`` and the
+    tiles above ``max_rows`` are split into quadrants for the next level,
+    until ``max_depth`` splits. Tiles still above it are kept as they are.
+
+    Parameters
+    ----------
+    socrata : Socrata
+        Client for the dataset's domain
+    identifier : str
+        Resource ID
+    column : str
+        Location or point column
+    bbox : Tile | tuple[float, float, float, float]
+        North, west, south and east edges of the area, in degrees
+    filters : Payload | dict | None
+        Filters combined with each tile, only the WHERE clause affects counts
+    grid : int
+        Number of rows and columns the box is first split into
+    max_rows : int
+        Rows above which a tile is split
+    max_depth : int
+        Number of times a tile may be split
+    workers : int | None
+        Number of tiles counted concurrently
+
+    Returns
+    -------
+    list[tuple[Tile, int]]
+        Tiles in north-west to south-east order, with their row counts
+    """
+    if not socrata.session:
+        socrata.open()
+
+    bbox = Tile(*map(float, bbox))
+
+    if bbox.north < bbox.south or bbox.east < bbox.west:
+        raise ValueError(f"Expected north >= south and east >= west, got {bbox}.")
+
+    filters = socrata.validate_payload(filters=filters)
+
+    def count(tile: Tile):
+        tile_filters = _tile_filters(filters, column, tile)
+
+        return socrata.count_resource(identifier, filters=tile_filters)
+
+    level = bbox.grid(grid)
+    plan = []
+
+    with ThreadPoolExecutor(max_workers=workers or 1) as executor:
+        for depth in range(max_depth + 1):
+            counts = list(executor.map(count, level))
+
+            split = depth < max_depth
+
+            upcoming = []
+
+            for tile, rows in zip(level, counts):
+                if rows > max_rows and split:
+                    upcoming.append(tile)
+                else:
+                    plan.append((tile, rows))
+
+            if not upcoming:
+                break
+
+            logger.debug(f"Splitting {len(upcoming)} tiles at depth {depth + 1}")
+
+            level = [quadrant for tile in upcoming for quadrant in tile.split()]
+
+    crowded = sum(rows > max_rows for _, rows in plan)
+
+    if crowded:
+        logger.info(f"{crowded} tiles still exceed {max_rows} rows at max depth.")
+
+    return sorted(plan, key=lambda item: (-item[0].north, item[0].west))
+
+
+def _tile_filters(filters: Payload, column: str, tile: Tile):
+    """Filters restricting rows to a tile."""
+    match = str(tile.condition(column))
+
+    where = f"({filters.where}) AND {match}" if filters.where else match
+
+    return filters.model_copy(update={"where": where})
+
+
+def _tile_select(select: str | None, column: str):
+    """SELECT clause returning the location column, ``*`` already does."""
+    if select is None or column in [c.strip() for c in select.split(",")]:
+        return select
+
+    return f"{select}, {column}"
+
+
+def _owned(tile: Tile, location, bbox: Tile):
+    """Whether a record's location belongs to the tile, True when it cannot be
+    read."""
+    if isinstance(location, dict) and "latitude" in location:
+        point = (float(location["longitude"]), float(location["latitude"]))
+
+    else:
+        try:
+            point = decode_point(location)
+        except (KeyError, TypeError, ValueError):
+            return True
+
+    return tile.owns(*point, bbox)
@@ -0,0 +1,185 @@
+import json
+
+import pytest
+import responses
+
+from dotgov.adaptive import AdaptivePageSize
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+CATALOG_PATH = "/api/catalog/v1"
+
+
+def test_sizes_stay_on_ladder_within_bounds():
+    sizer = AdaptivePageSize(initial=1000, minimum=125, maximum=5000)
+
+    assert sizer.size == 1000
+    assert sizer.fit(3000) == 2000
+    assert sizer.fit(10) == 125
+    assert sizer.fit(10**6) == 4000
+
+    sizer.size = 1000
+
+    assert sizer.aligned(0) == 1000
+    assert sizer.aligned(1250) == 250
+    assert sizer.aligned(125) == 125
+
+
+def test_grows_on_fast_full_pages_and_shrinks_on_slow_or_large_ones():
+    sizer = AdaptivePageSize(
+        initial=200, minimum=100, target_seconds=1.0, target_bytes=10_000
+    )
+
+    sizer.observe(seconds=0.1, nbytes=1_000, rows=200, size=200)
+    assert sizer.size == 400
+
+    # Partial page, nothing to learn
+    sizer.observe(seconds=0.1, nbytes=1_000, rows=10, size=400)
+    assert sizer.size == 400
+
+    # Twice as many rows would exceed the byte target
+    sizer.observe(seconds=0.1, nbytes=6_000, rows=400, size=400)
+    assert sizer.size == 400
+
+    sizer.observe(seconds=1.5, nbytes=1_000, rows=400, size=400)
+    assert sizer.size == 200
+
+    assert sizer.shrink(200) == 100
+    assert sizer.shrink(100) is None
+    assert sizer.sizes == [200, 400, 400, 400]
+
+
+def test_query_resource_v21_adaptive_grows_pages(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+    data = [{"i": i} for i in range(20)]
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        limit = int(request.params["$limit"])
+
+        return (200, {}, json.dumps(data[offset : offset + limit]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    sizer = AdaptivePageSize(minimum=2, maximum=8)
+
+    rows = list(
+        socrata_default_client.query_resource(RID, filters={"limit": 2}, adaptive=sizer)
+    )
+
+    assert rows == data
+
+    offsets = [int(c.request.params["$offset"]) for c in mocked.calls]
+    assert offsets == [0, 2, 6, 14, 22]
+    assert sizer.size == 8
+
+
+def test_query_resource_adaptive_halves_and_retries_server_errors(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+    data = [{"i": i} for i in range(5)]
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        limit = int(request.params["$limit"])
+
+        if limit > 2:
+            return (503, {}, "")
+
+        return (200, {}, json.dumps(data[offset : offset + limit]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    sizer = AdaptivePageSize(minimum=1, maximum=8)
+
+    rows = list(
+        socrata_default_client.query_pages(RID, filters={"limit": 8}, adaptive=sizer)
+    )
+
+    assert [r for page in rows for r in page] == data
+    assert sizer.shrinks > 0
+    assert set(sizer.sizes) == {2}
+
+
+def test_query_pages_adaptive_raises_when_minimum_fails(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+
+    mocked.add(responses.GET, url, status=500)
+
+    sizer = AdaptivePageSize(minimum=2, maximum=8)
+
+    with pytest.raises(Exception):
+        list(
+            socrata_default_client.query_pages(
+                RID, filters={"limit": 8}, adaptive=sizer
+            )
+        )
+
+    assert len(mocked.calls) == 3
+
+
+def test_query_resource_v30_adaptive_pages_stay_aligned(
+    socrata_v3_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_v3_client.domain}/api/v3/views/{RID}/query.json"
+    data = [{"i": i} for i in range(10)]
+
+    def callback(request):
+        page = json.loads(request.body)["page"]
+        size = page["pageSize"]
+        start = (page["pageNumber"] - 1) * size
+
+        return (200, {}, json.dumps(data[start : start + size]))
+
+    mocked.add_callback(responses.POST, url, callback=callback)
+
+    sizer = AdaptivePageSize(minimum=2, maximum=8)
+
+    rows = list(
+        socrata_v3_client.query_resource(RID, filters={"limit": 2}, adaptive=sizer)
+    )
+
+    assert rows == data
+
+    pages = [json.loads(c.request.body)["page"] for c in mocked.calls]
+    assert [(p["pageNumber"], p["pageSize"]) for p in pages] == [
+        (1, 2),
+        (2, 2),
+        (2, 4),
+        (2, 8),
+        (3, 8),
+    ]
+
+
+def test_discover_adaptive_grows_pages(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    def callback(request):
+        offset = int(request.params["offset"])
+        limit = int(request.params["limit"])
+        results = [{"resource": {"id": str(i)}} for i in range(offset, 7)][:limit]
+
+        return (200, {}, json.dumps({"resultSetSize": 7, "results": results}))
+
+    mocked.add_callback(
+        responses.GET,
+        f"https://{socrata_default_client.domain}{CATALOG_PATH}",
+        callback=callback,
+    )
+
+    sizer = AdaptivePageSize(minimum=1, maximum=4)
+
+    rows = list(socrata_default_client.discover(filters={"limit": 1}, adaptive=sizer))
+
+    assert [r["resource"]["id"] for r in rows] == [str(i) for i in range(7)]
+    assert sizer.sizes == [1, 2, 4]
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+import responses
+
+from dotgov.socrata import Socrata
+
+
+pa = pytest.importorskip("pyarrow")
+
+from dotgov.arrow import record_batch, schema_from_columns  # noqa: E402
+
+
+pytestmark = pytest.mark.unit
+
+
+COLUMNS = [
+    {"fieldName": "name", "dataTypeName": "text"},
+    {"fieldName": "amount", "dataTypeName": "number"},
+    {"fieldName": "active", "dataTypeName": "checkbox"},
+    {"fieldName": "day", "dataTypeName": "calendar_date"},
+    {"fieldName": "location", "dataTypeName": "point"},
+]
+
+
+def test_schema_from_columns_maps_socrata_types():
+    schema = schema_from_columns(COLUMNS)
+
+    assert schema.field("name").type == pa.string()
+    assert schema.field("amount").type == pa.float64()
+    assert schema.field("active").type == pa.bool_()
+    assert schema.field("day").type == pa.timestamp("ms")
+    assert schema.field("location").type == pa.string()
+
+
+def test_record_batch_casts_text_values_and_fills_missing_fields():
+    schema = schema_from_columns(COLUMNS)
+
+    records = [
+        {
+            "name": "a",
+            "amount": "12.5",
+            "active": True,
+            "day": "2024-01-01T00:00:00.000",
+            "location": {"type": "Point", "coordinates": [-74.1, 4.6]},
+        },
+        {"name": "b"},
+    ]
+
+    batch = record_batch(records, schema)
+
+    assert batch.schema == schema
+    assert batch.column("amount").to_pylist() == [12.5, None]
+    assert batch.column("active").to_pylist() == [True, None]
+    assert json.loads(batch.column("location")[0].as_py())["type"] == "Point"
+
+
+def test_query_resource_batches_yields_one_batch_per_page(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    base = f"https://{socrata_default_client.domain}"
+
+    mocked.add(responses.GET, f"{base}/api/views/{rid}.json", json={"columns": COLUMNS})
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        rows = [{"name": str(i), "amount": str(i)} for i in range(offset, 3)][:2]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, f"{base}/resource/{rid}.json", callback=callback)
+
+    batches = list(
+        socrata_default_client.query_resource_batches(rid, filters={"limit": 2})
+    )
+
+    assert [b.num_rows for b in batches] == [2, 1]
+    assert all(b.schema == batches[0].schema for b in batches)
+    assert pa.Table.from_batches(batches).column("amount").to_pylist() == [0, 1, 2]
@@ -0,0 +1,41 @@
+from pathlib import Path
+import importlib.util
+
+import pytest
+
+
+pytestmark = pytest.mark.unit
+
+
+PATH = Path(__file__).parents[1] / "benchmarks" / "bench_socrata.py"
+
+
+@pytest.fixture(scope="module")
+def bench():
+    spec = importlib.util.spec_from_file_location("bench_socrata", PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def test_benchmarks_run_and_flag_regressions(bench):
+    results = bench.run("validate", min_time=0, min_rounds=1)
+
+    assert set(results) == {"validate[Payload]", "validate[DiscoverFilters]"}
+
+    slower = {
+        name: {**result, "ops_per_sec": result["ops_per_sec"] * 2}
+        for name, result in results.items()
+    }
+
+    _, regressions = bench.compare(results, slower, threshold=0.25)
+
+    assert sorted(regressions) == sorted(results)
+
+
+def test_page_loops_consume_canned_pages(bench):
+    with bench.BENCHMARKS["discover[page=1000]"]() as (operation, items):
+        operation()
+
+    assert items == 5000
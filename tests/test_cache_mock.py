@@ -0,0 +1,100 @@
+import json
+
+import pytest
+import responses
+
+from dotgov.cache import ResponseCache
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture
+def cache(tmp_path) -> ResponseCache:
+    return ResponseCache(tmp_path / "cache.sqlite")
+
+
+def test_key_normalizes_query_params_and_json_bodies():
+    a = ResponseCache.key("GET", "https://x.org/r.json?b=2&a=1")
+    b = ResponseCache.key("GET", "https://x.org/r.json?a=1&b=2")
+
+    assert a == b
+
+    c = ResponseCache.key("POST", "https://x.org/q", b'{"x": 1, "y": 2}')
+    d = ResponseCache.key("POST", "https://x.org/q", b'{"y": 2, "x": 1}')
+
+    assert c == d
+    assert a != c
+
+
+def test_revalidates_with_etag_and_serves_304_from_disk(
+    domain: str, cache: ResponseCache, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{domain}/resource/{rid}.json"
+
+    pages = {"0": [{"i": 1}, {"i": 2}], "2": []}
+
+    def callback(request):
+        offset = request.params["$offset"]
+        etag = f'"v1-{offset}"'
+
+        if request.headers.get("If-None-Match") == etag:
+            return (304, {"ETag": etag}, "")
+
+        return (200, {"ETag": etag}, json.dumps(pages[offset]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    with Socrata(domain=domain, cache=cache) as s:
+        first = list(s.query_resource(rid, filters={"limit": 2}))
+
+    with Socrata(domain=domain, cache=cache) as s:
+        second = list(s.query_resource(rid, filters={"limit": 2}))
+
+    assert first == second == [{"i": 1}, {"i": 2}]
+    assert cache.hits == 2
+    assert cache.misses == 2
+
+    assert "If-None-Match" not in mocked.calls[0].request.headers
+    assert mocked.calls[2].request.headers["If-None-Match"] == '"v1-0"'
+
+
+def test_evicts_least_recently_used_entries(cache: ResponseCache):
+    cache.max_bytes = 10
+
+    cache.set("a", {"ETag": "1"}, b"12345")
+    cache.set("b", {"ETag": "2"}, b"12345")
+
+    assert cache.get("a") is not None
+
+    cache.set("c", {"ETag": "3"}, b"12345")
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.evictions == 1
+    assert cache.stats()["size"] == 10
+
+
+def test_streamed_requests_bypass_the_cache(
+    domain: str, cache: ResponseCache, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{domain}/resource/{rid}.json"
+
+    pages = {"0": [{"i": 1}, {"i": 2}], "2": []}
+
+    def callback(request):
+        offset = request.params["$offset"]
+
+        return (200, {"ETag": f'"v1-{offset}"'}, json.dumps(pages[offset]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    with Socrata(domain=domain, cache=cache) as s:
+        rows = list(s.query_resource(rid, filters={"limit": 2}, stream=True))
+
+    assert rows == [{"i": 1}, {"i": 2}]
+    assert cache.stats()["size"] == 0
+    assert cache.misses == 0
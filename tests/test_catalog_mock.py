@@ -0,0 +1,169 @@
+import json
+
+import pytest
+import responses
+
+from dotgov.catalog import CatalogIndex
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+CATALOG_PATH = "/api/catalog/v1"
+
+
+def asset(i: str, name: str, updated: str = "2024-01-01", **extra) -> dict:
+    return {
+        "resource": {
+            "id": i,
+            "name": name,
+            "type": "dataset",
+            "description": extra.get("description", ""),
+            "updatedAt": updated,
+            "columns_name": extra.get("columns", []),
+            "columns_field_name": [],
+            "provenance": "official",
+        },
+        "classification": {
+            "categories": extra.get("categories", []),
+            "tags": extra.get("tags", []),
+        },
+    }
+
+
+CATALOG = [
+    asset(
+        "aaaa-0001",
+        "Crimes 2024",
+        description="Reported incidents of crime",
+        tags=["Police"],
+        categories=["Public Safety"],
+        columns=["Primary Type", "Arrest"],
+    ),
+    asset(
+        "bbbb-0002",
+        "Building Permits",
+        description="Permits issued",
+        tags=["housing"],
+        categories=["Buildings"],
+    ),
+    asset("cccc-0003", "Budget", description="City budget", tags=["finance"]),
+]
+
+
+@pytest.fixture
+def index(tmp_path) -> CatalogIndex:
+    return CatalogIndex(tmp_path / "catalog.sqlite")
+
+
+def serve(mocked: responses.RequestsMock, domain: str, assets: list[dict]):
+    def callback(request):
+        offset = int(request.params["offset"])
+        limit = int(request.params["limit"])
+        results = assets[offset : offset + limit]
+
+        return (200, {}, json.dumps({"resultSetSize": len(assets), "results": results}))
+
+    mocked.add_callback(
+        responses.GET, f"https://{domain}{CATALOG_PATH}", callback=callback
+    )
+
+
+def ids(records: list[dict]) -> list[str]:
+    return [r["resource"]["id"] for r in records]
+
+
+def test_search_answers_discover_filters_locally(
+    socrata_default_client: Socrata,
+    index: CatalogIndex,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    serve(mocked, domain, CATALOG)
+
+    result = index.refresh(socrata_default_client, filters={"limit": 2})
+
+    assert result.added == 3
+    assert index.count(domain) == 3
+
+    assert ids(index.search({"q": "crime"})) == ["aaaa-0001"]
+    assert ids(index.search({"q": "arrest"})) == ["aaaa-0001"]
+    assert ids(index.search({"q": "Permits: issued"})) == ["bbbb-0002"]
+    assert ids(index.search({"tags": ["police"]})) == ["aaaa-0001"]
+    assert ids(index.search({"categories": ["buildings"]})) == ["bbbb-0002"]
+    assert ids(index.search({"names": ["budget"]})) == ["cccc-0003"]
+    assert ids(index.search({"ids": ["aaaa-0001", "cccc-0003"]})) == [
+        "cccc-0003",
+        "aaaa-0001",
+    ]
+    assert ids(index.search(domain="other.example.org")) == []
+    assert ids(index.search({"limit": 2, "offset": 1})) == ["bbbb-0002", "aaaa-0001"]
+
+
+def test_refresh_rewrites_changed_and_removes_unlisted(
+    socrata_default_client: Socrata,
+    index: CatalogIndex,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    serve(mocked, domain, CATALOG)
+
+    index.refresh(socrata_default_client)
+
+    mocked.reset()
+
+    changed = asset("aaaa-0001", "Crimes 2024 - Updated", updated="2024-02-01")
+
+    serve(mocked, domain, [changed, CATALOG[1]])
+
+    result = index.refresh(socrata_default_client)
+
+    assert (result.added, result.updated, result.unchanged, result.removed) == (
+        0,
+        1,
+        1,
+        1,
+    )
+    assert ids(index.search({"q": "updated"})) == ["aaaa-0001"]
+    assert ids(index.search({"q": "budget"})) == []
+
+
+def test_refresh_only_removes_within_the_listed_scope(
+    socrata_default_client: Socrata,
+    index: CatalogIndex,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    community = asset("dddd-0004", "Neighbourhood survey")
+    community["resource"]["provenance"] = "community"
+
+    serve(mocked, domain, [community])
+
+    index.refresh(socrata_default_client, filters={"provenance": "community"})
+
+    mocked.reset()
+
+    serve(mocked, domain, CATALOG)
+
+    # Official-only listings leave community assets alone
+
+    assert index.refresh(socrata_default_client).removed == 0
+    assert index.count(domain) == 4
+
+    mocked.reset()
+
+    serve(mocked, domain, CATALOG[:1])
+
+    assert (
+        index.refresh(socrata_default_client, filters={"domains": [domain]}).removed
+        == 0
+    )
+
+    pending = {"approval_status": "pending"}
+
+    assert index.refresh(socrata_default_client, filters=pending).removed == 0
+    assert index.count(domain) == 4
+
+    assert index.refresh(socrata_default_client).removed == 2
+    assert index.count(domain) == 2
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+import responses
+
+from dotgov.checkpoint import CheckpointStore
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+@pytest.fixture
+def store(tmp_path) -> CheckpointStore:
+    return CheckpointStore(tmp_path / "checkpoints.sqlite")
+
+
+def test_key_ignores_dict_order():
+    a = CheckpointStore.key("x.org", RID, {"filters": {"a": 1, "b": 2}})
+    b = CheckpointStore.key("x.org", RID, {"filters": {"b": 2, "a": 1}})
+
+    assert a == b
+    assert a != CheckpointStore.key("x.org", RID, {"filters": {"a": 2}})
+
+
+def test_query_resource_resumes_from_last_delivered_offset(
+    socrata_default_client: Socrata,
+    store: CheckpointStore,
+    mocked: responses.RequestsMock,
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+    rows = [{"i": i} for i in range(5)]
+    failing = {"4": True}
+
+    def callback(request):
+        offset = request.params["$offset"]
+
+        if failing.get(offset):
+            return (500, {}, "")
+
+        start = int(offset)
+
+        return (200, {}, json.dumps(rows[start : start + 2]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    filters = {"limit": 2, "order": ":id"}
+
+    first = list(
+        socrata_default_client.query_resource(RID, filters=filters, checkpoint=store)
+    )
+
+    assert [r["i"] for r in first] == [0, 1, 2, 3]
+    (pending,) = store.pending()
+    assert pending.position == {"offset": 4}
+    assert pending.rows == 4
+
+    failing.clear()
+    mocked.calls.reset()
+
+    second = list(
+        socrata_default_client.query_resource(RID, filters=filters, checkpoint=store)
+    )
+
+    assert [r["i"] for r in second] == [4]
+    assert mocked.calls[0].request.params["$offset"] == "4"
+    assert store.pending() == []
+
+
+def test_query_resource_keyset_checkpoint_saves_last_key(
+    socrata_default_client: Socrata,
+    store: CheckpointStore,
+    mocked: responses.RequestsMock,
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+    data = [{":id": f"row-{i}"} for i in range(4)]
+
+    def callback(request):
+        where = request.params.get("$where", "")
+        last = where.split("> ")[-1].strip("'") if where else None
+        page = [r for r in data if last is None or r[":id"] > last][:2]
+
+        return (200, {}, json.dumps(page))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    pulled = socrata_default_client.query_resource(
+        RID, filters={"limit": 2}, keyset=":id", checkpoint=store
+    )
+
+    got = [next(pulled), next(pulled), next(pulled)]
+    pulled.close()
+
+    assert got[-1][":id"] == "row-2"
+
+    (pending,) = store.pending()
+    assert pending.position == {"seek": "row-1"}
+
+    rest = list(
+        socrata_default_client.query_resource(
+            RID, filters={"limit": 2}, keyset=":id", checkpoint=store
+        )
+    )
+
+    assert [r[":id"] for r in rest] == ["row-2", "row-3"]
+
+
+def test_checkpoint_follows_pages_capped_below_limit(
+    socrata_default_client: Socrata,
+    store: CheckpointStore,
+    mocked: responses.RequestsMock,
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+
+    def callback(request):
+        start = int(request.params["$offset"])
+
+        if start == 2:
+            return (500, {}, "")
+
+        # The portal returns at most 2 rows whatever the limit
+        return (200, {}, json.dumps([{"i": i} for i in range(start, start + 2)]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    filters = {"limit": 4, "order": ":id"}
+
+    list(socrata_default_client.query_resource(RID, filters=filters, checkpoint=store))
+
+    (pending,) = store.pending()
+    assert pending.position == {"offset": 2}
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+import responses
+
+from dotgov.decode import decode_number, decode_point, record_decoder
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+COLUMNS = [
+    {"fieldName": "n", "dataTypeName": "number"},
+    {"fieldName": "x", "dataTypeName": "double"},
+    {"fieldName": "ok", "dataTypeName": "checkbox"},
+    {"fieldName": "at", "dataTypeName": "calendar_date"},
+    {"fieldName": "fixed", "dataTypeName": "date"},
+    {"fieldName": "loc", "dataTypeName": "point"},
+    {"fieldName": "name", "dataTypeName": "text"},
+]
+
+
+def test_record_decoder_types_fields_from_columns():
+    decode = record_decoder(COLUMNS)
+
+    record = decode(
+        {
+            "n": "3",
+            "x": "1.5",
+            "ok": "true",
+            "at": "2024-01-02T03:04:05.000",
+            "fixed": "2024-01-02T03:04:05.000Z",
+            "loc": {"type": "Point", "coordinates": [-74.1, 4.6]},
+            "name": "7",
+            "alias": "8",
+        }
+    )
+
+    assert record == {
+        "n": 3,
+        "x": 1.5,
+        "ok": True,
+        "at": datetime(2024, 1, 2, 3, 4, 5),
+        "fixed": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "loc": (-74.1, 4.6),
+        "name": "7",
+        "alias": "8",
+    }
+
+
+def test_decoders_handle_variants():
+    assert decode_number("2.50") == 2.5
+    assert decode_number("1e3") == 1000.0
+    assert decode_point("POINT (-74.1 4.6)") == (-74.1, 4.6)
+
+    with pytest.raises(ValueError):
+        decode_point("nowhere")
+
+
+def test_query_resource_typed_fetches_columns_once(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    base = f"https://{socrata_default_client.domain}"
+
+    views = mocked.add(
+        responses.GET, f"{base}/api/views/{RID}.json", json={"columns": COLUMNS}
+    )
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        rows = [{"n": str(offset), "ok": "false"}] if offset < 2 else []
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, f"{base}/resource/{RID}.json", callback=callback)
+
+    rows = list(
+        socrata_default_client.query_resource(RID, filters={"limit": 1}, typed=True)
+    )
+
+    assert rows == [{"n": 0, "ok": False}, {"n": 1, "ok": False}]
+    assert views.call_count == 1
@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+import responses
+
+from dotgov.federated import federated_discover
+
+
+pytestmark = pytest.mark.unit
+
+
+CATALOG_PATH = "/api/catalog/v1"
+
+
+def add_catalog(mocked: responses.RequestsMock, domain: str, n: int, delay=0.0):
+    """Serve n datasets of a domain, one per page"""
+
+    def callback(request):
+        time.sleep(delay)
+
+        offset = int(request.params["offset"])
+        results = [{"resource": {"id": f"{domain}-{offset}"}}] if offset < n else []
+
+        return (200, {}, json.dumps({"resultSetSize": n, "results": results}))
+
+    mocked.add_callback(
+        responses.GET, f"https://{domain}{CATALOG_PATH}", callback=callback
+    )
+
+
+def test_merges_domains_and_tags_datasets(mocked: responses.RequestsMock):
+    add_catalog(mocked, "a.example.org", 3)
+    add_catalog(mocked, "b.example.org", 2)
+
+    rows = list(
+        federated_discover(["a.example.org", "b.example.org"], filters={"limit": 1})
+    )
+
+    by_domain = {}
+
+    for domain, dataset in rows:
+        by_domain.setdefault(domain, []).append(dataset["resource"]["id"])
+
+    assert by_domain == {
+        "a.example.org": ["a.example.org-0", "a.example.org-1", "a.example.org-2"],
+        "b.example.org": ["b.example.org-0", "b.example.org-1"],
+    }
+
+
+def test_slow_domain_does_not_block_others(mocked: responses.RequestsMock):
+    add_catalog(mocked, "slow.example.org", 1, delay=0.5)
+    add_catalog(mocked, "fast.example.org", 3)
+
+    rows = list(
+        federated_discover(
+            ["slow.example.org", "fast.example.org"], filters={"limit": 1}, workers=2
+        )
+    )
+
+    domains = [domain for domain, _ in rows]
+
+    assert domains == ["fast.example.org"] * 3 + ["slow.example.org"]
+
+
+def test_failing_domain_is_dropped(mocked: responses.RequestsMock):
+    add_catalog(mocked, "a.example.org", 2)
+    mocked.add(responses.GET, f"https://down.example.org{CATALOG_PATH}", status=500)
+
+    rows = list(
+        federated_discover(
+            ["down.example.org", "a.example.org"], filters={"limit": 1}, workers=1
+        )
+    )
+
+    assert [domain for domain, _ in rows] == ["a.example.org"] * 2
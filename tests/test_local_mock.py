@@ -0,0 +1,135 @@
+import pytest
+import requests
+
+from dotgov.local import parse_query, payload_query
+from dotgov.socrata import Socrata, create_where_clause
+from dotgov.sync import SyncStore
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+RECORDS = [
+    {":id": "r1", "city": "Bogota", "kind": "park", "area": "12.5", "at": "2024-01-05T00:00:00.000"},
+    {":id": "r2", "city": "Cali", "kind": "park", "area": "3", "at": "2024-02-01T00:00:00.000"},
+    {":id": "r3", "city": "Bogota", "kind": "plaza", "area": "40", "at": "2024-02-11T00:00:00.000"},
+    {":id": "r4", "city": "Medellin", "kind": "park", "at": "2023-12-30T00:00:00.000"},
+    {":id": "r5", "city": "Cali", "kind": "street", "area": "7"},
+]  # fmt: skip
+
+
+@pytest.fixture
+def store(tmp_path, domain: str):
+    store = SyncStore(tmp_path / "snapshot.sqlite")
+    store.upsert(domain, RID, RECORDS)
+
+    yield store
+
+    store.close()
+
+
+def test_where_forms_of_create_where_clause():
+    where = create_where_clause(area=("5", "50"), city="bog", kind=["park", "plaza"])
+
+    rows = parse_query(f"SELECT :id WHERE {where}").execute(RECORDS)
+
+    assert [r[":id"] for r in rows] == ["r1", "r3"]
+
+
+@pytest.mark.parametrize(
+    "where, ids",
+    [
+        ("area > 10", ["r1", "r3"]),
+        ("area < '8' AND kind != 'park'", ["r5"]),
+        ("area IS NULL OR at IS NULL", ["r4", "r5"]),
+        ("city NOT IN ('Cali', 'Bogota')", ["r4"]),
+        ("at NOT BETWEEN '2024-01-01' AND '2024-12-31'", ["r4"]),
+        ("city LIKE 'B_go%' AND NOT kind = 'plaza'", ["r1"]),
+        ("date_extract_m(at) = 2", ["r2", "r3"]),
+    ],
+)
+def test_where_predicates(where: str, ids: list[str]):
+    rows = parse_query(f"SELECT :id WHERE {where} ORDER BY :id").execute(RECORDS)
+
+    assert [r[":id"] for r in rows] == ids
+
+
+def test_group_having_order_and_paging():
+    query = parse_query(
+        "SELECT city, count(*) AS n, sum(area), max(at) AS latest "
+        "GROUP BY city HAVING n > 1 ORDER BY n DESC, city LIMIT 5 OFFSET 1"
+    )
+
+    assert query.execute(RECORDS) == [
+        {
+            "city": "Cali",
+            "n": "2",
+            "sum_area": "10",
+            "latest": "2024-02-01T00:00:00.000",
+        }
+    ]
+
+
+def test_order_sorts_numbers_numerically_and_nulls_last():
+    rows = parse_query("SELECT :id, area ORDER BY area").execute(RECORDS)
+
+    assert [r[":id"] for r in rows] == ["r2", "r5", "r1", "r3", "r4"]
+
+    # Star leaves system fields out
+    assert ":id" not in parse_query("SELECT *").execute(RECORDS)[0]
+
+
+def test_parse_errors_are_value_errors():
+    with pytest.raises(ValueError):
+        parse_query("SELECT city WHERE city = ")
+
+    with pytest.raises(ValueError):
+        parse_query("SELECT city WHERE count(*) > 1")
+
+    with pytest.raises(ValueError):
+        parse_query("SELECT nope(city)")
+
+
+@pytest.mark.parametrize("version", [2.1, 3.0])
+def test_payloads_of_both_versions(version: float):
+    socrata = Socrata("example.org", version=version)
+
+    filters = {"where": "kind = 'park'", "order": ":id", "limit": 2}
+
+    if version > 2.1:
+        filters["page"] = 2
+    else:
+        filters["offset"] = 2
+
+    payload = socrata.format_payload(filters)
+
+    assert payload_query(payload).execute(RECORDS) == [
+        {"city": "Medellin", "kind": "park", "at": "2023-12-30T00:00:00.000"}
+    ]
+
+
+@pytest.mark.parametrize("version", [2.1, 3.0])
+def test_query_resource_against_snapshot(domain: str, store: SyncStore, version):
+    with Socrata(domain, version=version, snapshot=store) as socrata:
+        rows = list(
+            socrata.query_resource(
+                RID, filters={"where": "kind = 'park'", "order": ":id", "limit": 2}
+            )
+        )
+
+        assert [r["city"] for r in rows] == ["Bogota", "Cali", "Medellin"]
+        assert socrata.count_resource(RID, filters={"where": "area > 5"}) == 3
+
+        keyset = list(socrata.query_resource(RID, filters={"limit": 2}, keyset=":id"))
+
+        assert [r[":id"] for r in keyset] == ["r1", "r2", "r3", "r4", "r5"]
+
+
+def test_snapshot_answers_unknown_queries_with_errors(domain: str, store: SyncStore):
+    with Socrata(domain, snapshot=store) as socrata:
+        assert list(socrata.query_resource(RID, filters={"where": "city ="})) == []
+
+        with pytest.raises(requests.HTTPError, match="404"):
+            socrata.fetch_columns(RID)
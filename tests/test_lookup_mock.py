@@ -0,0 +1,116 @@
+import json
+import re
+
+import pytest
+import responses
+
+from dotgov import lookup
+from dotgov.lookup import lookup_resource
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+def serve_keys(mocked: responses.RequestsMock, url: str, method: str):
+    """Serve two identical records per key in the IN list"""
+
+    def callback(request):
+        if method == responses.GET:
+            where = request.params["$where"]
+            first = request.params["$offset"] == "0"
+        else:
+            body = json.loads(request.body)
+            where = body["query"]
+            first = body["page"]["pageNumber"] == 1
+
+        keys = re.findall(r"'([^']*)'", where.split(" in (")[-1])
+
+        rows = [{"k": k, "v": "10"} for k in keys for _ in range(2)]
+
+        return (200, {}, json.dumps(rows if first else []))
+
+    mocked.add_callback(method, url, callback=callback)
+
+
+def test_lookup_v21_chunks_within_url_limit(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock, monkeypatch
+):
+    monkeypatch.setattr(lookup, "MAX_URL_LENGTH", 400)
+
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+    serve_keys(mocked, url, responses.GET)
+
+    keys = [f"key-{i:04d}" for i in range(60)]
+
+    rows = list(
+        lookup_resource(
+            socrata_default_client,
+            RID,
+            "k",
+            keys + keys[:10],
+            filters={"where": "active = true"},
+            workers=3,
+        )
+    )
+
+    # Chunk order is kept, duplicate keys queried once, identical rows kept
+    assert rows[0]["k"] == "key-0000"
+    assert sorted(r["k"] for r in rows) == sorted(keys * 2)
+
+    chunk_calls = [c for c in mocked.calls if c.request.params["$offset"] == "0"]
+
+    assert len(chunk_calls) > 1
+    assert all(len(c.request.url) <= 400 for c in chunk_calls)
+    assert all(
+        c.request.params["$where"].startswith("(active = true) AND k in (")
+        for c in chunk_calls
+    )
+
+
+def test_lookup_v30_posts_larger_chunks(
+    socrata_v3_client: Socrata, mocked: responses.RequestsMock, monkeypatch
+):
+    monkeypatch.setattr(lookup, "MAX_URL_LENGTH", 400)
+
+    url = f"https://{socrata_v3_client.domain}/api/v3/views/{RID}/query.json"
+    serve_keys(mocked, url, responses.POST)
+
+    keys = [f"key-{i:04d}" for i in range(60)]
+
+    rows = list(lookup_resource(socrata_v3_client, RID, "k", keys, max_keys=25))
+
+    assert sorted(r["k"] for r in rows) == sorted(keys * 2)
+
+    bodies = [json.loads(c.request.body) for c in mocked.calls]
+    firsts = [b for b in bodies if b["page"]["pageNumber"] == 1]
+
+    assert len(firsts) == 3
+
+
+def test_chunk_keys_rejects_oversized_key(socrata_default_client: Socrata):
+    filters = socrata_default_client.validate_payload()
+
+    with pytest.raises(ValueError):
+        list(
+            lookup.chunk_keys(socrata_default_client, RID, "k", ["x" * 10_000], filters)
+        )
+
+
+def test_lookup_queries_keys_of_the_same_value_once(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+    mocked.add(responses.GET, url, json=[])
+
+    keys = [1, "1", 2, True, "true", "O'Hare", "O'Hare"]
+
+    list(lookup_resource(socrata_default_client, RID, "k", keys))
+
+    where = mocked.calls[0].request.params["$where"]
+
+    # 1 and '1' match the same rows, true and 1 do not
+    assert where == "k in (1, 2, true, 'O''Hare')"
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+import requests
+import responses
+
+from dotgov.metrics import PrometheusCollector, RequestMetric
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+def test_query_resource_records_each_page(domain: str, mocked: responses.RequestsMock):
+    def callback(request):
+        offset = int(request.params["$offset"])
+        rows = [{"n": str(offset)}, {"n": str(offset + 1)}] if offset < 4 else []
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(
+        responses.GET, f"https://{domain}/resource/{RID}.json", callback=callback
+    )
+
+    metrics = []
+
+    with Socrata(domain=domain, metrics=metrics.append) as socrata:
+        rows = list(socrata.query_resource(RID, filters={"limit": 2}))
+
+    assert len(rows) == 4
+    assert [m.rows for m in metrics] == [2, 2, 0]
+    assert all(m.domain == domain and m.dataset == RID for m in metrics)
+    assert all(m.status == 200 and m.method == "GET" for m in metrics)
+    assert all(m.bytes > 0 and m.decode_seconds is not None for m in metrics)
+
+
+def test_failures_and_streams_are_recorded(domain: str, mocked: responses.RequestsMock):
+    url = f"https://{domain}/resource/{RID}.json"
+
+    mocked.add(responses.GET, url, json=[{"n": "1"}, {"n": "2"}])
+    mocked.add(responses.GET, url, status=404)
+    mocked.add(responses.GET, url, body=requests.ConnectionError("refused"))
+
+    metrics = []
+
+    with Socrata(domain=domain, metrics=metrics.append) as socrata:
+        assert len(list(socrata.stream_page(url, {}))) == 2
+
+        with pytest.raises(requests.HTTPError):
+            socrata.fetch_page(url, {})
+
+        with pytest.raises(requests.ConnectionError):
+            socrata.fetch_page(url, {})
+
+    streamed, missing, refused = metrics
+
+    assert (streamed.rows, streamed.decode_seconds) == (2, None)
+    assert streamed.bytes == len(json.dumps([{"n": "1"}, {"n": "2"}]))
+    assert (missing.status, missing.rows) == (404, None)
+    assert (refused.status, refused.dataset) == (None, RID)
+
+
+def test_discover_is_labeled_catalog(domain: str, mocked: responses.RequestsMock):
+    mocked.add(
+        responses.GET,
+        f"https://{domain}/api/catalog/v1",
+        json={"resultSetSize": 1, "results": [{"resource": {"id": RID}}]},
+    )
+
+    collector = PrometheusCollector()
+
+    with Socrata(domain=domain, metrics=collector) as socrata:
+        assert len(list(socrata.discover())) == 1
+
+    text = collector.render()
+
+    # The second request finds the result set exhausted
+    assert (
+        f'dotgov_requests_total{{domain="{domain}",dataset="catalog",status="200"}} 2'
+        in text
+    )
+    assert f'dotgov_rows_total{{domain="{domain}",dataset="catalog"}} 2' in text
+
+
+def test_prometheus_collector_renders_histograms():
+    collector = PrometheusCollector()
+
+    for seconds, rows in [(0.2, 1000), (3.0, 50), (0.2, 1000)]:
+        collector(
+            RequestMetric(
+                domain="x.example.org",
+                dataset='we"ird',
+                method="GET",
+                status=200,
+                seconds=seconds,
+                decode_seconds=0.01,
+                bytes=100,
+                rows=rows,
+                retries=1,
+            )
+        )
+
+    lines = collector.render().splitlines()
+
+    labels = 'domain="x.example.org",dataset="we\\"ird"'
+
+    assert "# TYPE dotgov_request_seconds histogram" in lines
+    assert f'dotgov_request_seconds_bucket{{{labels},le="0.25"}} 2' in lines
+    assert f'dotgov_request_seconds_bucket{{{labels},le="2.5"}} 2' in lines
+    assert f'dotgov_request_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"dotgov_request_seconds_count{{{labels}}} 3" in lines
+    assert f'dotgov_page_rows_bucket{{{labels},le="100"}} 1' in lines
+    assert f"dotgov_response_bytes_total{{{labels}}} 300" in lines
+    assert f"dotgov_retries_total{{{labels}}} 3" in lines
+
+
+def test_failing_hook_does_not_break_requests(
+    domain: str, mocked: responses.RequestsMock
+):
+    url = f"https://{domain}/resource/{RID}.json"
+
+    mocked.add(responses.GET, url, json=[{"n": "1"}])
+
+    def hook(metric):
+        raise RuntimeError("collector down")
+
+    with Socrata(domain=domain, metrics=hook) as socrata:
+        assert socrata.fetch_page(url, {}) == [{"n": "1"}]
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+
+pa = pytest.importorskip("pyarrow")
+
+import pyarrow.dataset as ds  # noqa: E402
+
+from dotgov.parquet import ParquetSink  # noqa: E402
+
+
+pytestmark = pytest.mark.unit
+
+
+SCHEMA = pa.schema([("fecha", pa.string()), ("valor", pa.float64())])
+
+
+def records(n: int):
+    for i in range(n):
+        yield {"fecha": f"{2020 + i % 3}-01-01T00:00:00.000", "valor": str(i)}
+
+
+def test_sink_writes_row_groups_and_manifest(tmp_path):
+    with ParquetSink(tmp_path, schema=SCHEMA, row_group_size=4) as sink:
+        sink.write(records(10))
+
+    manifest = json.loads((tmp_path / "_manifest.json").read_text())
+
+    assert manifest["rows"] == 10
+    assert [f["path"] for f in manifest["files"]] == ["part-00000.parquet"]
+
+    table = ds.dataset(tmp_path / "part-00000.parquet").to_table()
+
+    assert table.num_rows == 10
+    assert table.schema == SCHEMA
+    assert not list(tmp_path.glob(".staging-*"))
+
+
+def test_sink_partitions_hive_style_and_rotates_files(tmp_path):
+    sink = ParquetSink(
+        tmp_path,
+        schema=SCHEMA,
+        partition_by="year",
+        partition=lambda r: r["fecha"][:4],
+        row_group_size=2,
+        max_rows_per_file=2,
+    )
+
+    sink.write(records(9))
+
+    assert not (tmp_path / "_manifest.json").exists()
+
+    manifest = sink.finalize()
+
+    paths = sorted(f["path"] for f in manifest["files"])
+
+    assert "year=2020/part-00000.parquet" in paths
+    assert "year=2020/part-00001.parquet" in paths
+    assert sum(f["rows"] for f in manifest["files"]) == 9
+
+    dataset = ds.dataset(tmp_path, format="parquet", partitioning="hive")
+    table = dataset.to_table(filter=ds.field("year") == 2021)
+
+    assert table.num_rows == 3
+
+
+def test_sink_abort_leaves_no_files(tmp_path):
+    with pytest.raises(RuntimeError):
+        with ParquetSink(tmp_path, schema=SCHEMA, row_group_size=2) as sink:
+            sink.write(records(5))
+
+            raise RuntimeError("interrupted")
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_inferred_schema_widens_with_fields_missing_from_first_rows(tmp_path):
+    rows = [{"a": "1"}, {"a": "2"}, {"a": "3", "b": "x"}, {"b": "y"}]
+
+    with ParquetSink(tmp_path, row_group_size=2) as sink:
+        sink.write(rows)
+
+    manifest = json.loads((tmp_path / "_manifest.json").read_text())
+
+    assert [f["path"] for f in manifest["files"]] == [
+        "part-00000.parquet",
+        "part-00001.parquet",
+    ]
+    assert "b: string" in manifest["schema"]
+
+    schema = pa.schema([("a", pa.string()), ("b", pa.string())])
+    table = ds.dataset(tmp_path, format="parquet", schema=schema).to_table()
+
+    assert sorted(table.to_pylist(), key=str) == sorted(
+        [
+            {"a": "1", "b": None},
+            {"a": "2", "b": None},
+            {"a": "3", "b": "x"},
+            {"a": None, "b": "y"},
+        ],
+        key=str,
+    )
+
+
+def test_partition_values_are_escaped(tmp_path):
+    out = tmp_path / "out"
+
+    values = ["../../escape", "a/b", "..", "50%"]
+
+    with ParquetSink(
+        out, schema=SCHEMA, partition_by="y", partition=lambda r: r["k"]
+    ) as sink:
+        sink.write({"k": v, "fecha": "2024", "valor": "1"} for v in values)
+
+    assert sorted(p.name for p in out.iterdir() if p.is_dir()) == [
+        "y=%2E%2E",
+        "y=..%2F..%2Fescape",
+        "y=50%25",
+        "y=a%2Fb",
+    ]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out"]
+
+    dataset = ds.dataset(out, format="parquet", partitioning="hive")
+
+    assert sorted(dataset.to_table().column("y").to_pylist()) == sorted(values)
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import pytest
+
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps([{"n": "1"}]).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+    """Local server counting the connections it accepts"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+
+        self.connections = 0
+
+    def get_request(self):
+        self.connections += 1
+
+        return super().get_request()
+
+
+def accepted(server: CountingServer, expected: int, timeout: float = 2.0):
+    """Connections the server accepted, waiting for it to catch up"""
+    deadline = time.monotonic() + timeout
+
+    while server.connections < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return server.connections
+
+
+class LocalSocrata(Socrata):
+    PREFIX = "http://"
+
+
+@pytest.fixture
+def server():
+    server = CountingServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_shared_client_reuses_prewarmed_connections(server: CountingServer):
+    host, port = server.server_address
+
+    socrata = LocalSocrata(domain=f"{host}:{port}", pool_size=4, pool_block=True)
+
+    assert socrata.prewarm() == 4
+
+    # Requests are answered, whatever the status, on 4 distinct connections
+
+    assert accepted(server, 4) == 4
+
+    uri = socrata.format_uri(socrata.format_endpoint(RID))
+
+    def fetch(_):
+        return socrata.fetch_page(uri, {"$limit": 1})
+
+    # Twelve threads share the client, and never more than 4 connections
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        pages = list(executor.map(fetch, range(48)))
+
+    socrata.close()
+
+    assert pages == [[{"n": "1"}]] * 48
+    assert server.connections == 4
+
+
+def test_open_is_idempotent_across_threads():
+    socrata = Socrata(domain="example.org", pool_size=32)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: socrata.open(), range(8)))
+
+    session = socrata.session
+    adapter = session.get_adapter("https://example.org")
+
+    assert adapter._pool_maxsize == 32
+
+    socrata.open()
+
+    assert socrata.session is session
+
+    socrata.close()
@@ -0,0 +1,128 @@
+import json
+from datetime import date, datetime
+
+import pytest
+import responses
+from pydantic import ValidationError
+
+from dotgov.prepared import PreparedQuery, soql_literal
+from dotgov.socrata import Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+def test_soql_literal_escapes_values():
+    assert soql_literal("O'Hare") == "'O''Hare'"
+    assert soql_literal(3) == "3"
+    assert soql_literal(2.5) == "2.5"
+    assert soql_literal(True) == "true"
+    assert soql_literal(None) == "null"
+    assert soql_literal(date(2024, 1, 2)) == "'2024-01-02T00:00:00.000'"
+    assert soql_literal(datetime(2024, 1, 2, 3, 4, 5)) == "'2024-01-02T03:04:05.000'"
+    assert soql_literal(["a", 1]) == "('a', 1)"
+
+    with pytest.raises(ValueError):
+        soql_literal(float("nan"))
+
+    with pytest.raises(ValueError):
+        soql_literal([])
+
+
+def test_bind_substitutes_v21_params(domain: str):
+    s = Socrata(domain=domain)
+
+    query = s.prepare(
+        RID,
+        {"where": "ward = {ward} AND name like {{x}}", "order": ":id", "limit": 10},
+    )
+
+    assert query.parameters == {"ward"}
+
+    payload = query.bind(ward="1' OR '1'='1")
+
+    assert payload["$where"] == "ward = '1'' OR ''1''=''1' AND name like {x}"
+    assert payload["$order"] == ":id"
+    assert payload["$limit"] == 10
+
+
+def test_bind_substitutes_v30_query(domain: str):
+    s = Socrata(domain=domain, version=3.0)
+
+    query = s.prepare(RID, {"select": "a", "where": "b in {values}"})
+
+    payload = query.bind({"values": [1, 2]})
+
+    assert payload["query"] == "SELECT a  WHERE b in (1, 2)  ORDER BY :id"
+    assert payload["page"] == {"pageNumber": 1, "pageSize": 1000}
+
+
+def test_prepare_raises_on_invalid_filters_and_bindings(domain: str):
+    s = Socrata(domain=domain)
+
+    with pytest.raises(ValidationError):
+        PreparedQuery(s, RID, {"page": 2})
+
+    query = s.prepare(RID, {"where": "a = {a}"})
+
+    assert query.bind(a=1)["$order"] == ":id"
+    assert (
+        "$order" not in s.prepare(RID, {"select": "a, count(*)", "group": "a"}).bind()
+    )
+
+    with pytest.raises(ValueError):
+        query.bind()
+
+    with pytest.raises(ValueError):
+        query.bind(a=1, b=2)
+
+    with pytest.raises(ValueError):
+        s.prepare(RID, {"where": "a = {a!r}"})
+
+
+def test_execute_many_shares_session_and_keeps_order(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+
+    def callback(request):
+        ward = request.params["$where"].split("= ")[-1].strip("'")
+        offset = int(request.params["$offset"])
+
+        rows = [{"ward": ward, "i": i} for i in range(offset, min(offset + 2, 3))]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    query = socrata_default_client.prepare(RID, {"where": "ward = {w}", "limit": 2})
+
+    results = list(query.execute_many([{"w": "a"}, {"w": "b"}], workers=2))
+
+    assert [[r["ward"] for r in rows] for rows in results] == [["a"] * 3, ["b"] * 3]
+
+    # An empty page ends each execution
+    assert len(mocked.calls) == 6
+
+
+def test_execute_reads_pages_capped_below_limit(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    url = f"https://{socrata_default_client.domain}/resource/{RID}.json"
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+
+        # The portal returns at most 2 rows whatever the limit
+        rows = [{"i": i} for i in range(offset, min(offset + 2, 5))]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    query = socrata_default_client.prepare(RID, {"where": "ward = {w}", "limit": 4})
+
+    assert [r["i"] for r in query.execute({"w": "a"})] == [0, 1, 2, 3, 4]
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import time
+from email.utils import formatdate
+
+import pytest
+import responses
+
+from dotgov.ratelimit import RateLimitedAdapter, RateLimiter, fcntl, retry_after
+from dotgov.socrata import AsyncSocrata, Socrata
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+def test_bucket_allows_burst_then_spaces_requests():
+    limiter = RateLimiter(rate=10, burst=2)
+
+    waits = [limiter.reserve() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1, abs=0.02)
+    assert waits[3] == pytest.approx(0.2, abs=0.02)
+    assert limiter.stats()["requests"] == 4
+
+
+def test_defer_holds_requests_and_drains_bucket():
+    limiter = RateLimiter(rate=100, burst=10)
+
+    limiter.defer(2)
+
+    assert limiter.wait == pytest.approx(2, abs=0.05)
+    assert limiter.reserve() == pytest.approx(2, abs=0.05)
+    assert limiter.throttled == 1
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after("3") == 3.0
+    assert retry_after(None) is None
+    assert retry_after("soon") is None
+
+    later = retry_after(formatdate(time.time() + 30, usegmt=True))
+
+    assert 25 < later <= 30
+
+
+def test_shared_limiters_are_keyed_by_domain_and_token():
+    a = RateLimiter.shared("x.example.org", "token-a")
+
+    assert RateLimiter.shared("x.example.org", "token-a") is a
+    assert RateLimiter.shared("x.example.org", "token-b") is not a
+    assert Socrata("x.example.org", app_token="token-a", limiter=True).limiter is a
+
+
+@pytest.mark.skipif(fcntl is None, reason="File locks are POSIX only.")
+def test_lock_file_shares_bucket_across_limiters(tmp_path):
+    path = tmp_path / "bucket.lock"
+
+    a = RateLimiter(rate=1, burst=1, lock_path=path)
+    b = RateLimiter(rate=1, burst=1, lock_path=path)
+
+    assert a.reserve() == 0.0
+    assert b.reserve() == pytest.approx(1, abs=0.05)
+
+
+def test_throttled_requests_are_retried_after_retry_after(
+    domain: str, mocked: responses.RequestsMock
+):
+    url = f"https://{domain}/resource/{RID}.json"
+    calls = []
+
+    def callback(request):
+        calls.append(request.params["$offset"])
+
+        if len(calls) == 1:
+            return (429, {"Retry-After": "0"}, "")
+
+        rows = [{"i": 1}] if request.params["$offset"] == "0" else []
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    limiter = RateLimiter(rate=1000, burst=100)
+
+    with Socrata(domain=domain, limiter=limiter) as s:
+        assert isinstance(s.session.get_adapter(url), RateLimitedAdapter)
+
+        rows = list(s.query_resource(RID, filters={"limit": 1}))
+
+    assert rows == [{"i": 1}]
+    assert calls == ["0", "0", "1"]
+    assert limiter.throttled == 1
+    assert limiter.requests == 3
+
+
+def test_async_throttled_requests_are_retried(domain: str):
+    httpx = pytest.importorskip("httpx")
+
+    statuses = [429, 200, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+
+        offset = request.url.params["$offset"]
+        rows = [{"i": 1}] if offset == "0" else []
+
+        return httpx.Response(status, headers={"Retry-After": "0"}, json=rows)
+
+    async def run():
+        limiter = RateLimiter(rate=1000, burst=100)
+
+        s = AsyncSocrata(domain=domain, limiter=limiter)
+        s.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        async with s:
+            rows = [r async for r in s.query_resource(RID, filters={"limit": 1})]
+
+        return rows, limiter
+
+    rows, limiter = asyncio.run(run())
+
+    assert rows == [{"i": 1}]
+    assert limiter.throttled == 1
@@ -0,0 +1,140 @@
+import asyncio
+import json
+
+import pytest
+
+from dotgov.socrata import AsyncSocrata
+
+
+httpx = pytest.importorskip("httpx")
+
+pytestmark = pytest.mark.unit
+
+
+def mock_session(handler) -> "httpx.AsyncClient":
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def collect(agen) -> list:
+    return [item async for item in agen]
+
+
+## Sessions
+
+
+def test_async_context_manager_opens_and_closes(domain: str):
+    async def run():
+        s = AsyncSocrata(domain=domain, app_token="token-123")
+
+        assert s.session is None
+
+        async with s as client:
+            assert client.session is not None
+            assert client.session.headers.get("X-App-Token") == "token-123"
+
+        assert s.session is None
+
+    asyncio.run(run())
+
+
+## Datasets
+
+
+def test_async_discover_paginates_with_offset(domain: str):
+    seen = []
+
+    def handler(request: httpx.Request):
+        offset = int(request.url.params["offset"])
+        seen.append(offset)
+
+        results = [{"resource": {"id": "a"}}, {"resource": {"id": "b"}}]
+
+        return httpx.Response(
+            200,
+            json={"resultSetSize": 2, "results": results if offset == 0 else []},
+        )
+
+    async def run():
+        s = AsyncSocrata(domain=domain)
+        s.session = mock_session(handler)
+
+        async with s:
+            return await collect(s.discover(filters={"limit": 2}))
+
+    rows = asyncio.run(run())
+
+    assert [r["resource"]["id"] for r in rows] == ["a", "b"]
+    assert seen == [0, 2]
+
+
+## query_resource version-specific behavior
+
+
+def test_async_query_resource_v21_uses_get_and_offset(domain: str):
+    pages = {0: [{"i": 1}, {"i": 2}], 2: [{"i": 3}], 4: []}
+    methods = []
+
+    def handler(request: httpx.Request):
+        methods.append(request.method)
+
+        return httpx.Response(200, json=pages[int(request.url.params["$offset"])])
+
+    async def run():
+        s = AsyncSocrata(domain=domain)
+        s.session = mock_session(handler)
+
+        async with s:
+            return await collect(s.query_resource("abcd-1234", filters={"limit": 2}))
+
+    rows = asyncio.run(run())
+
+    assert [r["i"] for r in rows] == [1, 2, 3]
+    assert set(methods) == {"GET"}
+
+
+def test_async_query_resource_v30_uses_post_and_page_number(domain: str):
+    pages = {1: [{"i": 1}, {"i": 2}], 2: [{"i": 3}], 3: []}
+    bodies = []
+
+    def handler(request: httpx.Request):
+        body = json.loads(request.content)
+        bodies.append(body)
+
+        return httpx.Response(200, json=pages[body["page"]["pageNumber"]])
+
+    async def run():
+        s = AsyncSocrata(domain=domain, version=3.0)
+        s.session = mock_session(handler)
+
+        async with s:
+            return await collect(s.query_resource("abcd-1234", filters={"limit": 2}))
+
+    rows = asyncio.run(run())
+
+    assert [r["i"] for r in rows] == [1, 2, 3]
+    assert [b["page"]["pageNumber"] for b in bodies] == [1, 2, 3]
+    assert all(b["page"]["pageSize"] == 2 for b in bodies)
+
+
+def test_async_retries_on_server_errors(domain: str, monkeypatch):
+    statuses = iter([503, 200, 200])
+
+    def handler(request: httpx.Request):
+        status = next(statuses)
+        offset = int(request.url.params["$offset"])
+
+        return httpx.Response(status, json=[{"i": 1}] if offset == 0 else [])
+
+    async def no_sleep(_):
+        pass
+
+    monkeypatch.setattr(asyncio, "sleep", no_sleep)
+
+    async def run():
+        s = AsyncSocrata(domain=domain, retries=2)
+        s.session = mock_session(handler)
+
+        async with s:
+            return await collect(s.query_resource("abcd-1234", filters={"limit": 1}))
+
+    assert asyncio.run(run()) == [{"i": 1}]
@@ -1,8 +1,18 @@
+import json
+
 import pytest
 import responses
+from requests.exceptions import HTTPError
 from responses import matchers
 
-from dotgov.socrata import Socrata, DiscoverFilters, ApprovalStatus, Only, Provenance
+from dotgov.socrata import (
+    ApprovalStatus,
+    DiscoverFilters,
+    Only,
+    Provenance,
+    Socrata,
+    iter_json_array,
+)
 
 
 pytestmark = pytest.mark.unit
@@ -394,3 +404,391 @@ def test_instance_filters_serialization():
     assert params["approval_status"] == "rejected"
     assert params["only"] == "file"
     assert params["provenance"] == "official"
+
+
+## Parallel pagination
+
+
+def test_format_count_payload_keeps_where_and_drops_order(domain: str):
+    s = Socrata(domain=domain)
+
+    payload = s.format_count_payload({"where": "x > 1", "order": "a", "limit": 5})
+
+    assert payload["$select"] == "count(*) AS count"
+    assert payload["$where"] == "x > 1"
+    assert "$order" not in payload
+    assert payload["$offset"] == 0
+
+
+def test_plan_pages_v21_and_v30(domain: str):
+    v21 = Socrata(domain=domain)
+    v30 = Socrata(domain=domain, version=3.0)
+
+    pages = v21.plan_pages(v21.format_payload({"limit": 2}), 5)
+    assert [p["$offset"] for p in pages] == [0, 2, 4]
+
+    pages = v30.plan_pages(v30.format_payload({"limit": 2}), 5)
+    assert [p["page"]["pageNumber"] for p in pages] == [1, 2, 3]
+
+
+def test_query_resource_v21_parallel_yields_in_page_order(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+
+    def callback(request):
+        params = request.params
+
+        if params.get("$select") == "count(*) AS count":
+            return (200, {}, json.dumps([{"count": "5"}]))
+
+        offset = int(params["$offset"])
+        rows = [{"i": i} for i in range(offset, min(offset + 2, 5))]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(
+        socrata_default_client.query_resource(
+            rid, filters={"limit": 2, "order": ":id"}, workers=3
+        )
+    )
+
+    assert [r["i"] for r in rows] == [0, 1, 2, 3, 4]
+
+    offsets = sorted(
+        int(c.request.params["$offset"])
+        for c in mocked.calls
+        if "$select" not in c.request.params
+    )
+    assert offsets == [0, 2, 4, 6]
+
+
+def test_query_resource_v30_parallel_yields_in_page_order(
+    socrata_v3_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_v3_client.domain}/api/v3/views/{rid}/query.json"
+
+    def callback(request):
+        body = json.loads(request.body)
+
+        if body["query"].startswith("SELECT count(*)"):
+            return (200, {}, json.dumps([{"count": 3}]))
+
+        page = body["page"]["pageNumber"]
+        rows = [{"i": page}] if page <= 3 else []
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.POST, url, callback=callback)
+
+    rows = list(socrata_v3_client.query_resource(rid, filters={"limit": 1}, workers=2))
+
+    assert [r["i"] for r in rows] == [1, 2, 3]
+
+
+## Prefetch
+
+
+def test_query_resource_prefetch_keeps_order(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        rows = [{"i": i} for i in range(offset, min(offset + 2, 7))]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(
+        socrata_default_client.query_resource(rid, filters={"limit": 2}, prefetch=2)
+    )
+
+    assert [r["i"] for r in rows] == list(range(7))
+
+
+def test_query_resource_prefetch_raises_errors_after_earlier_pages(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+
+    def callback(request):
+        if int(request.params["$offset"]) > 0:
+            return (500, {}, "boom")
+
+        return (200, {}, json.dumps([{"i": 0}]))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    got = []
+
+    with pytest.raises(HTTPError):
+        for row in socrata_default_client.query_resource(
+            rid, filters={"limit": 1}, prefetch=3
+        ):
+            got.append(row)
+
+    assert got == [{"i": 0}]
+
+
+def test_discover_prefetch_yields_all_pages(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    def callback(request):
+        offset = int(request.params["offset"])
+        results = [{"resource": {"id": str(offset)}}] if offset < 3 else []
+
+        return (200, {}, json.dumps({"resultSetSize": 3, "results": results}))
+
+    mocked.add_callback(
+        responses.GET,
+        f"https://{socrata_default_client.domain}{CATALOG_PATH}",
+        callback=callback,
+    )
+
+    rows = list(socrata_default_client.discover(filters={"limit": 1}, prefetch=2))
+
+    assert [r["resource"]["id"] for r in rows] == ["0", "1", "2"]
+
+
+## Keyset pagination
+
+
+def test_format_keyset_payload_combines_where_and_escapes(domain: str):
+    s = Socrata(domain=domain)
+
+    payload = s.format_keyset_payload({"where": "x > 1"}, key=":id", last="row-'1")
+
+    assert payload["$where"] == "(x > 1) AND :id > 'row-''1'"
+    assert payload["$order"] == ":id"
+    assert payload["$select"] == "*, :id"
+    assert payload["$offset"] == 0
+
+
+def test_format_keyset_payload_v30_query(domain: str):
+    s = Socrata(domain=domain, version=3.0)
+
+    payload = s.format_keyset_payload({"select": "a"}, key="uid", last=7)
+
+    assert payload["query"] == "SELECT a, uid  WHERE uid > 7  ORDER BY uid"
+
+    payload = s.format_keyset_payload({"select": "a"}, key="uid", last=2.5)
+
+    assert "WHERE uid > 2.5 " in payload["query"]
+    assert payload["page"]["pageNumber"] == 1
+
+
+def test_query_resource_keyset_seeks_without_offset(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+    data = [{":id": f"row-{i}", "i": i} for i in range(5)]
+
+    def callback(request):
+        where = request.params.get("$where", "")
+        last = where.split("> ")[-1].strip("'") if where else None
+        rows = [r for r in data if last is None or r[":id"] > last][:2]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(
+        socrata_default_client.query_resource(rid, filters={"limit": 2}, keyset=":id")
+    )
+
+    assert [r["i"] for r in rows] == [0, 1, 2, 3, 4]
+    assert all(c.request.params["$offset"] == "0" for c in mocked.calls)
+    assert mocked.calls[1].request.params["$where"] == ":id > 'row-1'"
+
+
+## Streaming
+
+
+def test_iter_json_array_decodes_across_chunk_boundaries():
+    data = [{"i": i, "s": "ñ ] }"} for i in range(50)]
+    raw = json.dumps(data).encode("utf-8")
+
+    chunks = [raw[i : i + 7] for i in range(0, len(raw), 7)]
+
+    assert list(iter_json_array(chunks)) == data
+    assert list(iter_json_array([b" [ ] "])) == []
+
+
+def test_iter_json_array_rejects_non_arrays():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"error": true}']))
+
+
+def test_query_resource_stream_v21_pages_until_empty(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        rows = [{"i": i} for i in range(offset, min(offset + 2, 5))]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(
+        socrata_default_client.query_resource(rid, filters={"limit": 2}, stream=True)
+    )
+
+    assert [r["i"] for r in rows] == [0, 1, 2, 3, 4]
+    assert [c.request.params["$offset"] for c in mocked.calls] == ["0", "2", "4", "5"]
+
+
+def test_query_resource_v21_pages_capped_below_limit(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+
+        # The portal returns at most 2 rows whatever the limit
+        rows = [{"i": i} for i in range(offset, min(offset + 2, 5))]
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(socrata_default_client.query_resource(rid, filters={"limit": 4}))
+
+    assert [r["i"] for r in rows] == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_query_resource_logs_failures_whether_streamed_or_not(
+    domain: str, mocked: responses.RequestsMock, caplog, stream: bool
+):
+    rid = "abcd-1234"
+    url = f"https://{domain}/resource/{rid}.json"
+
+    mocked.add(responses.GET, url, status=500)
+
+    with Socrata(domain=domain, retries=0) as s:
+        assert list(s.query_resource(rid, stream=stream)) == []
+
+    assert "HTTP Error" in caplog.text
+
+    mocked.replace(responses.GET, url, body='[{"i": 1}, {"i": ')
+
+    with Socrata(domain=domain, retries=0) as s:
+        rows = list(s.query_resource(rid, stream=stream))
+
+    # Streamed records decoded before the error are still yielded
+
+    assert rows == ([{"i": 1}] if stream else [])
+
+
+## CSV export
+
+
+def test_format_endpoint_csv_versions(domain: str):
+    rid = "abcd-1234"
+
+    v21 = Socrata(domain=domain)
+    v30 = Socrata(domain=domain, version=3.0)
+
+    assert v21.format_endpoint(rid, format="csv") == f"/resource/{rid}.csv"
+    assert v30.format_endpoint(rid, format="csv") == f"/api/v3/views/{rid}/export.csv"
+
+
+def test_export_resource_v21_pages_csv_and_parses_header_once(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.csv"
+
+    pages = {
+        "0": 'a,b\n1,"x\ny"\n2,z\n',
+        "2": "a,b\n3,w\n",
+        "4": "a,b\n",
+    }
+
+    def callback(request):
+        return (200, {}, pages[request.params["$offset"]])
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(socrata_default_client.export_resource(rid, filters={"limit": 2}))
+
+    assert rows == [("a", "b"), ("1", "x\ny"), ("2", "z"), ("3", "w")]
+
+
+def test_export_resource_v30_posts_single_export_as_dicts(
+    socrata_v3_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_v3_client.domain}/api/v3/views/{rid}/export.csv"
+
+    mocked.add(responses.POST, url, status=200, body="a,b\n1,x\n2,y\n")
+
+    rows = list(socrata_v3_client.export_resource(rid, as_dict=True))
+
+    assert rows == [{"a": "1", "b": "x"}, {"a": "2", "b": "y"}]
+    assert len(mocked.calls) == 1
+    assert "page" not in json.loads(mocked.calls[0].request.body)
+
+
+## Compact rows
+
+
+def test_query_resource_rows_uses_columns_as_header(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    base = f"https://{socrata_default_client.domain}"
+    columns = [{"fieldName": "a"}, {"fieldName": "b"}]
+
+    mocked.add(responses.GET, f"{base}/api/views/{rid}.json", json={"columns": columns})
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        rows = [{"a": "1", "b": "x"}, {"a": "2", "c": "?"}] if offset == 0 else []
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(responses.GET, f"{base}/resource/{rid}.json", callback=callback)
+
+    rows = list(socrata_default_client.query_resource_rows(rid))
+
+    assert rows == [("a", "b"), ("1", "x"), ("2", None)]
+
+
+def test_query_resource_rows_header_from_first_page_with_select(
+    socrata_default_client: Socrata, mocked: responses.RequestsMock
+):
+    rid = "abcd-1234"
+    url = f"https://{socrata_default_client.domain}/resource/{rid}.json"
+
+    def callback(request):
+        offset = int(request.params["$offset"])
+        pages = {0: [{"k": "a"}, {"k": "b", "n": "2"}], 2: [{"n": "3"}]}
+
+        return (200, {}, json.dumps(pages.get(offset, [])))
+
+    mocked.add_callback(responses.GET, url, callback=callback)
+
+    rows = list(
+        socrata_default_client.query_resource_rows(
+            rid, filters={"select": "k, count(*) AS n", "group": "k", "limit": 2}
+        )
+    )
+
+    assert rows == [("k", "n"), ("a", None), ("b", "2"), (None, "3")]
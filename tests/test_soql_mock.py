@@ -0,0 +1,130 @@
+from datetime import date
+
+import pytest
+
+from dotgov.local import parse_query
+from dotgov.socrata import Socrata
+from dotgov.soql import (
+    SoQL,
+    and_,
+    col,
+    count,
+    func,
+    not_,
+    or_,
+    within_box,
+    within_circle,
+    within_polygon,
+)
+
+
+pytestmark = pytest.mark.unit
+
+
+RECORDS = [
+    {"k": "a", "n": "1", "at": "2024-01-05T00:00:00.000", "loc": {"type": "Point", "coordinates": [-74.05, 4.65]}},
+    {"k": "b", "n": "20", "at": "2024-03-01T00:00:00.000", "loc": {"type": "Point", "coordinates": [-75.57, 6.25]}},
+    {"k": "a", "n": "7", "at": "2023-06-01T00:00:00.000"},
+    {"k": "c", "n": "3", "loc": {"type": "Point", "coordinates": [-74.06, 4.66]}},
+]  # fmt: skip
+
+
+def test_operators_render_with_needed_parentheses():
+    where = (col("a") > 1) & or_(col("b") == "it's", ~col("c").is_null())
+
+    assert str(where) == "a > 1 AND (b = 'it''s' OR NOT (c IS NULL))"
+    assert str((col("a") - (col("b") - 2)) * 3) == "(a - (b - 2)) * 3"
+    assert str(col("order").isin([1, 2])) == "`order` IN (1, 2)"
+    assert str(col("d").between(date(2024, 1, 1), date(2024, 2, 1))) == (
+        "d BETWEEN '2024-01-01T00:00:00.000' AND '2024-02-01T00:00:00.000'"
+    )
+    assert str(and_("x = 1", not_("y = 2"))) == "(x = 1) AND NOT (y = 2)"
+
+
+def test_expressions_have_no_truth_value():
+    with pytest.raises(TypeError):
+        bool(col("a") == 1)
+
+    with pytest.raises(ValueError):
+        col("a").isin([])
+
+
+def test_geospatial_predicates():
+    assert str(within_box("loc", 4.7, -74.1, 4.6, -74.0)) == (
+        "within_box(loc, 4.7, -74.1, 4.6, -74.0)"
+    )
+    assert str(within_circle(col("loc"), 4.65, -74.05, 500)) == (
+        "within_circle(loc, 4.65, -74.05, 500)"
+    )
+    assert str(within_polygon("loc", [(0, 0), (0, 1), (1, 1)])) == (
+        "within_polygon(loc, 'MULTIPOLYGON (((0.0 0.0, 0.0 1.0, 1.0 1.0, 0.0 0.0)))')"
+    )
+
+
+def test_contains_keeps_wildcards_in_text():
+    assert str(col("k").contains("it's")) == "upper(k) LIKE '%IT''S%'"
+    assert str(col("k").contains("a_b", case=True)) == "k LIKE '%a_b%'"
+
+    # SoQL has no LIKE escape, so _ still matches any character
+    records = [{"k": "a_b"}, {"k": "axb"}]
+    query = SoQL().select("k").where(col("k").contains("a_b", case=True))
+
+    assert [r["k"] for r in parse_query(str(query)).execute(records)] == ["a_b", "axb"]
+
+
+def test_builder_renders_for_both_versions():
+    query = (
+        SoQL()
+        .where(col("n") > 2)
+        .aggregate(by=["k"], total=func.sum(col("n")), rows=count())
+        .having(col("rows") >= 1)
+        .order_by(col("total").desc(), "k")
+        .limit(50)
+    )
+
+    assert query.filters() == {
+        "select": "k, sum(n) AS total, count(*) AS rows",
+        "where": "n > 2",
+        "group": "k",
+        "having": "rows >= 1",
+        "order": "total DESC, k",
+        "limit": 50,
+    }
+
+    v21 = query.payload(Socrata("example.org"), offset=100)
+
+    assert v21["$where"] == "n > 2"
+    assert v21["$offset"] == 100
+
+    v30 = query.payload(Socrata("example.org", version=3.0))
+
+    assert " WHERE n > 2 " in v30["query"]
+    assert " HAVING rows >= 1 " in v30["query"]
+    assert v30["page"] == {"pageNumber": 1, "pageSize": 50}
+
+
+def test_builders_are_immutable():
+    base = SoQL().where(col("a") == 1)
+
+    refined = base.where(col("b") == 2)
+
+    assert base.filters() == {"where": "a = 1"}
+    assert refined.filters() == {"where": "a = 1 AND b = 2"}
+
+
+@pytest.mark.parametrize(
+    "where, keys",
+    [
+        (col("n") > 5, ["b", "a"]),
+        (or_(col("k") == "c", col("at") < date(2024, 1, 1)), ["a", "c"]),
+        (~col("k").isin(["a"]) & col("loc").not_null(), ["b", "c"]),
+        (col("k").contains("A") & (func.date_extract_y(col("at")) == 2024), ["a"]),
+        (within_circle("loc", 4.65, -74.05, 2000), ["c", "a"]),
+        (within_box("loc", 7, -76, 6, -75), ["b"]),
+        (within_polygon("loc", [(-74.1, 4.6), (-74.1, 4.7), (-74.0, 4.7), (-74.0, 4.6)]), ["c", "a"]),
+    ],
+)  # fmt: skip
+def test_rendered_queries_run_locally(where, keys):
+    query = SoQL().select("k").where(where).order_by(col("n").desc())
+
+    assert [r["k"] for r in parse_query(str(query)).execute(RECORDS)] == keys
@@ -0,0 +1,166 @@
+import json
+
+import pytest
+import responses
+
+from dotgov.local import payload_query
+from dotgov.socrata import Socrata
+from dotgov.sync import SyncStore, format_sync_filters, sync_resource
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+
+@pytest.fixture
+def store(tmp_path) -> SyncStore:
+    return SyncStore(tmp_path / "sync.sqlite")
+
+
+def add_rows(mocked: responses.RequestsMock, domain: str, rows: list[dict]):
+    """Serve rows with the local engine, recording the WHERE clause of each
+    request"""
+
+    wheres = []
+
+    def callback(request):
+        wheres.append(request.params.get("$where"))
+
+        return (200, {}, json.dumps(payload_query(request.params).execute(rows)))
+
+    mocked.add_callback(
+        responses.GET, f"https://{domain}/resource/{RID}.json", callback=callback
+    )
+
+    return wheres
+
+
+def test_format_sync_filters_adds_watermark_and_system_fields(domain: str):
+    s = Socrata(domain=domain)
+
+    filters = format_sync_filters(s, {"where": "x > 1"}, since="2024-01-01T00:00:00Z")
+
+    assert filters.select == ":id, :updated_at, *"
+    assert filters.where == "(x > 1) AND :updated_at >= '2024-01-01T00:00:00Z'"
+    assert filters.order == ":updated_at, :id"
+
+
+def test_format_sync_filters_seeks_past_last_row(domain: str):
+    s = Socrata(domain=domain)
+
+    filters = format_sync_filters(s, after=("2024-01-01T00:00:00Z", "row-'1"))
+
+    assert filters.where == (
+        "(:updated_at > '2024-01-01T00:00:00Z' OR "
+        "(:updated_at = '2024-01-01T00:00:00Z' AND :id > 'row-''1'))"
+    )
+    assert filters.offset == 0
+
+
+def test_sync_upserts_by_id_and_moves_watermark(
+    socrata_default_client: Socrata,
+    store: SyncStore,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    first = [
+        {":id": "a", ":updated_at": "2024-01-01T00:00:00.000Z", "v": 1},
+        {":id": "b", ":updated_at": "2024-01-02T00:00:00.000Z", "v": 1},
+    ]
+
+    wheres = add_rows(mocked, domain, first)
+
+    result = sync_resource(socrata_default_client, RID, store)
+
+    assert result.rows == 2
+    assert result.watermark == "2024-01-02T00:00:00.000Z"
+    assert wheres[0] is None
+
+    mocked.reset()
+
+    second = [{":id": "b", ":updated_at": "2024-01-03T00:00:00.000Z", "v": 2}]
+
+    wheres = add_rows(mocked, domain, second)
+
+    result = sync_resource(socrata_default_client, RID, store)
+
+    assert wheres[0] == ":updated_at >= '2024-01-02T00:00:00.000Z'"
+    assert store.watermark(domain, RID) == "2024-01-03T00:00:00.000Z"
+    assert [r["v"] for r in store.records(domain, RID)] == [1, 2]
+
+
+def test_sync_keeps_watermark_when_run_fails(
+    socrata_default_client: Socrata,
+    store: SyncStore,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    store.set_watermark(domain, RID, "2024-01-01T00:00:00.000Z")
+
+    mocked.add(responses.GET, f"https://{domain}/resource/{RID}.json", status=500)
+
+    with pytest.raises(Exception):
+        sync_resource(socrata_default_client, RID, store)
+
+    assert store.watermark(domain, RID) == "2024-01-01T00:00:00.000Z"
+
+
+def test_sync_does_not_skip_rows_updated_mid_run(
+    socrata_default_client: Socrata,
+    store: SyncStore,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    rows = [
+        {":id": f"r{i}", ":updated_at": f"2024-01-0{i + 1}T00:00:00.000Z", "v": 1}
+        for i in range(4)
+    ]
+
+    offsets = []
+
+    def callback(request):
+        offsets.append(request.params["$offset"])
+
+        page = payload_query(request.params).execute(rows)
+
+        # r0 is updated once the first page was served, moving to the end
+
+        if len(offsets) == 1:
+            rows[0] = {":id": "r0", ":updated_at": "2024-02-01T00:00:00.000Z", "v": 2}
+
+        return (200, {}, json.dumps(page))
+
+    mocked.add_callback(
+        responses.GET, f"https://{domain}/resource/{RID}.json", callback=callback
+    )
+
+    result = sync_resource(socrata_default_client, RID, store, filters={"limit": 2})
+
+    stored = {r[":id"]: r["v"] for r in store.records(domain, RID)}
+
+    assert stored == {"r0": 2, "r1": 1, "r2": 1, "r3": 1}
+    assert result.watermark == "2024-02-01T00:00:00.000Z"
+    assert set(offsets) == {"0"}
+
+
+def test_sync_requires_updated_at(
+    socrata_default_client: Socrata,
+    store: SyncStore,
+    mocked: responses.RequestsMock,
+    domain: str,
+):
+    store.set_watermark(domain, RID, "2024-01-01T00:00:00.000Z")
+
+    rows = [{":id": "a", ":updated_at": "2024-01-02T00:00:00.000Z"}, {":id": "b"}]
+
+    mocked.add(
+        responses.GET, f"https://{domain}/resource/{RID}.json", body=json.dumps(rows)
+    )
+
+    with pytest.raises(ValueError, match=":updated_at"):
+        sync_resource(socrata_default_client, RID, store)
+
+    assert store.watermark(domain, RID) == "2024-01-01T00:00:00.000Z"
+    assert list(store.records(domain, RID)) == []
@@ -0,0 +1,164 @@
+import json
+
+import pytest
+import requests
+import responses
+
+from dotgov.socrata import Socrata
+from dotgov.sync import SyncStore
+from dotgov.tiles import Tile, plan_tiles, query_tiles
+
+
+pytestmark = pytest.mark.unit
+
+
+RID = "abcd-1234"
+
+BBOX = (1.0, 0.0, 0.0, 1.0)
+
+
+def point(longitude: float, latitude: float):
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+# A dense cluster in the north-west, points on shared edges and corners,
+# twins with the same fields, scattered points elsewhere, and one record
+# outside and one without location
+
+RECORDS = (
+    [{":id": f"c{i}", "kind": "crime", "loc": point(0.05 + i / 100, 0.8 + i / 200)} for i in range(20)]
+    + [
+        {":id": "center", "kind": "crime", "loc": point(0.5, 0.5)},
+        {":id": "edge", "kind": "other", "loc": point(0.25, 0.5)},
+        {":id": "corner", "kind": "crime", "loc": point(1.0, 0.0)},
+        {":id": "se", "kind": "crime", "loc": point(0.8, 0.2)},
+        {":id": "twin-1", "kind": "theft", "loc": point(0.75, 0.75)},
+        {":id": "twin-2", "kind": "theft", "loc": point(0.75, 0.75)},
+        {":id": "outside", "kind": "crime", "loc": point(2.0, 0.5)},
+        {":id": "nowhere", "kind": "crime"},
+    ]
+)  # fmt: skip
+
+
+@pytest.fixture
+def store(tmp_path, domain: str):
+    store = SyncStore(tmp_path / "snapshot.sqlite")
+    store.upsert(domain, RID, RECORDS)
+
+    yield store
+
+    store.close()
+
+
+def test_grid_keeps_outer_edges_and_shares_inner_ones():
+    tiles = Tile(1.0, 0.0, 0.0, 0.3).grid(3)
+
+    assert len(tiles) == 9
+    assert tiles[0].north == 1.0 and tiles[0].west == 0.0
+    assert tiles[-1].south == 0.0 and tiles[-1].east == 0.3
+    assert tiles[0].east == tiles[1].west
+    assert tiles[0].south == tiles[3].north
+
+    assert str(tiles[0].condition("loc")).startswith("within_box(loc, 1.0, 0.0, ")
+
+
+def test_plan_splits_crowded_tiles(domain: str, store: SyncStore):
+    with Socrata(domain, snapshot=store) as socrata:
+        plan = plan_tiles(socrata, RID, "loc", BBOX, max_rows=5, workers=4)
+
+    # The north-west quadrant is split until the cluster fits or depth runs out
+
+    assert all(rows <= 5 for _, rows in plan)
+    assert len(plan) > 4
+    assert sum(rows for _, rows in plan) >= 26
+
+    with pytest.raises(ValueError):
+        plan_tiles(socrata, RID, "loc", (0.0, 0.0, 1.0, 1.0))
+
+
+def test_plan_stops_at_max_depth(domain: str, store: SyncStore):
+    with Socrata(domain, snapshot=store) as socrata:
+        plan = plan_tiles(socrata, RID, "loc", BBOX, max_rows=3, max_depth=1)
+
+    assert 4 < len(plan) < 16
+    assert max(rows for _, rows in plan) > 3
+
+
+@pytest.mark.parametrize("version", [2.1, 3.0])
+def test_query_tiles_returns_each_record_once(
+    domain: str, store: SyncStore, version: float
+):
+    with Socrata(domain, version=version, snapshot=store) as socrata:
+        rows = list(
+            query_tiles(
+                socrata,
+                RID,
+                "loc",
+                BBOX,
+                filters={"select": ":id, kind", "limit": 3},
+                max_rows=5,
+                workers=4,
+            )
+        )
+
+    ids = [r[":id"] for r in rows]
+
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(r[":id"] for r in RECORDS[:26])
+
+
+def test_query_tiles_combines_filters(domain: str, store: SyncStore):
+    with Socrata(domain, snapshot=store) as socrata:
+        rows = list(
+            query_tiles(
+                socrata,
+                RID,
+                "loc",
+                BBOX,
+                filters={"select": ":id", "where": "kind = 'crime'"},
+            )
+        )
+
+    ids = {r[":id"] for r in rows}
+
+    assert ids == {f"c{i}" for i in range(20)} | {"center", "corner", "se"}
+
+
+def test_query_tiles_keeps_identical_records(domain: str, store: SyncStore):
+    with Socrata(domain, snapshot=store) as socrata:
+        rows = list(query_tiles(socrata, RID, "loc", BBOX, filters={"select": "kind"}))
+
+    kinds = sorted(r["kind"] for r in rows)
+
+    # Star and explicit selects leave :id out, the location is added back
+
+    assert kinds == sorted(r["kind"] for r in RECORDS[:26])
+    assert kinds.count("theft") == 2
+    assert all(set(r) == {"kind", "loc"} for r in rows)
+
+
+def test_query_tiles_raises_when_a_tile_fails(
+    domain: str, mocked: responses.RequestsMock
+):
+    def callback(request):
+        select = request.params.get("$select", "*")
+        where = request.params["$where"]
+
+        if select.startswith("count"):
+            return (200, {}, json.dumps([{"count": "1"}]))
+
+        if where.startswith("within_box(loc, 1.0, 0.0,"):
+            return (500, {}, "")
+
+        offset = request.params["$offset"]
+        rows = [{"loc": point(0.9, 0.1)}] if offset == "0" else []
+
+        return (200, {}, json.dumps(rows))
+
+    mocked.add_callback(
+        responses.GET, f"https://{domain}/resource/{RID}.json", callback=callback
+    )
+
+    with Socrata(domain, retries=0) as socrata:
+        with pytest.raises(requests.HTTPError):
+            list(query_tiles(socrata, RID, "loc", BBOX, workers=2))